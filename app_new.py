@@ -1,18 +1,48 @@
 import os
 import uuid
+import hashlib
 import base64
+import re
+import contextvars
 import mimetypes
-from typing import Optional
-from flask import Flask, request, jsonify, send_file
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from flask import Flask, Response, g, request, jsonify, send_file
+from flask_sock import Sock
 from dotenv import load_dotenv
 import requests
-from twilio.rest import Client
-from twilio.twiml.voice_response import VoiceResponse, Gather
+from twilio.twiml.voice_response import VoiceResponse
+
+import events
+from call_state import StateUpdater, create_store
+from intents import IntentEngine
+from logs import bind_call, configure_logging, dropped_records, get_logger, log_payload, redact, scrub
+from campaign import CampaignStore, Dialer, parse_targets, text_lines
+from flow import Flow, Template
+from metrics import MetricsRegistry
+from replies import RetentionSweeper, content_filename, replies_bp, serve_reply
+from resilience import (CircuitBreaker, CircuitOpenError, DeadlineExceeded, LatencyWindow, SingleFlight,
+                        bounded_timeout, cut_short, deadline_scope, hedged, remaining, set_deadline)
+from sentences import split_sentences
+from transport import BodySourceError, VendorTransport, multipart_stream
+from tts_cache import TTSCache, cache_key
+
+# twilio.rest and the numpy-backed audio/media_stream modules are imported on
+# first use (or by warm_up) so a cold start doesn't pay for them up front
+if TYPE_CHECKING:
+    from media_stream import MediaStreamSession
+    from twilio.rest import Client
 
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "your-secret-key-here")
+sock = Sock(app)
 
 # Configuration
 TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID")
@@ -29,8 +59,290 @@ YOUR_PHONE_NUMBER = os.environ.get("YOUR_PHONE_NUMBER", "+917995465001")
 REPLIES_DIR = os.path.join(os.getcwd(), "replies")
 os.makedirs(REPLIES_DIR, exist_ok=True)
 
-# Store call state in memory
-call_states = {}
+# TTS audio cache (memory + disk tiers, LRU bounded)
+TTS_CACHE_MEMORY_MB = int(os.environ.get("TTS_CACHE_MEMORY_MB", "32"))
+TTS_CACHE_DISK_MB = int(os.environ.get("TTS_CACHE_DISK_MB", "512"))
+TTS_PREWARM = os.environ.get("TTS_PREWARM", "0") == "1"
+
+# Transcode TTS output to 8 kHz mu-law WAV (what Twilio plays on the PSTN leg),
+# optionally trimming silence and normalizing loudness; empty values disable a step
+TTS_TELEPHONY_AUDIO = os.environ.get("TTS_TELEPHONY_AUDIO", "1") == "1"
+TTS_LOUDNESS_DBFS = os.environ.get("TTS_LOUDNESS_DBFS", "-18")
+TTS_TRIM_SILENCE_DB = os.environ.get("TTS_TRIM_SILENCE_DB", "-45")
+TELEPHONY_PROFILE = {
+    "rate": 8000,
+    "encoding": "mulaw",
+    "loudness_dbfs": float(TTS_LOUDNESS_DBFS) if TTS_LOUDNESS_DBFS else None,
+    "trim_db": float(TTS_TRIM_SILENCE_DB) if TTS_TRIM_SILENCE_DB else None,
+}
+
+# Outbound HTTP: one keep-alive pool per vendor host, (connect, read) timeouts in seconds.
+# The pool defaults to the worker's request threads so concurrent turns don't churn connections.
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE") or os.environ.get("GUNICORN_THREADS", "32"))
+SARVAM_TIMEOUT = (
+    float(os.environ.get("SARVAM_CONNECT_TIMEOUT", "3.05")),
+    float(os.environ.get("SARVAM_READ_TIMEOUT", "30")),
+)
+TWILIO_TIMEOUT = (
+    float(os.environ.get("TWILIO_CONNECT_TIMEOUT", "3.05")),
+    float(os.environ.get("TWILIO_READ_TIMEOUT", "15")),
+)
+
+http = VendorTransport(pool_size=HTTP_POOL_SIZE)
+
+# Recording handling: stream Twilio's recording straight into the STT upload
+# instead of saving it first; RECORDING_AUDIT=1 also keeps a copy on disk
+RECORDING_STREAMING = os.environ.get("RECORDING_STREAMING", "1") == "1"
+RECORDING_AUDIT = os.environ.get("RECORDING_AUDIT", "0") == "1"
+RECORDING_CHUNK_SIZE = int(os.environ.get("RECORDING_CHUNK_SIZE", "16384"))
+# Pre-processing before STT: cut leading/trailing silence, shorten pauses longer than
+# RECORDING_MAX_PAUSE_MS and downsample to STT_SAMPLE_RATE (Sarvam's minimum is 8 kHz).
+# Needs the whole recording before the upload starts, so it replaces RECORDING_STREAMING
+# when on; off by default so STT starts while the recording is still downloading
+RECORDING_PREPROCESS = os.environ.get("RECORDING_PREPROCESS", "0") == "1"
+RECORDING_PAD_MS = int(os.environ.get("RECORDING_PAD_MS", "200"))
+RECORDING_MAX_PAUSE_MS = int(os.environ.get("RECORDING_MAX_PAUSE_MS", "600"))
+STT_SAMPLE_RATE = int(os.environ.get("STT_SAMPLE_RATE", "8000"))
+
+# Async recording mode: answer /twilio/recording with hold TwiML and deliver the
+# reply later through the Twilio REST API (calls(sid).update)
+RECORDING_ASYNC = os.environ.get("RECORDING_ASYNC", "0") == "1"
+ASYNC_WORKERS = int(os.environ.get("ASYNC_WORKERS", "4"))
+ASYNC_DEADLINE_SECONDS = int(os.environ.get("ASYNC_DEADLINE_SECONDS", "20"))
+# Point the Twilio REST client somewhere else, e.g. a local fake API in tests
+TWILIO_API_BASE_URL = os.environ.get("TWILIO_API_BASE_URL")
+
+# Warm-up before a worker accepts traffic (gunicorn post_worker_init, or __main__):
+# load the deferred modules, open vendor connections and load the static prompts'
+# audio into memory, synthesizing any that aren't cached, within WARMUP_TIMEOUT_SECONDS
+WARMUP = os.environ.get("WARMUP", "0") == "1"
+WARMUP_TIMEOUT_SECONDS = float(os.environ.get("WARMUP_TIMEOUT_SECONDS", "20"))
+
+recording_executor = ThreadPoolExecutor(max_workers=ASYNC_WORKERS, thread_name_prefix="recording")
+
+# Conversation engines: "record" uses <Record> per turn, "stream" uses
+# <Connect><Stream> with on-the-fly VAD. Selectable per call on /call.
+CALL_MODES = ("record", "stream")
+DEFAULT_CALL_MODE = os.environ.get("DEFAULT_CALL_MODE", "record")
+STREAM_URL = os.environ.get("STREAM_URL") or (
+    BASE_URL.replace("https://", "wss://", 1).replace("http://", "ws://", 1) + "/twilio/stream"
+)
+STREAM_WORKERS = int(os.environ.get("STREAM_WORKERS", "4"))
+VAD_END_MS = int(os.environ.get("VAD_END_MS", "500"))
+VAD_THRESHOLD_DB = float(os.environ.get("VAD_THRESHOLD_DB", "12"))
+
+stream_executor = ThreadPoolExecutor(max_workers=STREAM_WORKERS, thread_name_prefix="stream")
+
+# Batched TTS: independent prompts of one webhook are synthesized concurrently and
+# share a deadline; prompts that miss it are spoken with <Say> instead. The pool is shared
+# by every request thread (plus background chunks and prewarm), so it defaults to the
+# worker's request threads: one prompt per concurrent webhook never waits for a free thread.
+TTS_BATCH_WORKERS = int(os.environ.get("TTS_BATCH_WORKERS") or os.environ.get("GUNICORN_THREADS", "32"))
+TTS_BATCH_DEADLINE_SECONDS = float(os.environ.get("TTS_BATCH_DEADLINE_SECONDS", "10"))
+
+tts_executor = ThreadPoolExecutor(max_workers=TTS_BATCH_WORKERS, thread_name_prefix="tts")
+
+# Resilience: every Twilio webhook gets an end-to-end budget (Twilio gives up after 15 s)
+# that caps the Sarvam timeouts; a TTS request slower than the recent TTS_HEDGE_PERCENTILE
+# latency (at least TTS_HEDGE_MIN_SECONDS) is sent a second time (0 disables hedging);
+# after SARVAM_BREAKER_FAILURES consecutive failures an endpoint is skipped for
+# SARVAM_BREAKER_RESET_SECONDS before a probe request is let through
+WEBHOOK_DEADLINE_SECONDS = float(os.environ.get("WEBHOOK_DEADLINE_SECONDS", "12"))
+TTS_HEDGE_PERCENTILE = float(os.environ.get("TTS_HEDGE_PERCENTILE", "95"))
+TTS_HEDGE_MIN_SECONDS = float(os.environ.get("TTS_HEDGE_MIN_SECONDS", "1.5"))
+SARVAM_BREAKER_FAILURES = int(os.environ.get("SARVAM_BREAKER_FAILURES", "5"))
+SARVAM_BREAKER_RESET_SECONDS = float(os.environ.get("SARVAM_BREAKER_RESET_SECONDS", "30"))
+
+breakers = {
+    endpoint: CircuitBreaker(f"sarvam_{endpoint}", SARVAM_BREAKER_FAILURES, SARVAM_BREAKER_RESET_SECONDS)
+    for endpoint in ("stt", "tts")
+}
+tts_latency = LatencyWindow()
+hedge_executor = ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE, thread_name_prefix="hedge")
+# Concurrent cache misses for the same audio in one worker share a single synthesis
+tts_flights = SingleFlight()
+
+# Outbound campaigns: targets and progress persist in SQLite so dialing resumes after a restart
+CAMPAIGN_DB = os.environ.get("CAMPAIGN_DB", os.path.join(os.getcwd(), "campaigns.db"))
+CAMPAIGN_MAX_CONCURRENT = int(os.environ.get("CAMPAIGN_MAX_CONCURRENT", "10"))
+CAMPAIGN_CALLS_PER_SECOND = float(os.environ.get("CAMPAIGN_CALLS_PER_SECOND", "1"))
+CAMPAIGN_MAX_ATTEMPTS = int(os.environ.get("CAMPAIGN_MAX_ATTEMPTS", "3"))
+CAMPAIGN_RETRY_BACKOFF = float(os.environ.get("CAMPAIGN_RETRY_BACKOFF", "60"))
+CAMPAIGN_RESUME = os.environ.get("CAMPAIGN_RESUME", "1") == "1"
+CAMPAIGN_LEASE_TTL = float(os.environ.get("CAMPAIGN_LEASE_TTL", "30"))
+# Uploads are parsed from a local copy; bodies larger than this are spooled to disk
+CAMPAIGN_UPLOAD_MEMORY_MB = int(os.environ.get("CAMPAIGN_UPLOAD_MEMORY_MB", "8"))
+if CAMPAIGN_CALLS_PER_SECOND <= 0:
+    raise ValueError(f"CAMPAIGN_CALLS_PER_SECOND must be positive, got {CAMPAIGN_CALLS_PER_SECOND}")
+
+campaign_store = CampaignStore(CAMPAIGN_DB)
+dialers: Dict[str, Dialer] = {}
+dialers_lock = threading.Lock()
+
+# Replies serving and retention
+REPLIES_MAX_AGE = int(os.environ.get("REPLIES_MAX_AGE", "31536000"))
+REPLIES_TTL_SECONDS = int(os.environ.get("REPLIES_TTL_SECONDS", "3600"))
+REPLIES_MAX_MB = int(os.environ.get("REPLIES_MAX_MB", "1024"))
+REPLIES_SWEEP_INTERVAL = int(os.environ.get("REPLIES_SWEEP_INTERVAL", "300"))
+
+app.config["REPLIES_DIR"] = REPLIES_DIR
+app.config["REPLIES_MAX_AGE"] = REPLIES_MAX_AGE
+app.register_blueprint(replies_bp)
+
+replies_sweeper = RetentionSweeper(
+    REPLIES_DIR,
+    ttl_seconds=REPLIES_TTL_SECONDS,
+    max_bytes=REPLIES_MAX_MB * 1024 * 1024,
+    interval=REPLIES_SWEEP_INTERVAL,
+)
+
+tts_cache = TTSCache(
+    REPLIES_DIR,
+    max_memory_bytes=TTS_CACHE_MEMORY_MB * 1024 * 1024,
+    max_disk_bytes=TTS_CACHE_DISK_MB * 1024 * 1024,
+)
+# Transcoded copies, keyed by source key + TELEPHONY_PROFILE
+telephony_cache = TTSCache(
+    REPLIES_DIR,
+    max_memory_bytes=TTS_CACHE_MEMORY_MB * 1024 * 1024,
+    max_disk_bytes=TTS_CACHE_DISK_MB * 1024 * 1024,
+    prefix="tel_",
+)
+
+# Call state store shared by all workers ("sqlite") or per process ("memory")
+CALL_STATE_BACKEND = os.environ.get("CALL_STATE_BACKEND", "sqlite")
+CALL_STATE_DB = os.environ.get("CALL_STATE_DB", os.path.join(os.getcwd(), "call_state.db"))
+CALL_STATE_TTL = int(os.environ.get("CALL_STATE_TTL", "7200"))
+CALL_STATE_MAX_ENTRIES = int(os.environ.get("CALL_STATE_MAX_ENTRIES", "10000"))
+
+call_states = create_store(
+    CALL_STATE_BACKEND,
+    path=CALL_STATE_DB,
+    ttl_seconds=CALL_STATE_TTL,
+    max_entries=CALL_STATE_MAX_ENTRIES,
+)
+
+# Idempotent recordings: the reply to each RecordingSid is kept for RECORDING_RESULT_TTL
+# seconds (0 disables), so a webhook Twilio retries gets the first attempt's TwiML
+# instead of a second download, STT and TTS; a retry that arrives mid-way waits for it
+RECORDING_RESULT_TTL = int(os.environ.get("RECORDING_RESULT_TTL", "300"))
+RECORDING_RESULTS_DB = os.environ.get("RECORDING_RESULTS_DB", os.path.join(os.getcwd(), "recording_results.db"))
+RECORDING_RESULT_POLL_SECONDS = 0.1
+# A pending attempt older than any webhook could run belongs to a dead worker
+RECORDING_CLAIM_SECONDS = max(WEBHOOK_DEADLINE_SECONDS, ASYNC_DEADLINE_SECONDS) + 5
+
+recording_results = create_store(
+    CALL_STATE_BACKEND,
+    path=RECORDING_RESULTS_DB,
+    ttl_seconds=RECORDING_RESULT_TTL,
+    max_entries=CALL_STATE_MAX_ENTRIES,
+)
+
+# Chunked TTS: prompts are split at sentence and clause boundaries (sentences.py) and
+# the chunks synthesized concurrently, each cached on its own. A webhook waits only for
+# the first chunk of each prompt; the rest become further <Play> verbs whose audio is
+# synthesized in the background and served from /tts/chunk/<key> when Twilio gets there
+TTS_CHUNKED = os.environ.get("TTS_CHUNKED", "0") == "1"
+TTS_CHUNK_MAX_CHARS = int(os.environ.get("TTS_CHUNK_MAX_CHARS", "200"))
+TTS_CHUNK_MIN_CHARS = int(os.environ.get("TTS_CHUNK_MIN_CHARS", "12"))
+TTS_CHUNKS_DB = os.environ.get("TTS_CHUNKS_DB", os.path.join(os.getcwd(), "tts_chunks.db"))
+
+# Text of chunks handed out as /tts/chunk URLs, so any worker can synthesize them
+tts_chunks = create_store(
+    CALL_STATE_BACKEND,
+    path=TTS_CHUNKS_DB,
+    ttl_seconds=CALL_STATE_TTL,
+    max_entries=CALL_STATE_MAX_ENTRIES,
+)
+
+# Logging: JSON lines (or "text") through a non-blocking queue. Calls listed in
+# LOG_DEBUG_CALLS, or traced via POST /debug/trace/<call_sid>, log at DEBUG.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_DEBUG_CALLS = [sid.strip() for sid in os.environ.get("LOG_DEBUG_CALLS", "").split(",")]
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_PAYLOAD_SAMPLE = float(os.environ.get("LOG_PAYLOAD_SAMPLE", "0.01"))
+
+
+
+def setup_logging() -> None:
+    configure_logging(
+        level=LOG_LEVEL,
+        fmt=LOG_FORMAT,
+        queue_size=LOG_QUEUE_SIZE,
+        payload_sample_rate=LOG_PAYLOAD_SAMPLE,
+        traced_calls=LOG_DEBUG_CALLS,
+        trace_lookup=lambda call_sid: call_states.get(f"trace:{call_sid}", {}).get("trace"),
+    )
+
+
+# The queue-backed handler (and its writer thread) is installed by start_services();
+# until then WARNING and above go to stderr through logging's last-resort handler
+log = get_logger(__name__)
+
+# Metrics: every worker flushes its histograms/counters into METRICS_DIR and
+# /metrics merges them, so the totals cover all gunicorn workers
+METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(os.getcwd(), "metrics"))
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "5"))
+
+metrics = MetricsRegistry(METRICS_DIR, flush_interval=METRICS_FLUSH_INTERVAL)
+
+# Event log: one JSON line per webhook, caller turn and call status change, appended to
+# rotating segments under EVENT_LOG_DIR by a background thread (fsync every
+# EVENT_LOG_FSYNC_SECONDS). Events beyond EVENT_LOG_QUEUE_SIZE are dropped rather than
+# waited for. EVENT_LOG_TRANSCRIPTS=0 leaves out what callers said.
+# `python events.py summarize` / `export` read it.
+EVENT_LOG = os.environ.get("EVENT_LOG", "1") == "1"
+EVENT_LOG_DIR = os.environ.get("EVENT_LOG_DIR", os.path.join(os.getcwd(), "events"))
+EVENT_LOG_SEGMENT_MB = int(os.environ.get("EVENT_LOG_SEGMENT_MB", "64"))
+EVENT_LOG_MAX_MB = int(os.environ.get("EVENT_LOG_MAX_MB", "1024"))
+EVENT_LOG_QUEUE_SIZE = int(os.environ.get("EVENT_LOG_QUEUE_SIZE", "10000"))
+EVENT_LOG_FSYNC_SECONDS = float(os.environ.get("EVENT_LOG_FSYNC_SECONDS", "5"))
+EVENT_LOG_TRANSCRIPTS = os.environ.get("EVENT_LOG_TRANSCRIPTS", "1") == "1"
+# Requests that get a "webhook" event; the rest (audio files, /metrics, /stats) don't
+EVENT_ROUTE_PREFIXES = ("/twilio/", "/call", "/campaigns", "/tts/chunk/")
+
+event_log = events.EventLog(
+    EVENT_LOG_DIR,
+    segment_bytes=EVENT_LOG_SEGMENT_MB * 1024 * 1024,
+    max_bytes=EVENT_LOG_MAX_MB * 1024 * 1024,
+    queue_size=EVENT_LOG_QUEUE_SIZE,
+    fsync_interval=EVENT_LOG_FSYNC_SECONDS,
+    enabled=EVENT_LOG,
+)
+STAGE_SECONDS = metrics.histogram(
+    "ivr_stage_duration_seconds",
+    "Time spent in one stage of a caller turn (streaming STT includes the overlapped download).",
+    ("stage", "vendor", "language", "outcome"),
+)
+WEBHOOK_SECONDS = metrics.histogram(
+    "ivr_webhook_duration_seconds", "End-to-end webhook handling time.", ("route", "method", "status")
+)
+TTS_CACHE_LOOKUPS = metrics.counter("ivr_tts_cache_lookups_total", "TTS cache lookups.", ("result", "language"))
+RECORDING_AUDIO_SECONDS = metrics.histogram(
+    "ivr_recording_audio_seconds", "Caller recording length before and after pre-processing.",
+    ("phase", "language"), buckets=(0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 45.0, 60.0),
+)
+TTS_HEDGES = metrics.counter("ivr_tts_hedges_total", "Slow TTS requests sent a second time.", ("language",))
+TTS_COALESCED = metrics.counter(
+    "ivr_tts_coalesced_total", "TTS cache misses answered by another request's in-flight synthesis.", ("language",)
+)
+RECORDING_DUPLICATES = metrics.counter(
+    "ivr_recording_duplicates_total", "Retried recording webhooks answered from an earlier attempt.", ("result",)
+)
+SHORT_CIRCUITS = metrics.counter(
+    "ivr_vendor_short_circuits_total", "Vendor calls skipped because the circuit breaker was open.", ("endpoint",)
+)
+SAY_FALLBACKS = metrics.counter(
+    "ivr_say_fallbacks_total", "Prompts answered with <Say> because TTS audio was unavailable.", ("route", "language")
+)
+CALL_WEBHOOKS = metrics.histogram(
+    "ivr_call_webhooks", "Webhooks Twilio made for one call (status callbacks and audio fetches excluded).", (),
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 13, 16, 20, 25, 30, 40, 50),
+)
+
+# Twilio call statuses after which the call's state can be dropped
+TERMINAL_CALL_STATUSES = ("completed", "failed", "busy", "no-answer", "canceled")
 
 # Language configurations
 LANGUAGES = {
@@ -39,32 +351,32 @@ LANGUAGES = {
     "te": {"name": "Telugu", "code": "te-IN"}
 }
 
-LANGUAGE_PROMPTS = {
-    "en": {
-        "welcome": "Welcome to TGSPDCL Telangana Southern Power Distribution. Press 1 for English, Press 2 for Hindi, Press 3 for Telugu.",
-        "greeting": "Welcome to TGSPDCL. Our customer care number is 040-23552222. Toll-free helpline is 1800-425-1912. How can I help you today?",
-        "ask_more": "Do you have any other questions? Press 1 to continue, Press 2 to change language, or Press 3 to end the call.",
-        "goodbye": "Thank you for calling TGSPDCL. Goodbye.",
-        "no_input": "I did not receive your input. Please try again.",
-        "change_language": "To change language, Press 1 for English, Press 2 for Hindi, Press 3 for Telugu."
-    },
-    "hi": {
-        "welcome": "TGSPDCL तेलंगाना दक्षिणी विद्युत वितरण में आपका स्वागत है। अंग्रेजी के लिए 1 दबाएं, हिंदी के लिए 2 दबाएं, तेलुगु के लिए 3 दबाएं।",
-        "greeting": "TGSPDCL में आपका स्वागत है। हमारा ग्राहक सेवा नंबर 040-23552222 है। टोल-फ्री हेल्पलाइन 1800-425-1912 है। मैं आज आपकी कैसे मदद कर सकता हूं?",
-        "ask_more": "क्या आपके कोई अन्य प्रश्न हैं? जारी रखने के लिए 1 दबाएं, भाषा बदलने के लिए 2 दबाएं, या कॉल समाप्त करने के लिए 3 दबाएं।",
-        "goodbye": "TGSPDCL को कॉल करने के लिए धन्यवाद। अलविदा।",
-        "no_input": "मुझे आपका इनपुट नहीं मिला। कृपया पुनः प्रयास करें।",
-        "change_language": "भाषा बदलने के लिए, अंग्रेजी के लिए 1 दबाएं, हिंदी के लिए 2 दबाएं, तेलुगु के लिए 3 दबाएं।"
-    },
-    "te": {
-        "welcome": "TGSPDCL తెలంగాణ దక్షిణ విద్యుత్ పంపిణీకి స్వాగతం। ఇంగ్లీష్ కోసం 1 నొక్కండి, హిందీ కోసం 2 నొక్కండి, తెలుగు కోసం 3 నొక్కండి।",
-        "greeting": "TGSPDCL కి స్వాగతం। మా కస్టమర్ కేర్ నంబర్ 040-23552222. టోల్-ఫ్రీ హెల్ప్‌లైన్ 1800-425-1912. నేను ఈరోజు మీకు ఎలా సహాయం చేయగలను?",
-        "ask_more": "మీకు ఇంకా ఏవైనా ప్రశ్నలు ఉన్నాయా? కొనసాగించడానికి 1 నొక్కండి, భాషను మార్చడానికి 2 నొక్కండి, లేదా కాల్ ముగించడానికి 3 నొక్కండి.",
-        "goodbye": "TGSPDCL కు కాల్ చేసినందుకు ధన్యవాదాలు. వీడ్కోలు.",
-        "no_input": "నాకు మీ ఇన్‌పుట్ అందలేదు. దయచేసి మళ్లీ ప్రయత్నించండి.",
-        "change_language": "భాషను మార్చడానికి, ఇంగ్లీష్ కోసం 1 నొక్కండి, హిందీ కోసం 2 నొక్కండి, తెలుగు కోసం 3 నొక్కండి."
-    }
-}
+# Languages Twilio has a <Say> voice for; the others fall back to English sentences
+SAY_LANGUAGES = ("en", "hi")
+
+# Call flow: states, DTMF transitions and prompts per language, compiled at startup
+# into TwiML templates; every state is served at /twilio/<state>. With FLOW_INLINE the
+# next screen is put into the same TwiML (a recording's reply ends with the continue
+# menu) instead of a <Redirect> that costs Twilio another webhook.
+FLOW_FILE = os.environ.get("FLOW_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "flow.json"))
+FLOW_INLINE = os.environ.get("FLOW_INLINE", "1") == "1"
+call_flow = Flow.from_file(
+    FLOW_FILE,
+    base_url=BASE_URL,
+    stream_url=STREAM_URL,
+    languages={language: config["code"] for language, config in LANGUAGES.items()},
+    say_languages=SAY_LANGUAGES,
+    modes=CALL_MODES,
+    inline=FLOW_INLINE,
+)
+LANGUAGE_PROMPTS = call_flow.prompts
+
+# Intent table: keywords per language and reply templates, compiled at startup
+INTENTS_FILE = os.environ.get("INTENTS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents.json"))
+intent_engine = IntentEngine.from_file(INTENTS_FILE)
+
+# Fixed prompts that are played via TTS and can be synthesized ahead of time
+STATIC_PROMPT_KEYS = ("greeting", "ask_more", "goodbye", "no_input", "change_language", "please_wait", "error")
 
 HYDERABAD_EB_INFO = {
     "board_name": "TGSPDCL - Telangana Southern Power Distribution Company Limited",
@@ -74,71 +386,248 @@ HYDERABAD_EB_INFO = {
 }
 
 
-def twilio_client() -> Optional[Client]:
+# One Twilio REST client per process: (client, pid)
+_twilio: Tuple[Optional["Client"], Optional[int]] = (None, None)
+_twilio_lock = threading.Lock()
+
+
+def twilio_client() -> Optional["Client"]:
+    """Return this process's Twilio REST client, or None if Twilio isn't configured.
+
+    The client and its keep-alive session are built on first use; a forked
+    worker builds its own instead of sharing the parent's sockets.
+    """
+    global _twilio
     if not (TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN):
         return None
-    return Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    client, pid = _twilio
+    if client is not None and pid == os.getpid():
+        return client
+    with _twilio_lock:
+        client, pid = _twilio
+        if client is None or pid != os.getpid():
+            from twilio.rest import Client
 
+            client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+            if TWILIO_API_BASE_URL:
+                client.api.base_url = TWILIO_API_BASE_URL.rstrip("/")
+            _twilio = (client, os.getpid())
+        return client
 
-def download_twilio_recording(recording_url: str) -> str:
-    """Download Twilio recording and return local file path."""
-    print(f"[DEBUG] Downloading recording from: {recording_url}")
-    url_wav = recording_url
-    if not url_wav.endswith(".wav") and not url_wav.endswith(".mp3"):
-        url_wav = recording_url + ".wav"
 
+def _recording_wav_url(recording_url: str) -> str:
+    if not recording_url.endswith(".wav") and not recording_url.endswith(".mp3"):
+        return recording_url + ".wav"
+    return recording_url
+
+
+def _open_twilio_recording(recording_url: str):
     auth = (TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN) if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN else None
-    resp = requests.get(url_wav, auth=auth, stream=True, timeout=30)
+    resp = http.get(_recording_wav_url(recording_url), auth=auth, stream=True, timeout=TWILIO_TIMEOUT)
     resp.raise_for_status()
+    return resp
 
-    filename = f"recording_{uuid.uuid4().hex}.wav"
-    path = os.path.join(REPLIES_DIR, filename)
-    with open(path, "wb") as f:
-        for chunk in resp.iter_content(chunk_size=8192):
-            if chunk:
-                f.write(chunk)
-    print(f"[DEBUG] Recording saved to: {path}")
-    return path
+
+def download_twilio_recording(recording_url: str) -> str:
+    """Download Twilio recording and return local file path."""
+    with STAGE_SECONDS.time(stage="download", vendor="twilio", language=""):
+        log.debug("[RECORDING] Downloading recording from: %s", recording_url)
+        resp = _open_twilio_recording(recording_url)
+
+        # Write under a temporary name, then rename to the content hash
+        tmp_path = os.path.join(REPLIES_DIR, f"recording_{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        with open(tmp_path, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=8192):
+                if chunk:
+                    digest.update(chunk)
+                    f.write(chunk)
+
+        path = os.path.join(REPLIES_DIR, content_filename("recording", digest.hexdigest(), ".wav"))
+        os.replace(tmp_path, path)
+        log.debug("[RECORDING] Recording saved to: %s", path)
+        return path
+
+
+@contextmanager
+def stream_twilio_recording(recording_url: str, audit: bool = False) -> Iterator[Iterator[bytes]]:
+    """Open a Twilio recording and yield an iterator over its body.
+
+    The HTTP status is checked on entry, so failures surface here and not
+    halfway through the STT upload. The connection goes back to the pool on
+    exit, also when the body was never read (e.g. the STT breaker is open).
+    With ``audit`` the chunks are also written to a content-addressed file in
+    REPLIES_DIR.
+    """
+    log.debug("[RECORDING] Streaming recording from: %s", recording_url)
+    resp = _open_twilio_recording(recording_url)
+
+    def chunks() -> Iterator[bytes]:
+        if not audit:
+            yield from resp.iter_content(chunk_size=RECORDING_CHUNK_SIZE)
+            return
+
+        tmp_path = os.path.join(REPLIES_DIR, f"recording_{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        with open(tmp_path, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=RECORDING_CHUNK_SIZE):
+                if chunk:
+                    digest.update(chunk)
+                    f.write(chunk)
+                    yield chunk
+        path = os.path.join(REPLIES_DIR, content_filename("recording", digest.hexdigest(), ".wav"))
+        os.replace(tmp_path, path)
+        log.debug("[RECORDING] Audit copy of recording saved to: %s", path)
+
+    body = chunks()
+    try:
+        yield body
+    finally:
+        body.close()
+        resp.close()
+
+
+def preprocess_recording(audio: bytes, language_code: str = "en-IN") -> bytes:
+    """Trim silence and long pauses from a caller recording and downsample it for STT.
+
+    Audio that isn't a WAV file is returned unchanged.
+    """
+    from audio import compact_speech, read_wav, resample, write_wav
+
+    with STAGE_SECONDS.time(stage="preprocess", vendor="local", language=language_code) as labels:
+        try:
+            pcm, rate = read_wav(audio)
+        except ValueError as e:
+            log.warning("[RECORDING] Uploading recording unprocessed: %s", e)
+            labels["outcome"] = "skipped"
+            return audio
+
+        speech = compact_speech(pcm, rate, threshold_db=VAD_THRESHOLD_DB, pad_ms=RECORDING_PAD_MS,
+                                max_pause_ms=RECORDING_MAX_PAUSE_MS)
+        out_rate = min(rate, STT_SAMPLE_RATE)
+        speech = resample(speech, rate, out_rate)
+
+        before, after = len(pcm) / rate, len(speech) / out_rate
+        RECORDING_AUDIO_SECONDS.observe(before, phase="before", language=language_code)
+        RECORDING_AUDIO_SECONDS.observe(after, phase="after", language=language_code)
+        log.debug("[RECORDING] Pre-processed %.2fs @ %d Hz -> %.2fs @ %d Hz", before, rate, after, out_rate)
+        return write_wav(speech, out_rate)
 
 
 def sarvam_stt(audio_path: str, language_code: str = "en-IN") -> str:
     """Send audio file to Sarvam STT and return the transcribed text."""
-    print(f"[DEBUG STT] Starting STT for language: {language_code}, file: {audio_path}")
-    
-    if not (SARVAM_API_KEY and SARVAM_STT_URL):
-        raise RuntimeError("Sarvam STT not configured")
+    with STAGE_SECONDS.time(stage="stt", vendor="sarvam", language=language_code), events.timed("stt_ms"):
+        log.debug("[STT] Starting STT for language: %s, file: %s", language_code, audio_path)
+
+        if not (SARVAM_API_KEY and SARVAM_STT_URL):
+            raise RuntimeError("Sarvam STT not configured")
+
+        headers = {"Authorization": f"Bearer {SARVAM_API_KEY}"}
 
-    headers = {"Authorization": f"Bearer {SARVAM_API_KEY}"}
-    data_payload = {
+        with open(audio_path, "rb") as fh:
+            files = {"file": (os.path.basename(audio_path), fh, "audio/wav")}
+            log.debug("[STT] Sending request to: %s", SARVAM_STT_URL)
+            resp = sarvam_call("stt", lambda timeout: http.post(
+                SARVAM_STT_URL, headers=headers, files=files, data=_stt_fields(language_code), timeout=timeout))
+
+        return _stt_transcript(resp)
+
+
+def sarvam_stt_stream(chunks: Iterable[bytes], language_code: str = "en-IN",
+                      filename: str = "recording.wav") -> str:
+    """Stream audio chunks to Sarvam STT as a chunked multipart upload and return the text."""
+    with STAGE_SECONDS.time(stage="stt", vendor="sarvam", language=language_code), events.timed("stt_ms"):
+        log.debug("[STT] Starting streaming STT for language: %s", language_code)
+
+        if not (SARVAM_API_KEY and SARVAM_STT_URL):
+            raise RuntimeError("Sarvam STT not configured")
+
+        boundary = uuid.uuid4().hex
+        headers = {
+            "Authorization": f"Bearer {SARVAM_API_KEY}",
+            "Content-Type": f"multipart/form-data; boundary={boundary}"
+        }
+        body = multipart_stream(boundary, _stt_fields(language_code), "file", filename, "audio/wav", chunks)
+
+        log.debug("[STT] Sending request to: %s", SARVAM_STT_URL)
+        resp = sarvam_call("stt", lambda timeout: http.post(SARVAM_STT_URL, headers=headers, data=body,
+                                                            timeout=timeout))
+        return _stt_transcript(resp)
+
+
+def sarvam_call(endpoint: str,
+                send: Callable[[Tuple[float, float]], requests.Response]) -> requests.Response:
+    """Send one Sarvam request through the endpoint's circuit breaker, within the current deadline.
+
+    ``send`` gets the (connect, read) timeout to use. Any exception, 429 and
+    5xx responses count as failures, except a ``BodySourceError`` (the
+    streamed upload's source, the Twilio recording, broke) and a timeout that
+    the deadline had cut short (``cut_short``): neither says Sarvam is unhealthy.
+    """
+    breaker = breakers[endpoint]
+    timeout = bounded_timeout(SARVAM_TIMEOUT)
+    try:
+        breaker.allow()
+    except CircuitOpenError:
+        SHORT_CIRCUITS.inc(endpoint=endpoint)
+        raise
+    try:
+        resp = send(timeout)
+    except BodySourceError:
+        breaker.release()
+        raise
+    except requests.Timeout:
+        if cut_short(timeout, SARVAM_TIMEOUT):
+            # Earlier steps (e.g. the Twilio download) used up the budget, not Sarvam
+            breaker.release()
+        else:
+            breaker.record_failure()
+        raise
+    except BaseException:
+        # Whatever it was, a half-open probe must end or the breaker never closes again
+        breaker.record_failure()
+        raise
+    if resp.status_code == 429 or resp.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return resp
+
+
+def require_sarvam(endpoint: str) -> None:
+    """Fail fast, before any work that only feeds a Sarvam call, if that call can't be made.
+
+    Raises CircuitOpenError while the endpoint's breaker rejects calls and
+    DeadlineExceeded once the webhook's budget is spent.
+    """
+    bounded_timeout(SARVAM_TIMEOUT)
+    if not breakers[endpoint].ready():
+        SHORT_CIRCUITS.inc(endpoint=endpoint)
+        raise CircuitOpenError(f"Circuit '{endpoint}' is open")
+
+
+def _stt_fields(language_code: str) -> dict:
+    return {
         "language_code": language_code,
         "model": "saaras:v1"
     }
-    
-    with open(audio_path, "rb") as fh:
-        files = {"file": (os.path.basename(audio_path), fh, "audio/wav")}
-        print(f"[DEBUG STT] Sending request to: {SARVAM_STT_URL}")
-        resp = requests.post(SARVAM_STT_URL, headers=headers, files=files, data=data_payload, timeout=60)
-    
-    print(f"[DEBUG STT] Response status: {resp.status_code}")
-    print(f"[DEBUG STT] Response body: {resp.text[:500]}")
+
+
+def _stt_transcript(resp) -> str:
+    log.debug("[STT] Response status: %s", resp.status_code)
+    if not resp.ok:
+        log.error("[STT] Request failed (status %s): %s", resp.status_code, scrub(resp.text[:500]))
     resp.raise_for_status()
     
     data = resp.json()
+    log_payload(log, "[STT] Response", data)
     transcript = data.get("text") or data.get("transcript") or ""
-    print(f"[DEBUG STT] Transcribed text: '{transcript}'")
+    log.debug("[STT] Transcribed text: '%s'", transcript)
     return transcript
 
 
-def sarvam_tts(text: str, language_code: str = "en-IN") -> str:
-    """Send text to Sarvam TTS and return path to generated audio file."""
-    print(f"[DEBUG TTS] ===== STARTING TTS =====")
-    print(f"[DEBUG TTS] Language: {language_code}")
-    print(f"[DEBUG TTS] Text: '{text}'")
-    print(f"[DEBUG TTS] Text length: {len(text)} chars")
-    
-    if not (SARVAM_API_KEY and SARVAM_TTS_URL):
-        raise RuntimeError("Sarvam TTS not configured")
-
+def tts_payload(text: str, language_code: str = "en-IN") -> dict:
+    """Build the Sarvam TTS request payload for text in a language."""
     # Model selection based on language
     if language_code == "hi-IN":
         model = "bulbul:v1"
@@ -150,14 +639,7 @@ def sarvam_tts(text: str, language_code: str = "en-IN") -> str:
         model = "bulbul:v1"
         speaker = ""
 
-    print(f"[DEBUG TTS] Using model: {model}, speaker: '{speaker}'")
-
-    headers = {
-        "Authorization": f"Bearer {SARVAM_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
+    return {
         "text": text,
         "target_language_code": language_code,
         "speaker": speaker,
@@ -169,39 +651,295 @@ def sarvam_tts(text: str, language_code: str = "en-IN") -> str:
         "model": model
     }
 
-    print(f"[DEBUG TTS] Sending request to: {SARVAM_TTS_URL}")
-    print(f"[DEBUG TTS] Payload: {payload}")
+
+def sarvam_tts(text: str, language_code: str = "en-IN") -> str:
+    """Return path to audio for text, synthesizing with Sarvam TTS on a cache miss."""
+    with STAGE_SECONDS.time(stage="tts", vendor="sarvam", language=language_code) as labels:
+        payload = tts_payload(text, language_code)
+        key = cache_key(payload)
+
+        cached_path = _cached_audio(key)
+        if cached_path:
+            log.debug("[TTS] Cache hit (%s): %s", language_code, os.path.basename(cached_path))
+            labels["outcome"] = "cache_hit"
+            TTS_CACHE_LOOKUPS.inc(result="hit", language=language_code)
+            return cached_path
+
+        TTS_CACHE_LOOKUPS.inc(result="miss", language=language_code)
+
+        log.debug("[TTS] Cache miss (%s), %d chars, model: %s, speaker: %s: '%s'",
+                  language_code, len(text), payload["model"], payload["speaker"], text)
+
+        path, shared = tts_flights.do(key, lambda: _synthesize(key, payload))
+        if shared:
+            log.debug("[TTS] Shared an in-flight synthesis (%s)", language_code)
+            labels["outcome"] = "coalesced"
+            TTS_COALESCED.inc(language=language_code)
+        return path
+
+
+def _synthesize(key: str, payload: dict) -> str:
+    """Synthesize a payload with Sarvam, store it in the cache and return the audio path."""
+    # Another flight may have finished between our cache miss and taking the lead
+    cached_path = _cached_audio(key)
+    if cached_path:
+        return cached_path
+
+    language_code = payload["target_language_code"]
+    if TTS_HEDGE_PERCENTILE > 0:
+        delay = max(tts_latency.percentile(TTS_HEDGE_PERCENTILE) or 0.0, TTS_HEDGE_MIN_SECONDS)
+        (audio_bytes, ext), hedge_sent = hedged(lambda: _sarvam_tts_request(payload), hedge_executor, delay)
+        if hedge_sent:
+            log.info("[TTS] Hedged request slower than %.2fs (%s)", delay, language_code)
+            TTS_HEDGES.inc(language=language_code)
+    else:
+        audio_bytes, ext = _sarvam_tts_request(payload)
+
+    try:
+        path = tts_cache.put(key, audio_bytes, ext)
+    except Exception:
+        log.exception("[TTS] Failed to write file")
+        raise
+
+    log.debug("[TTS] Wrote %s (%d bytes)", path, len(audio_bytes))
+    if TTS_TELEPHONY_AUDIO:
+        path = telephony_audio(key, audio_bytes, path)
+    return path
+
+
+def cached_tts(text: str, language_code: str = "en-IN") -> Optional[str]:
+    """Return the cached audio path for text without calling Sarvam, or None."""
+    return _cached_audio(cache_key(tts_payload(text, language_code)))
+
+
+def _cached_audio(key: str) -> Optional[str]:
+    if not TTS_TELEPHONY_AUDIO:
+        return tts_cache.lookup(key)
+    path = telephony_cache.lookup(cache_key({"source": key, **TELEPHONY_PROFILE}))
+    if path:
+        return path
+    source_path = tts_cache.lookup(key)
+    if source_path is None:
+        return None
+    # Source cached before transcoding was enabled (or with another profile)
+    with open(source_path, "rb") as fh:
+        return telephony_audio(key, fh.read(), source_path)
+
+
+def telephony_audio(key: str, audio: bytes, source_path: str) -> str:
+    """Store and return the 8 kHz mu-law copy of synthesized audio, or the source if it isn't WAV."""
+    from audio import telephony_wav
+
+    try:
+        with STAGE_SECONDS.time(stage="transcode", vendor="local", language=""):
+            data = telephony_wav(
+                audio,
+                rate=TELEPHONY_PROFILE["rate"],
+                target_dbfs=TELEPHONY_PROFILE["loudness_dbfs"],
+                trim_db=TELEPHONY_PROFILE["trim_db"],
+            )
+    except ValueError as e:
+        log.warning("[TTS] Serving %s untranscoded: %s", os.path.basename(source_path), e)
+        return source_path
+    path = telephony_cache.put(cache_key({"source": key, **TELEPHONY_PROFILE}), data, ".wav")
+    log.debug("[TTS] Transcoded %d -> %d bytes: %s", len(audio), len(data), os.path.basename(path))
+    return path
+
+
+def synthesize_batch(items: Iterable[Tuple[str, str]],
+                     deadline_seconds: Optional[float] = None,
+                     background: Iterable[Tuple[str, str]] = ()) -> List[Optional[str]]:
+    """Synthesize several (text, language_code) items concurrently.
+
+    Returns one audio path per item, in order, or None for items that failed or
+    were not ready by the shared deadline. Cache hits never touch the executor,
+    and a late synthesis keeps running so it lands in the cache for next time.
+    ``background`` items are queued behind ``items`` and not waited for.
+    """
+    items = list(items)
+    deadline_seconds = TTS_BATCH_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds
+    left = remaining()
+    if left is not None:
+        deadline_seconds = max(0.0, min(deadline_seconds, left))
+    paths: Dict[Tuple[str, str], Optional[str]] = {}
+    futures: Dict[Tuple[str, str], Future] = {}
+
+    for item in items:
+        if item in paths or item in futures:
+            continue
+        cached = cached_tts(*item)
+        if cached:
+            paths[item] = cached
+        else:
+            futures[item] = tts_executor.submit(contextvars.copy_context().run, sarvam_tts, *item)
+    for item in dict.fromkeys(background):
+        if item not in paths and item not in futures:
+            tts_executor.submit(contextvars.copy_context().run, _background_tts, *item)
+
+    if futures:
+        wait(futures.values(), timeout=deadline_seconds)
+        for item, future in futures.items():
+            if not future.done():
+                log.warning("[TTS] Missed %.1fs batch deadline (%s): '%s'", deadline_seconds, item[1], item[0])
+                paths[item] = None
+            elif isinstance(future.exception(), CircuitOpenError):
+                log.debug("[TTS] Skipped batch item, circuit open (%s): '%s'", item[1], item[0])
+                paths[item] = None
+            elif future.exception() is not None:
+                log.error("[TTS] Batch item failed (%s): %s", item[1], future.exception())
+                paths[item] = None
+            else:
+                paths[item] = future.result()
+
+    return [paths[item] for item in items]
+
+
+def _background_tts(text: str, language_code: str) -> None:
+    with deadline_scope(WEBHOOK_DEADLINE_SECONDS):
+        try:
+            sarvam_tts(text, language_code)
+        except CircuitOpenError:
+            log.debug("[TTS] Skipped background chunk, circuit open (%s): '%s'", language_code, text)
+        except Exception as e:
+            log.error("[TTS] Background chunk failed (%s): %s", language_code, e)
+
+
+def prompt_chunks(text: str) -> List[str]:
+    """The pieces text is synthesized in: its sentence chunks with TTS_CHUNKED, else the whole text."""
+    if not TTS_CHUNKED:
+        return [text]
+    return split_sentences(text, TTS_CHUNK_MAX_CHARS, TTS_CHUNK_MIN_CHARS) or [text]
+
+
+def replies_url(path: str) -> str:
+    return f"{BASE_URL}/replies/{os.path.basename(path)}"
+
+
+def synthesize_chunked(items: Iterable[Tuple[str, str]]) -> List[Optional[List[str]]]:
+    """Synthesize (text, language_code) items chunk by chunk and return their audio URLs.
+
+    Each item gets the URLs of its chunks, to be played in order, or None if its
+    first chunk has no audio by the batch deadline. Only first chunks are waited
+    for: later chunks that aren't cached yet are synthesized in the background and
+    handed out as /tts/chunk URLs, which serve them once they are ready.
+    """
+    firsts: List[Tuple[str, str]] = []
+    later: List[Tuple[str, str]] = []
+    later_urls: List[List[str]] = []
+    for text, lang_code in items:
+        chunks = prompt_chunks(text)
+        firsts.append((chunks[0], lang_code))
+        urls = []
+        for chunk in chunks[1:]:
+            path = cached_tts(chunk, lang_code)
+            if path:
+                urls.append(replies_url(path))
+                continue
+            key = cache_key(tts_payload(chunk, lang_code))
+            tts_chunks.set(key, {"text": chunk, "language": lang_code})
+            later.append((chunk, lang_code))
+            urls.append(f"{BASE_URL}/tts/chunk/{key}")
+        later_urls.append(urls)
+
+    paths = synthesize_batch(firsts, background=later)
+    return [[replies_url(path)] + urls if path else None for path, urls in zip(paths, later_urls)]
+
+
+def render_screen(state: str, language: str, mode: str, route: str) -> bytes:
+    """Fill a flow screen's TwiML template with its prompts' audio."""
+    return fill_template(call_flow.template(state, language, mode), language, route)
+
+
+def fill_template(template: Template, language: str, route: str,
+                  urls: Optional[List[Optional[List[str]]]] = None) -> bytes:
+    """Fill a compiled template's slots with audio.
+
+    The prompts are synthesized together (see synthesize_chunked) unless their
+    ``urls`` are given; any without audio are spoken with the <Say> fallback
+    compiled into the template.
+    """
+    if urls is None:
+        lang_code = LANGUAGES[language]["code"]
+        urls = synthesize_chunked([(slot.text, lang_code) for slot in template.slots]) if template.slots else []
+    twiml, said = template.render(urls)
+    for _ in said:
+        SAY_FALLBACKS.inc(route=route, language=language)
+    if said:
+        events.annotate(fallback="no_audio", fallback_prompts=[slot.prompt for slot in said])
+    return twiml
+
+
+def continue_call(vr: VoiceResponse, language: str, route: str,
+                  menu_urls: Optional[List[Optional[List[str]]]] = None) -> str:
+    """Finish a reply with the continue menu and return the TwiML.
+
+    With FLOW_INLINE the menu's verbs are appended (``menu_urls`` are its
+    prompts' audio, if already synthesized); otherwise the call is redirected
+    to /twilio/continue.
+    """
+    if not FLOW_INLINE:
+        vr.redirect(call_flow.url("continue"))
+        return str(vr)
+    menu = fill_template(call_flow.fragment("continue", language, "record"), language, route, menu_urls)
+    xml = str(vr)
+    return xml[:xml.rindex("</Response>")] + menu.decode("utf-8") + "</Response>"
+
+
+def say_error(vr: VoiceResponse, language: str, route: str) -> None:
+    """Apologize without calling Sarvam: <Say> for en/hi, the cached error prompt for Telugu."""
+    SAY_FALLBACKS.inc(route=route, language=language)
+    events.annotate(fallback="error")
+    text = LANGUAGE_PROMPTS[language]["error"]
+    if language in SAY_LANGUAGES:
+        vr.say(text, language=LANGUAGES[language]["code"])
+        return
+    audio_path = cached_tts(text, LANGUAGES[language]["code"])
+    if audio_path:
+        vr.play(f"{BASE_URL}/replies/{os.path.basename(audio_path)}")
+    else:
+        vr.say(LANGUAGE_PROMPTS["en"]["error"], language="en-IN")
+
+
+def _sarvam_tts_request(payload: dict) -> Tuple[bytes, str]:
+    """Call Sarvam TTS and return the decoded audio bytes and file extension."""
+    if not (SARVAM_API_KEY and SARVAM_TTS_URL):
+        raise RuntimeError("Sarvam TTS not configured")
+
+    headers = {
+        "Authorization": f"Bearer {SARVAM_API_KEY}",
+        "Content-Type": "application/json"
+    }
+
+    log_payload(log, f"[TTS] Request to {SARVAM_TTS_URL}", payload)
 
     resp = None
+    started = time.monotonic()
     try:
-        resp = requests.post(SARVAM_TTS_URL, headers=headers, json=payload, timeout=60)
-        print(f"[DEBUG TTS] Response status: {resp.status_code}")
-        print(f"[DEBUG TTS] Response headers: {dict(resp.headers)}")
-        print(f"[DEBUG TTS] Response body (first 2000 chars): {resp.text[:2000]}")
+        resp = sarvam_call("tts", lambda timeout: http.post(SARVAM_TTS_URL, headers=headers, json=payload,
+                                                            timeout=timeout))
+        log.debug("[TTS] Response status: %s", resp.status_code)
         resp.raise_for_status()
         data = resp.json()
+        tts_latency.observe(time.monotonic() - started)
+        log_payload(log, "[TTS] Response", data)
+    except CircuitOpenError:
+        raise
     except Exception as e:
-        print(f"[ERROR TTS] Request failed: {str(e)}")
         if resp is not None:
-            print(f"[ERROR TTS] Status: {resp.status_code}")
-            print(f"[ERROR TTS] Body: {resp.text}")
+            log.error("[TTS] Request failed: %s (status %s): %s", e, resp.status_code, scrub(resp.text[:500]))
+        else:
+            log.error("[TTS] Request failed: %s", e)
         raise
 
     # Extract audio from response
     audio_b64 = None
     audio_mime = None
 
-    print(f"[DEBUG TTS] Parsing response, keys: {list(data.keys())}")
-
     # Try to find audio in response
     audios = data.get("audios")
     if audios:
-        print(f"[DEBUG TTS] Found 'audios' key with {len(audios)} items")
         first = audios[0]
-        print(f"[DEBUG TTS] First audio item type: {type(first)}")
-        
         if isinstance(first, dict):
-            print(f"[DEBUG TTS] First audio item keys: {list(first.keys())}")
             audio_b64 = first.get("audio") or first.get("data") or first.get("base64")
             audio_mime = first.get("mime") or first.get("format")
         elif isinstance(first, str):
@@ -216,25 +954,20 @@ def sarvam_tts(text: str, language_code: str = "en-IN") -> str:
     if not audio_b64:
         for k in ("audio", "audio_base64", "base64_audio", "file"):
             if k in data:
-                print(f"[DEBUG TTS] Found audio in key: {k}")
                 audio_b64 = data[k]
                 break
 
     if not audio_b64:
-        print(f"[ERROR TTS] No audio base64 found in response!")
-        print(f"[ERROR TTS] Full response: {data}")
+        log.error("[TTS] No audio base64 found in response: %s", redact(data))
         raise RuntimeError("No audio returned from TTS")
 
-    print(f"[DEBUG TTS] Audio base64 length: {len(audio_b64)} chars")
-    print(f"[DEBUG TTS] Audio MIME type: {audio_mime}")
-
     # Decode and determine file extension
     try:
         audio_bytes = base64.b64decode(audio_b64)
-        print(f"[DEBUG TTS] Decoded audio bytes: {len(audio_bytes)} bytes")
     except Exception as e:
-        print(f"[ERROR TTS] Failed to decode base64: {e}")
+        log.error("[TTS] Failed to decode base64 (%d chars): %s", len(audio_b64), e)
         raise
+    log.debug("[TTS] Decoded %d audio bytes, MIME type: %s", len(audio_bytes), audio_mime)
 
     ext = ".wav"
     if audio_mime:
@@ -243,64 +976,135 @@ def sarvam_tts(text: str, language_code: str = "en-IN") -> str:
     # Check magic bytes
     if audio_bytes[:3] == b"ID3" or audio_bytes[:2] == b"\xff\xfb":
         ext = ".mp3"
-        print(f"[DEBUG TTS] Detected MP3 format from magic bytes")
     elif audio_bytes[:4] == b"RIFF" and audio_bytes[8:12] == b"WAVE":
         ext = ".wav"
-        print(f"[DEBUG TTS] Detected WAV format from magic bytes")
 
-    filename = f"reply_{uuid.uuid4().hex}{ext}"
-    path = os.path.join(REPLIES_DIR, filename)
-    
-    try:
-        with open(path, "wb") as f:
-            f.write(audio_bytes)
-        print(f"[DEBUG TTS] Successfully wrote file: {path}")
-        print(f"[DEBUG TTS] File size: {os.path.getsize(path)} bytes")
-    except Exception as e:
-        print(f"[ERROR TTS] Failed to write file: {e}")
-        raise
+    return audio_bytes, ext
 
-    # Verify file was created
-    if not os.path.exists(path):
-        print(f"[ERROR TTS] File does not exist after writing: {path}")
-        raise RuntimeError(f"Failed to create audio file: {path}")
 
-    print(f"[DEBUG TTS] ===== TTS COMPLETED SUCCESSFULLY =====")
-    return path
+def prewarm_tts_cache() -> None:
+    """Synthesize every static prompt for every language into the TTS cache."""
+    for language, prompts in LANGUAGE_PROMPTS.items():
+        lang_code = LANGUAGES[language]["code"]
+        for prompt_key in STATIC_PROMPT_KEYS:
+            try:
+                for chunk in prompt_chunks(prompts[prompt_key]):
+                    sarvam_tts(chunk, lang_code)
+            except Exception as e:
+                log.error("[PREWARM] %s/%s: %s", language, prompt_key, e)
+    log.info("[PREWARM] TTS cache ready: %s", tts_cache.stats())
+
+
+def open_vendor_connections() -> None:
+    """Put one keep-alive connection to each vendor host into the pool."""
+    urls = [SARVAM_STT_URL, SARVAM_TTS_URL]
+    if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
+        urls.append(TWILIO_API_BASE_URL or "https://api.twilio.com")
+    hosts = {}
+    for url in filter(None, urls):
+        parsed = requests.utils.urlparse(url)
+        hosts.setdefault(f"{parsed.scheme}://{parsed.netloc}", url)
+    for url in hosts.values():
+        try:
+            # Any answer will do; the connection stays in the pool for the first real call
+            http.request("HEAD", url, timeout=bounded_timeout(SARVAM_TIMEOUT)).close()
+        except Exception as e:
+            log.warning("[WARMUP] Could not reach %s: %s", url, e)
+
+
+def warm_up() -> None:
+    """Get this process ready for its first caller before it accepts traffic.
+
+    Imports the modules deferred at startup, builds the Twilio client, opens
+    vendor connections and loads every static prompt's audio into the TTS
+    cache's memory tier, synthesizing the ones that aren't cached yet.
+    Everything shares a WARMUP_TIMEOUT_SECONDS budget; prompts still missing
+    when it runs out are synthesized in the background as usual.
+    """
+    started = time.perf_counter()
+    with deadline_scope(WARMUP_TIMEOUT_SECONDS):
+        import audio  # noqa: F401
+        import media_stream  # noqa: F401
+
+        twilio_client()
+        open_vendor_connections()
+        items = [(chunk, LANGUAGES[language]["code"])
+                 for language, prompts in LANGUAGE_PROMPTS.items() for key in STATIC_PROMPT_KEYS
+                 for chunk in prompt_chunks(prompts[key])]
+        if SARVAM_API_KEY and SARVAM_TTS_URL:
+            paths = synthesize_batch(items)
+        else:
+            paths = [cached_tts(*item) for item in items]
+    log.info("[WARMUP] Ready in %.2fs, %d/%d prompt chunks cached: %s", time.perf_counter() - started,
+             sum(1 for path in paths if path), len(items), tts_cache.stats())
 
 
 def process_user_query(user_text: str, language: str = "en") -> str:
     """Process user query and provide relevant EB information."""
-    user_text = (user_text or "").strip().lower()
-    
-    print(f"[DEBUG QUERY] Language: {language}, Text: '{user_text}'")
-    
-    if not user_text:
-        return LANGUAGE_PROMPTS[language]["no_input"]
-    
-    if any(word in user_text for word in ["bill", "payment", "dues", "pay", "बिल", "भुगतान", "బిల్", "బిల్లు", "చెల్లింపు"]):
-        if language == "hi":
-            return f"बिल भुगतान के लिए {HYDERABAD_EB_INFO['customer_care']} पर संपर्क करें।"
-        elif language == "te":
-            return f"బిల్లు చెల్లింపు కోసం {HYDERABAD_EB_INFO['customer_care']} కు కాల్ చేయండి।"
-        else:
-            return f"For bill payment, contact {HYDERABAD_EB_INFO['customer_care']}."
-    
-    elif any(word in user_text for word in ["connection", "new", "कनेक्शन", "నया", "కనెక్షన్", "కొత్త"]):
-        if language == "hi":
-            return f"नए कनेक्शन के लिए {HYDERABAD_EB_INFO['toll_free']} पर कॉल करें।"
-        elif language == "te":
-            return f"కొత్త కనెక్షన్ కోసం {HYDERABAD_EB_INFO['toll_free']} కు కాల్ చేయండి।"
-        else:
-            return f"For new connection, call {HYDERABAD_EB_INFO['toll_free']}."
-    
-    else:
-        if language == "hi":
-            return f"अधिक जानकारी के लिए {HYDERABAD_EB_INFO['website']} पर जाएं।"
-        elif language == "te":
-            return f"మరింత సమాచారం కోసం {HYDERABAD_EB_INFO['website']} ని సందర్శించండి।"
+    with STAGE_SECONDS.time(stage="query", vendor="local", language=language) as labels, events.timed("query_ms"):
+        user_text = (user_text or "").strip()
+
+        log.debug("[QUERY] Language: %s, Text: '%s'", language, user_text)
+
+        if EVENT_LOG_TRANSCRIPTS:
+            events.annotate(transcript=user_text)
+        if not user_text:
+            labels["outcome"] = "no_input"
+            events.annotate(outcome="no_input")
+            return LANGUAGE_PROMPTS[language]["no_input"]
+
+        match = intent_engine.match(user_text)
+        if match:
+            log.debug("[QUERY] Intent: %s, score: %s, keywords: %s", match.intent.name, match.score, match.keywords)
+            events.annotate(intent=match.intent.name, score=match.score, outcome="ok")
         else:
-            return f"For more information, visit {HYDERABAD_EB_INFO['website']}."
+            log.debug("[QUERY] No intent matched, using fallback")
+            labels["outcome"] = "no_match"
+            events.annotate(outcome="no_match")
+        return intent_engine.reply(match, language, **HYDERABAD_EB_INFO)
+
+
+@app.before_request
+def bind_request_call():
+    """Tag every log record of this request with the CallSid and a request id."""
+    g.request_started = time.perf_counter()
+    # Servers without the gunicorn.conf.py hook (flask run, bare gunicorn) start them here
+    start_services()
+    bind_call(request.values.get("CallSid"), request.headers.get("X-Request-Id"))
+    g.event = events.begin()
+    # The Media Streams socket outlives any budget; its turns set their own
+    webhook = request.path.startswith("/twilio/") and request.path != "/twilio/stream"
+    set_deadline(WEBHOOK_DEADLINE_SECONDS if webhook else None)
+
+
+@app.after_request
+def observe_request(response):
+    started = g.get("request_started")
+    if started is not None and request.url_rule is not None:
+        WEBHOOK_SECONDS.observe(time.perf_counter() - started, route=request.url_rule.rule,
+                                method=request.method, status=response.status_code)
+        call_sid = request.values.get("CallSid")
+        if request.path.startswith(EVENT_ROUTE_PREFIXES):
+            event_log.emit("webhook", call_sid=call_sid, route=request.url_rule.rule,
+                           method=request.method, status=response.status_code,
+                           ms=round((time.perf_counter() - started) * 1000, 1), **g.get("event", {}))
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus text exposition, aggregated across workers."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/debug/trace/<call_sid>", methods=["POST", "DELETE"])
+def trace_call(call_sid):
+    """Switch DEBUG logging on (POST) or off (DELETE) for one call."""
+    traced = request.method == "POST"
+    # Kept apart from the call's own state so /twilio/voice can't overwrite it
+    call_states.set(f"trace:{call_sid}", {"trace": traced})
+    log.info("[TRACE] Tracing %s for call %s", "enabled" if traced else "disabled", call_sid)
+    return jsonify({"call_sid": call_sid, "trace": traced}), 200
 
 
 @app.route("/", methods=["GET"])
@@ -308,10 +1112,29 @@ def index():
     return "Hyderabad EB IVR System - Diagnostic Mode", 200
 
 
+@app.route("/stats", methods=["GET"])
+def stats():
+    """Runtime counters for diagnostics."""
+    return jsonify({
+        "tts_cache": tts_cache.stats(),
+        "telephony_cache": telephony_cache.stats(),
+        "replies_sweeper": replies_sweeper.stats(),
+        "transport": http.stats(),
+        "call_states": call_states.stats(),
+        "recording_results": recording_results.stats(),
+        "tts_chunks": tts_chunks.stats(),
+        "event_log": event_log.stats(),
+        "tts_flights": tts_flights.stats(),
+        "logging": {"dropped": dropped_records()},
+        "breakers": {name: breaker.stats() for name, breaker in breakers.items()},
+        "tts_hedge_after": tts_latency.percentile(TTS_HEDGE_PERCENTILE) if TTS_HEDGE_PERCENTILE > 0 else None,
+    }), 200
+
+
 @app.route("/test-tts/<language>", methods=["GET"])
 def test_tts(language):
     """Test endpoint to verify TTS is working."""
-    print(f"\n[TEST] Testing TTS for language: {language}")
+    log.info("[TEST] Testing TTS for language: %s", language)
     
     lang_map = {"en": "en-IN", "hi": "hi-IN", "te": "te-IN"}
     lang_code = lang_map.get(language, "en-IN")
@@ -322,107 +1145,561 @@ def test_tts(language):
         audio_path = sarvam_tts(test_text, lang_code)
         return send_file(audio_path, mimetype="audio/wav")
     except Exception as e:
-        print(f"[TEST ERROR] {str(e)}")
+        log.error("[TEST] %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/tts/chunk/<key>", methods=["GET", "HEAD"])
+def tts_chunk(key):
+    """Serve a later chunk of a chunked prompt, synthesizing it if it isn't ready yet."""
+    if not re.fullmatch(r"[0-9a-f]{64}", key):
+        return "Unknown chunk", 404
+
+    path = _cached_audio(key)
+    if path is None:
+        entry = tts_chunks.get(key)
+        if entry is None:
+            return "Unknown chunk", 404
+        log.debug("[TTS] Chunk requested before its background synthesis finished (%s)", entry["language"])
+        try:
+            with deadline_scope(WEBHOOK_DEADLINE_SECONDS):
+                path = sarvam_tts(entry["text"], entry["language"])
+        except Exception as e:
+            log.error("[TTS] Chunk failed (%s): %s", entry["language"], e)
+            return "TTS unavailable", 503
+    return serve_reply(os.path.basename(path))
+
+
+def count_interaction(call_state: dict) -> None:
+    call_state["interaction_count"] = call_state.get("interaction_count", 0) + 1
+
+
+def count_webhook(call_state: dict) -> None:
+    call_state["webhooks"] = call_state.get("webhooks", 0) + 1
+
+
+def webhook_call_state(call_sid: Optional[str], change: Optional[StateUpdater] = None,
+                       default: Optional[dict] = None) -> dict:
+    """Apply a webhook's change to its call's state and count the webhook, in one write.
+
+    Each Twilio webhook of a call (status callbacks and the media stream aside)
+    goes through here once, so ``webhooks`` ends up as the call's round trips.
+    """
+    default = default if default is not None else {"language": "en", "interaction_count": 0}
+
+    def apply(call_state: dict) -> None:
+        if change is not None:
+            change(call_state)
+        count_webhook(call_state)
+
+    if not call_sid:
+        call_state = dict(default)
+        if change is not None:
+            change(call_state)
+        return call_state
+    return call_states.update(call_sid, apply, default=default)
+
+
+def stream_turn(session: "MediaStreamSession", utterance) -> Optional[Union[bytes, Iterator[bytes]]]:
+    """Answer one utterance from a Media Stream and return mu-law reply audio.
+
+    With TTS_CHUNKED the reply's chunks are synthesized concurrently and the
+    audio is returned as a generator, so each chunk is sent as soon as it and
+    the ones before it are ready.
+    """
+    from audio import write_wav
+    from media_stream import STREAM_SAMPLE_RATE
+
+    call_sid = session.call_sid
+    call_state = call_states.get(call_sid, {"language": "en", "interaction_count": 0})
+    language = session.parameters.get("language") or call_state["language"] or "en"
+    if language not in LANGUAGES:
+        language = "en"
+    lang_code = LANGUAGES[language]["code"]
+
+    wav_bytes = write_wav(utterance, STREAM_SAMPLE_RATE)
+    with deadline_scope(WEBHOOK_DEADLINE_SECONDS), \
+            event_log.record("turn", call_sid=call_sid, mode="stream", language=language,
+                             audio_seconds=round(len(utterance) / STREAM_SAMPLE_RATE, 2)):
+        user_text = sarvam_stt_stream([wav_bytes], lang_code, filename="utterance.wav")
+        reply_text = process_user_query(user_text, language)
+        log.debug("[STREAM] Reply text: '%s'", reply_text)
+
+        if TTS_CHUNKED:
+            # The turn's tts_ms is left out: the chunks are still being synthesized when it ends
+            futures = [tts_executor.submit(contextvars.copy_context().run, sarvam_tts, chunk, lang_code)
+                       for chunk in prompt_chunks(reply_text)]
+            deadline = time.monotonic() + (remaining() or 0.0)
+        else:
+            with events.timed("tts_ms"):
+                reply_path = sarvam_tts(reply_text, lang_code)
+
+    call_states.update(call_sid, count_interaction, default={"language": language, "interaction_count": 0})
+    if TTS_CHUNKED:
+        return (stream_audio(future.result(timeout=max(0.0, deadline - time.monotonic()))) for future in futures)
+    return stream_audio(reply_path)
+
+
+def stream_error_audio(session: "MediaStreamSession") -> Optional[bytes]:
+    """The cached error prompt for a failed Media Streams turn, without calling Sarvam."""
+    language = session.parameters.get("language") or call_states.get(session.call_sid, {}).get("language")
+    if language not in LANGUAGES:
+        language = "en"
+    SAY_FALLBACKS.inc(route="stream", language=language)
+    for fallback in dict.fromkeys((language, "en")):
+        path = cached_tts(LANGUAGE_PROMPTS[fallback]["error"], LANGUAGES[fallback]["code"])
+        if path:
+            return stream_audio(path)
+    return None
+
+
+def stream_audio(path: str) -> bytes:
+    """Read a TTS file as mu-law at the Media Streams sample rate."""
+    from audio import read_wav, resample, ulaw_encode
+    from media_stream import STREAM_SAMPLE_RATE
+
+    with open(path, "rb") as fh:
+        pcm, rate = read_wav(fh.read())
+    return ulaw_encode(resample(pcm, rate, STREAM_SAMPLE_RATE))
+
+
+@sock.route("/twilio/stream")
+def twilio_stream(ws):
+    """Media Streams WebSocket: VAD-segmented turns with replies on the same socket."""
+    from audio import EnergyVAD
+    from media_stream import STREAM_SAMPLE_RATE, MediaStreamSession
+
+    vad = EnergyVAD(sample_rate=STREAM_SAMPLE_RATE, end_ms=VAD_END_MS, threshold_db=VAD_THRESHOLD_DB)
+    session = MediaStreamSession(ws, stream_turn, stream_executor, vad=vad, on_error=stream_error_audio)
+    session.run()
+    log.info("[STREAM] Closed stream for call %s after %s turns", session.call_sid, session.turns)
+
+
 @app.route("/call", methods=["POST"])
 def initiate_call():
     """Create an outbound Twilio call."""
-    print(f"\n[CALL] Initiating call to {YOUR_PHONE_NUMBER}")
+    params = request.get_json(silent=True) or request.values
+    mode = params.get("mode") or DEFAULT_CALL_MODE
+    if mode not in CALL_MODES:
+        return jsonify({"error": f"Unknown mode '{mode}', expected one of {list(CALL_MODES)}"}), 400
+
+    log.info("[CALL] Initiating call to %s (mode: %s)", YOUR_PHONE_NUMBER, mode)
     
     client = twilio_client()
     if client is None:
         return jsonify({"error": "Twilio not configured"}), 500
 
-    voice_url = f"{BASE_URL}/twilio/voice"
-    print(f"[CALL] Voice URL: {voice_url}")
+    voice_url = f"{BASE_URL}/twilio/voice?mode={mode}"
+    log.debug("[CALL] Voice URL: %s", voice_url)
     
-    call = client.calls.create(to=YOUR_PHONE_NUMBER, from_=TWILIO_FROM, url=voice_url)
-    print(f"[CALL] Call SID: {call.sid}, Status: {call.status}")
+    call = client.calls.create(
+        to=YOUR_PHONE_NUMBER,
+        from_=TWILIO_FROM,
+        url=voice_url,
+        status_callback=f"{BASE_URL}/twilio/status",
+        status_callback_method="POST",
+    )
+    log.info("[CALL] Call SID: %s, Status: %s", call.sid, call.status)
     
-    return jsonify({"sid": call.sid, "status": call.status}), 201
+    return jsonify({"sid": call.sid, "status": call.status, "mode": mode}), 201
+
+
+def dial_campaign_target(campaign: dict, target: dict) -> str:
+    """Place one campaign call and return its Call SID."""
+    client = twilio_client()
+    if client is None:
+        raise RuntimeError("Twilio not configured")
+
+    call = client.calls.create(
+        to=target["phone"],
+        from_=TWILIO_FROM,
+        url=f"{BASE_URL}/twilio/language?language={target['language']}&mode={campaign['mode']}",
+        status_callback=f"{BASE_URL}/twilio/status?campaign={campaign['id']}&target={target['id']}",
+        status_callback_method="POST",
+    )
+    return call.sid
+
+
+def start_dialer(campaign: dict) -> Optional[Dialer]:
+    """Start (or return the running) dialer for a campaign; None if another worker owns it."""
+    with dialers_lock:
+        dialer = dialers.get(campaign["id"])
+        if dialer is None or not dialer.running:
+            dialer = Dialer(
+                campaign_store,
+                campaign["id"],
+                lambda target: dial_campaign_target(campaign, target),
+                max_concurrent=CAMPAIGN_MAX_CONCURRENT,
+                calls_per_second=CAMPAIGN_CALLS_PER_SECOND,
+                max_attempts=CAMPAIGN_MAX_ATTEMPTS,
+                backoff_seconds=CAMPAIGN_RETRY_BACKOFF,
+                lease_ttl=CAMPAIGN_LEASE_TTL,
+            )
+            if not dialer.start():
+                return None
+            dialers[campaign["id"]] = dialer
+        return dialer
+
+
+def resume_campaigns() -> None:
+    """Pick up running campaigns whose dialer has gone away (restart or dead worker)."""
+    for campaign_id in campaign_store.running():
+        dialer = dialers.get(campaign_id)
+        if dialer is not None and dialer.running:
+            continue
+        campaign = campaign_store.get(campaign_id)
+        if campaign and start_dialer(campaign):
+            log.info("[CAMPAIGN] Resumed campaign %s", campaign_id)
+
+
+def supervise_campaigns() -> None:
+    # A crashed owner's lease has to expire before anyone else may resume its campaign
+    while True:
+        try:
+            resume_campaigns()
+        except Exception:
+            log.exception("[CAMPAIGN] Resume failed")
+        time.sleep(CAMPAIGN_LEASE_TTL)
+
+
+@app.route("/campaigns", methods=["POST"])
+def create_campaign():
+    """Create a campaign from an uploaded or streamed CSV/JSONL list of numbers."""
+    upload = request.files.get("file")
+    if upload is not None:
+        stream = upload.stream
+        filename = upload.filename or ""
+    else:
+        # Copy the body first: the targets are inserted in one transaction, which
+        # mustn't hold the database while a slow client is still sending
+        stream = tempfile.SpooledTemporaryFile(max_size=CAMPAIGN_UPLOAD_MEMORY_MB * 1024 * 1024)
+        shutil.copyfileobj(request.stream, stream)
+        stream.seek(0)
+        filename = ""
+
+    fmt = request.args.get("format") or request.form.get("format")
+    if not fmt:
+        content_type = (upload.content_type if upload is not None else request.content_type) or ""
+        fmt = "jsonl" if filename.endswith((".jsonl", ".ndjson")) or "json" in content_type else "csv"
+
+    mode = request.args.get("mode") or request.form.get("mode") or DEFAULT_CALL_MODE
+    if mode not in CALL_MODES:
+        return jsonify({"error": f"Unknown mode '{mode}', expected one of {list(CALL_MODES)}"}), 400
+    name = request.args.get("name") or request.form.get("name") or filename
+
+    try:
+        targets = parse_targets(text_lines(stream), fmt, languages=LANGUAGES.keys())
+        campaign_id, accepted, rejected = campaign_store.create(name, mode, targets)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    log.info("[CAMPAIGN] Created %s (%s): %s targets, %s rejected", campaign_id, name, accepted, rejected)
+    return jsonify({"id": campaign_id, "targets": accepted, "rejected": rejected}), 201
+
+
+@app.route("/campaigns/<campaign_id>/start", methods=["POST"])
+def start_campaign(campaign_id):
+    campaign = campaign_store.get(campaign_id)
+    if campaign is None:
+        return jsonify({"error": "Campaign not found"}), 404
+    if twilio_client() is None:
+        return jsonify({"error": "Twilio not configured"}), 500
+    if start_dialer(campaign) is None:
+        return jsonify({"error": "Campaign is being dialed by another worker"}), 409
+    return jsonify({"id": campaign_id, "status": "running"}), 200
+
 
+@app.route("/campaigns/<campaign_id>/pause", methods=["POST"])
+def pause_campaign(campaign_id):
+    dialer = dialers.get(campaign_id)
+    if dialer is None or not dialer.running:
+        return jsonify({"error": "Campaign is not running in this worker"}), 409
+    dialer.stop()
+    return jsonify({"id": campaign_id, "status": "paused"}), 200
 
-@app.route("/twilio/voice", methods=["GET", "POST"])
-def twilio_voice():
-    """Initial TwiML: Ask for language selection."""
+
+@app.route("/campaigns/<campaign_id>", methods=["GET"])
+def campaign_status(campaign_id):
+    """Progress and live throughput for a campaign."""
+    campaign = campaign_store.get(campaign_id)
+    if campaign is None:
+        return jsonify({"error": "Campaign not found"}), 404
+    dialer = dialers.get(campaign_id)
+    return jsonify({
+        "id": campaign_id,
+        "name": campaign["name"],
+        "mode": campaign["mode"],
+        "status": campaign["status"],
+        "rejected": campaign["rejected"],
+        "targets": campaign_store.counts(campaign_id),
+        "dialer": dialer.stats() if dialer else None,
+    }), 200
+
+
+@app.route("/twilio/status", methods=["POST"])
+def twilio_status():
+    """Call status callback: drop state once the call has finished."""
     call_sid = request.values.get("CallSid")
-    print(f"\n[VOICE] Call started: {call_sid}")
-    
-    vr = VoiceResponse()
-    call_states[call_sid] = {"language": None, "interaction_count": 0}
-    
-    gather = Gather(num_digits=1, action=f"{BASE_URL}/twilio/language", method="POST", timeout=5)
-    gather.say(LANGUAGE_PROMPTS["en"]["welcome"], language="en-IN")
-    vr.append(gather)
-    vr.redirect(f"{BASE_URL}/twilio/voice")
-    
-    print(f"[VOICE] Sent TwiML: {str(vr)}")
-    return str(vr), 200, {"Content-Type": "application/xml"}
+    call_status = request.values.get("CallStatus")
+    log.info("[STATUS] Call: %s, Status: %s", call_sid, call_status)
+    events.annotate(call_status=call_status)
+
+    webhooks = None
+    if call_sid and call_status in TERMINAL_CALL_STATUSES:
+        webhooks = call_states.get(call_sid, {}).get("webhooks")
+        if webhooks:
+            CALL_WEBHOOKS.observe(webhooks)
+        call_states.delete(call_sid)
+
+        target_id = request.args.get("target", type=int)
+        if request.args.get("campaign") and target_id is not None:
+            result = campaign_store.record_result(
+                target_id, call_status, CAMPAIGN_MAX_ATTEMPTS, CAMPAIGN_RETRY_BACKOFF
+            )
+            log.info("[STATUS] Campaign %s target %s: %s", request.args.get('campaign'), target_id, result)
 
+    event_log.emit("call", call_sid=call_sid, call_status=call_status,
+                   call_duration=request.values.get("CallDuration", type=int),
+                   webhooks=webhooks, campaign=request.args.get("campaign"))
+    return "", 204
 
-@app.route("/twilio/language", methods=["POST"])
-def twilio_language():
-    """Handle language selection."""
+
+def flow_webhook(state: str):
+    """Answer a webhook of the declarative call flow (flow.json) from its compiled template."""
     call_sid = request.values.get("CallSid")
     digits = request.values.get("Digits")
+    spec = call_flow.states[state]
+
+    if spec.get("start_call"):
+        def start_call(call_state: dict) -> None:
+            # Keeps what isn't reset here, e.g. the webhook count of a call that comes back to the start
+            mode = request.values.get("mode") or call_state.get("mode")
+            call_state.update(language=None, interaction_count=0,
+                              mode=mode if mode in CALL_MODES else DEFAULT_CALL_MODE)
+
+        call_state = webhook_call_state(call_sid, start_call, default={})
+        log.info("[FLOW] Call started: %s (mode: %s)", call_sid, call_state["mode"])
+    elif "set_language" in spec:
+        language = spec["set_language"].get(digits, "en")
+        if request.values.get("language") in LANGUAGES:
+            # Campaign calls start here with the target's language preselected
+            language = request.values.get("language")
+        mode = request.values.get("mode")
+        call_state = webhook_call_state(
+            call_sid,
+            lambda call_state: call_state.update(language=language),
+            default={"interaction_count": 0, "mode": mode if mode in CALL_MODES else DEFAULT_CALL_MODE},
+        )
+        log.info("[FLOW] Selected language: %s", language)
+
+        error_text = LANGUAGE_PROMPTS[language]["error"]
+        if language not in SAY_LANGUAGES and not cached_tts(error_text, LANGUAGES[language]["code"]):
+            # No <Say> voice to apologize with if Sarvam fails later in the call
+            tts_executor.submit(contextvars.copy_context().run, sarvam_tts, error_text, LANGUAGES[language]["code"])
+    else:
+        call_state = webhook_call_state(call_sid)
+
+    language = call_state.get("language") or "en"
+    mode = call_state.get("mode") or DEFAULT_CALL_MODE
+    screen = call_flow.resolve(state, digits)
+    log.info("[FLOW] Call: %s, %s -> %s, Digits: %s, Language: %s", call_sid, state, screen, digits, language)
+    events.annotate(state=state, screen=screen, digits=digits, language=language, mode=mode)
+
+    twiml = render_screen(screen, language, mode, state)
+    log.debug("[FLOW] TwiML: %s", twiml)
+    return twiml, 200, {"Content-Type": "application/xml"}
+
+
+for _state in call_flow.states:
+    app.add_url_rule(f"/twilio/{_state}", endpoint=f"flow_{_state}", view_func=flow_webhook,
+                     defaults={"state": _state}, methods=["GET", "POST"])
+
+
+def recording_sid_for(recording_url: str) -> Optional[str]:
+    """The RecordingSid of a recording webhook, falling back to the one in its URL."""
+    sid = request.values.get("RecordingSid")
+    if sid:
+        return sid
+    name = recording_url.rstrip("/").rsplit("/", 1)[-1].split(".", 1)[0]
+    return name if name.startswith("RE") else None
+
+
+def answer_recording(call_sid: str, recording_url: str, language: str) -> str:
+    """Transcribe a caller recording, answer it and return the reply TwiML."""
+    lang_code = LANGUAGES[language]["code"]
+    vr = VoiceResponse()
+
+    # Download and transcribe; don't fetch a recording STT would reject anyway
+    require_sarvam("stt")
+    if RECORDING_PREPROCESS:
+        # Recordings are at most 60 s of 8 kHz audio (~1 MB), so buffering is cheap
+        with STAGE_SECONDS.time(stage="download", vendor="twilio", language=""):
+            with stream_twilio_recording(recording_url, audit=RECORDING_AUDIT) as chunks:
+                audio = b"".join(chunks)
+        user_text = sarvam_stt_stream([preprocess_recording(audio, lang_code)], lang_code)
+    elif RECORDING_STREAMING:
+        with stream_twilio_recording(recording_url, audit=RECORDING_AUDIT) as chunks:
+            user_text = sarvam_stt_stream(chunks, lang_code)
+    else:
+        audio_path = download_twilio_recording(recording_url)
+        user_text = sarvam_stt(audio_path, lang_code)
     
-    print(f"\n[LANGUAGE] Call: {call_sid}, Digits: {digits}")
+    # Process query
+    reply_text = process_user_query(user_text, language)
+    log.debug("[RECORDING] Reply text: '%s'", reply_text)
     
-    language_map = {"1": "en", "2": "hi", "3": "te"}
-    language = language_map.get(digits, "en")
+    # Generate response audio, and the inlined continue menu's prompts alongside it
+    menu_items = []
+    if FLOW_INLINE:
+        menu_items = [(slot.text, lang_code) for slot in call_flow.fragment("continue", language, "record").slots]
+    menu_urls = None
+    with events.timed("tts_ms"):
+        if TTS_CHUNKED or menu_items:
+            audio_urls, *menu_urls = synthesize_chunked([(reply_text, lang_code)] + menu_items)
+            if audio_urls is None:
+                raise RuntimeError("No audio for the reply")
+        else:
+            audio_urls = [replies_url(sarvam_tts(reply_text, lang_code))]
     
-    if call_sid in call_states:
-        call_states[call_sid]["language"] = language
-    else:
-        call_states[call_sid] = {"language": language, "interaction_count": 0}
+    log.debug("[RECORDING] Reply audio URLs: %s", audio_urls)
     
-    print(f"[LANGUAGE] Selected language: {language}")
+    for audio_url in audio_urls:
+        vr.play(audio_url)
     
-    vr = VoiceResponse()
+    call_states.update(call_sid, count_interaction, default={"language": language, "interaction_count": 0})
+    
+    twiml = continue_call(vr, language, "recording", menu_urls)
+    
+    log.debug("[RECORDING] Success! TwiML: %s", twiml)
+    return twiml
+
+
+def reply_once(recording_sid: str, build: Callable[[], str]) -> str:
+    """Run ``build`` at most once per RecordingSid, across workers, and return its TwiML.
+
+    A retry that finds the reply already stored returns it; one that arrives
+    while another attempt is running waits for that attempt (within the
+    deadline). A failed attempt is forgotten so the next retry starts over.
+    """
+    claimed = []
+
+    def claim(state: dict) -> None:
+        if state.get("status") is None or (state["status"] == "pending"
+                                           and time.time() - state["started"] > RECORDING_CLAIM_SECONDS):
+            state.clear()
+            state.update(status="pending", started=time.time())
+            claimed.append(True)
+
+    waited = False
+    while True:
+        entry = recording_results.get(recording_sid, {})
+        if entry.get("status") == "done":
+            log.info("[RECORDING] Replaying stored reply for %s", recording_sid)
+            RECORDING_DUPLICATES.inc(result="waited" if waited else "stored")
+            events.annotate(replayed=True)
+            return entry["twiml"]
+        if entry.get("status") != "pending" or time.time() - entry["started"] > RECORDING_CLAIM_SECONDS:
+            recording_results.update(recording_sid, claim, default={})
+            if claimed:
+                break
+            continue
+        left = remaining()
+        if left is not None and left <= RECORDING_RESULT_POLL_SECONDS:
+            raise DeadlineExceeded(f"Recording {recording_sid} is still being answered by another attempt")
+        waited = True
+        time.sleep(RECORDING_RESULT_POLL_SECONDS)
+
+    try:
+        twiml = build()
+    except Exception:
+        recording_results.delete(recording_sid)
+        raise
+    recording_results.set(recording_sid, {"status": "done", "twiml": twiml})
+    return twiml
+
+
+def build_recording_reply(call_sid: str, recording_url: str, language: str,
+                          recording_sid: Optional[str] = None) -> str:
+    """Return the reply TwiML for a caller recording, or an apology if it can't be answered.
+
+    With a ``recording_sid`` the work is done once per recording (see reply_once).
+    """
+    try:
+        with event_log.record("turn", call_sid=call_sid, mode="record", language=language,
+                              recording_sid=recording_sid):
+            if recording_sid and RECORDING_RESULT_TTL > 0:
+                return reply_once(recording_sid, lambda: answer_recording(call_sid, recording_url, language))
+            return answer_recording(call_sid, recording_url, language)
+    except Exception:
+        log.exception("[RECORDING] Failed to answer recording for call %s", call_sid)
+        vr = VoiceResponse()
+        say_error(vr, language, "recording")
+        return continue_call(vr, language, "recording")
+
+
+def hold_response(language: str) -> VoiceResponse:
+    """TwiML that keeps the caller waiting while a deferred reply is prepared.
+
+    If the worker never redirects the call (missed deadline, crash), the pause
+    runs out and the caller falls through to the continue menu.
+    """
     lang_code = LANGUAGES[language]["code"]
-    greeting_text = LANGUAGE_PROMPTS[language]["greeting"]
+    wait_text = LANGUAGE_PROMPTS[language]["please_wait"]
+
+    vr = VoiceResponse()
+    wait_audio = cached_tts(wait_text, lang_code)
+    if wait_audio:
+        vr.play(f"{BASE_URL}/replies/{os.path.basename(wait_audio)}")
+    elif language in SAY_LANGUAGES:
+        SAY_FALLBACKS.inc(route="hold", language=language)
+        events.annotate(fallback="no_audio")
+        vr.say(wait_text, language=lang_code)
+    vr.pause(length=ASYNC_DEADLINE_SECONDS)
+    vr.say("Sorry, that is taking longer than expected.", language="en-IN")
+    # Only reached if the deferred reply never arrives, so the menu isn't rendered up front
+    vr.redirect(f"{BASE_URL}/twilio/continue")
+    return vr
+
+
+def deferred_recording_reply(call_sid: str, recording_url: str, language: str, deadline: float,
+                             recording_sid: Optional[str] = None) -> None:
+    """Worker body for async mode: build the reply, then redirect the live call to it."""
+    with deadline_scope(deadline - time.monotonic()):
+        twiml = build_recording_reply(call_sid, recording_url, language, recording_sid)
 
-    print(f"[LANGUAGE] Generating greeting TTS for: {language}")
-    print(f"[LANGUAGE] Greeting text: '{greeting_text}'")
+    if time.monotonic() > deadline:
+        # The hold TwiML has already moved the caller on; don't interrupt them
+        log.info("[RECORDING ASYNC] Missed deadline for call %s, dropping reply", call_sid)
+        return
+
+    client = twilio_client()
+    if client is None:
+        log.error("[RECORDING ASYNC] Twilio not configured, cannot update call %s", call_sid)
+        return
 
     try:
-        # Generate TTS audio
-        greeting_audio = sarvam_tts(greeting_text, lang_code)
-        greeting_url = f"{BASE_URL}/replies/{os.path.basename(greeting_audio)}"
-        
-        print(f"[LANGUAGE] Generated audio file: {greeting_audio}")
-        print(f"[LANGUAGE] Audio URL: {greeting_url}")
-        
-        vr.play(greeting_url)
-        print(f"[LANGUAGE] Added Play instruction to TwiML")
-        
+        client.calls(call_sid).update(twiml=twiml)
+        log.info("[RECORDING ASYNC] Updated call %s with reply", call_sid)
     except Exception as e:
-        print(f"[LANGUAGE ERROR] TTS failed: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        
-        # Fallback
-        if language in ["en", "hi"]:
-            vr.say(greeting_text, language=lang_code)
-            print(f"[LANGUAGE] Using fallback Say for {language}")
-        else:
-            vr.say("Sorry, there was an error. Please try again.", language="en-IN")
-            print(f"[LANGUAGE] Using English fallback due to error")
-    
-    # Record user query
-    vr.record(action=f"{BASE_URL}/twilio/recording", method="POST", max_length=60, play_beep=True, timeout=5)
-    
-    if language in ["en", "hi"]:
-        vr.say(LANGUAGE_PROMPTS[language]["no_input"], language=lang_code)
-    else:
-        vr.say("I did not receive input.", language="en-IN")
-    
-    vr.redirect(f"{BASE_URL}/twilio/continue")
-    
-    print(f"[LANGUAGE] Final TwiML: {str(vr)}")
-    return str(vr), 200, {"Content-Type": "application/xml"}
+        log.error("[RECORDING ASYNC] Call update failed for %s: %s", call_sid, e)
+
+
+def claim_deferral(recording_sid: str) -> bool:
+    """Mark a recording's reply as deferred; False if an earlier attempt already did.
+
+    Taken atomically before the job is queued, so a retry that arrives before
+    the first job has started can't queue a second one.
+    """
+    claimed = []
+
+    def claim(state: dict) -> None:
+        if not state.get("deferred"):
+            state["deferred"] = True
+            claimed.append(True)
+
+    # Kept apart from the reply itself, which reply_once clears and rewrites
+    recording_results.update(f"deferred:{recording_sid}", claim, default={})
+    return bool(claimed)
 
 
 @app.route("/twilio/recording", methods=["POST"])
@@ -431,148 +1708,86 @@ def twilio_recording():
     call_sid = request.values.get("CallSid")
     recording_url = request.form.get("RecordingUrl") or request.values.get("RecordingUrl")
     
-    print(f"\n[RECORDING] Call: {call_sid}")
-    print(f"[RECORDING] URL: {recording_url}")
+    log.info("[RECORDING] Call: %s, URL: %s", call_sid, recording_url)
     
-    call_state = call_states.get(call_sid, {"language": "en", "interaction_count": 0})
+    call_state = webhook_call_state(call_sid)
     language = call_state["language"]
-    lang_code = LANGUAGES[language]["code"]
-    
-    print(f"[RECORDING] Language: {language}")
     
-    vr = VoiceResponse()
+    log.info("[RECORDING] Language: %s", language)
     
     if not recording_url:
-        print(f"[RECORDING] No recording URL provided")
+        log.info("[RECORDING] No recording URL provided")
+        vr = VoiceResponse()
         vr.say("No recording received.", language="en-IN")
-        vr.redirect(f"{BASE_URL}/twilio/continue")
-        return str(vr), 200, {"Content-Type": "application/xml"}
+        return continue_call(vr, language, "recording"), 200, {"Content-Type": "application/xml"}
 
-    try:
-        # Download and transcribe
-        audio_path = download_twilio_recording(recording_url)
-        user_text = sarvam_stt(audio_path, lang_code)
-        
-        # Process query
-        reply_text = process_user_query(user_text, language)
-        print(f"[RECORDING] Reply text: '{reply_text}'")
-        
-        # Generate response audio
-        reply_audio_path = sarvam_tts(reply_text, lang_code)
-        audio_url = f"{BASE_URL}/replies/{os.path.basename(reply_audio_path)}"
-        
-        print(f"[RECORDING] Reply audio URL: {audio_url}")
-        
-        vr.play(audio_url)
-        
-        call_state["interaction_count"] += 1
-        call_states[call_sid] = call_state
-        
-        vr.redirect(f"{BASE_URL}/twilio/continue")
-        
-        print(f"[RECORDING] Success! TwiML: {str(vr)}")
-        return str(vr), 200, {"Content-Type": "application/xml"}
+    recording_sid = recording_sid_for(recording_url)
+    events.annotate(language=language, recording_sid=recording_sid, deferred=bool(RECORDING_ASYNC and call_sid))
 
-    except Exception as e:
-        print(f"[RECORDING ERROR] {str(e)}")
-        import traceback
-        traceback.print_exc()
-        
-        vr.say("Sorry, there was an error processing your request.", language="en-IN")
-        vr.redirect(f"{BASE_URL}/twilio/continue")
+    if RECORDING_ASYNC and call_sid:
+        # A retry must not redirect the call a second time; the first attempt's job will
+        if recording_sid is None or RECORDING_RESULT_TTL <= 0 or claim_deferral(recording_sid):
+            deadline = time.monotonic() + ASYNC_DEADLINE_SECONDS
+            recording_executor.submit(contextvars.copy_context().run, deferred_recording_reply,
+                                      call_sid, recording_url, language, deadline, recording_sid)
+        else:
+            log.info("[RECORDING] Retry for %s, reply already deferred", recording_sid)
+        vr = hold_response(language)
+        log.debug("[RECORDING] Deferred reply, hold TwiML: %s", vr)
         return str(vr), 200, {"Content-Type": "application/xml"}
 
+    twiml = build_recording_reply(call_sid, recording_url, language, recording_sid)
+    return twiml, 200, {"Content-Type": "application/xml"}
 
-@app.route("/twilio/continue", methods=["GET", "POST"])
-def twilio_continue():
-    """Ask if user wants to continue."""
-    call_sid = request.values.get("CallSid")
-    call_state = call_states.get(call_sid, {"language": "en", "interaction_count": 0})
-    language = call_state["language"]
-    lang_code = LANGUAGES[language]["code"]
-    
-    print(f"\n[CONTINUE] Call: {call_sid}, Language: {language}")
-    
-    vr = VoiceResponse()
-    ask_more_text = LANGUAGE_PROMPTS[language]["ask_more"]
-    
-    try:
-        # Generate TTS for continuation prompt
-        ask_more_audio = sarvam_tts(ask_more_text, lang_code)
-        ask_more_url = f"{BASE_URL}/replies/{os.path.basename(ask_more_audio)}"
-        
-        gather = Gather(num_digits=1, action=f"{BASE_URL}/twilio/action", method="POST", timeout=5)
-        gather.play(ask_more_url)
-        vr.append(gather)
-        
-        print(f"[CONTINUE] Using TTS audio for prompt")
-        
-    except Exception as e:
-        print(f"[CONTINUE ERROR] {str(e)}")
-        
-        gather = Gather(num_digits=1, action=f"{BASE_URL}/twilio/action", method="POST", timeout=5)
-        if language in ["en", "hi"]:
-            gather.say(ask_more_text, language=lang_code)
-        else:
-            gather.say("Press 1 to continue, 2 to change language, or 3 to end.", language="en-IN")
-        vr.append(gather)
-    
-    # Default: end call
-    try:
-        goodbye_audio = sarvam_tts(LANGUAGE_PROMPTS[language]["goodbye"], lang_code)
-        goodbye_url = f"{BASE_URL}/replies/{os.path.basename(goodbye_audio)}"
-        vr.play(goodbye_url)
-    except:
-        if language in ["en", "hi"]:
-            vr.say(LANGUAGE_PROMPTS[language]["goodbye"], language=lang_code)
-        else:
-            vr.say("Thank you. Goodbye.", language="en-IN")
-    
-    vr.hangup()
-    
-    return str(vr), 200, {"Content-Type": "application/xml"}
 
+# pid of the process whose background services are running
+_services_pid: Optional[int] = None
+_services_lock = threading.Lock()
 
-@app.route("/twilio/action", methods=["POST"])
-def twilio_action():
-    """Handle user's next action choice."""
-    call_sid = request.values.get("CallSid")
-    digits = request.values.get("Digits")
-    call_state = call_states.get(call_sid, {"language": "en", "interaction_count": 0})
-    language = call_state["language"]
-    lang_code = LANGUAGES[language]["code"]
-    
-    print(f"\n[ACTION] Call: {call_sid}, Digits: {digits}, Language: {language}")
-    
-    vr = VoiceResponse()
-    
-    if digits == "1":
-        # Continue
-        print(f"[ACTION] User chose to continue")
-        try:
-            greeting_audio = sarvam_tts(LANGUAGE_PROMPTS[language]["greeting"], lang_code)
-            greeting_url = f"{BASE_URL}/replies/{os.path.basename(greeting_audio)}"
-            vr.play(greeting_url)
-        except:
-            if language in ["en", "hi"]:
-                vr.say(LANGUAGE_PROMPTS[language]["greeting"], language=lang_code)
-            else:
-                vr.say("How can I help you?", language="en-IN")
-        
-        vr.record(action=f"{BASE_URL}/twilio/recording", method="POST", max_length=60, play_beep=True, timeout=5)
-        vr.redirect(f"{BASE_URL}/twilio/continue")
-    
-    elif digits == "2":
-        # Change language
-        print(f"[ACTION] User chose to change language")
-        gather = Gather(num_digits=1, action=f"{BASE_URL}/twilio/language", method="POST", timeout=5)
-        gather.say("Press 1 for English, 2 for Hindi, 3 for Telugu.", language="en-IN")
-        vr.append(gather)
-        vr.redirect(f"{BASE_URL}/twilio/continue")
-    
-    elif digits == "3":
-        # End call
-        print(f"[ACTION] User chose to end call")
-        try:
-            goodbye_audio = sarvam_tts(LANGUAGE_PROMPTS[language]["goodbye"], lang_code)
-            goodbye_url = f"{BASE_URL}/replies/{os.path.basename}}
\ No newline at end of file
+
+def start_services() -> None:
+    """Start the background threads of the serving process. Safe to call again.
+
+    That is the log writer, the replies sweeper, the metrics and event log
+    flushers and the campaign supervisor. No thread runs after import, so the
+    module can be loaded once in the gunicorn master (``preload_app``) and
+    forked; each worker then starts its own.
+    """
+    global _services_pid
+    if _services_pid == os.getpid():
+        return
+    with _services_lock:
+        if _services_pid == os.getpid():
+            return
+        setup_logging()
+        replies_sweeper.start()
+        metrics.start()
+        event_log.start()
+
+        if CAMPAIGN_RESUME:
+            threading.Thread(target=supervise_campaigns, name="campaign-supervisor", daemon=True).start()
+
+        if TTS_PREWARM:
+            threading.Thread(target=prewarm_tts_cache, name="tts-prewarm", daemon=True).start()
+        _services_pid = os.getpid()
+
+
+def create_app() -> Flask:
+    """App factory for gunicorn: ``gunicorn -c gunicorn.conf.py 'app_new:create_app()'``.
+
+    Importing this module reads configuration and builds routes and caches. It
+    also touches the disk: it creates the SQLite files (call state, recording
+    results, TTS chunks, campaigns) and the replies, metrics and events
+    directories. It starts no threads and keeps no connections open, so it is
+    fork-safe. Background services and warm-up run later, per worker, from
+    the post_worker_init hook in gunicorn.conf.py.
+    """
+    return app
+
+
+if __name__ == "__main__":
+    start_services()
+    if WARMUP:
+        warm_up()
+    port = int(os.environ.get("PORT", 5000))
+    app.run(host="0.0.0.0", port=port, debug=False)
@@ -0,0 +1,310 @@
+"""Vectorized audio helpers for telephony audio.
+
+Everything here works on numpy arrays: G.711 mu-law encode/decode, a small
+RIFF/WAV reader and writer (PCM16 and mu-law), linear resampling, silence
+trimming and loudness normalization for telephony playback, pause
+compaction of caller recordings before transcription, and an
+incremental energy-based voice activity detector used by the Media Streams
+engine to find end-of-speech without waiting for Twilio's Record timeout.
+"""
+import struct
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_MULAW = 7
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+_MULAW_BIAS = 0x84
+_MULAW_CLIP = 32635
+
+
+def _build_ulaw_decode_table() -> np.ndarray:
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    sign = codes & 0x80
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + _MULAW_BIAS) << exponent) - _MULAW_BIAS
+    return np.where(sign != 0, -magnitude, magnitude).astype(np.int16)
+
+
+ULAW_DECODE_TABLE = _build_ulaw_decode_table()
+
+
+def ulaw_decode(data: bytes) -> np.ndarray:
+    """Decode G.711 mu-law bytes to int16 PCM."""
+    return ULAW_DECODE_TABLE[np.frombuffer(data, dtype=np.uint8)]
+
+
+def ulaw_encode(pcm: np.ndarray) -> bytes:
+    """Encode int16 PCM to G.711 mu-law bytes (bit-exact with audioop.lin2ulaw)."""
+    samples = pcm.astype(np.int32) >> 2
+    negative = samples < 0
+    magnitude = np.minimum(np.where(negative, -samples, samples), _MULAW_CLIP >> 2) + (_MULAW_BIAS >> 2)
+    # Segment is the position of the highest set bit above bit 5
+    segment = np.clip(np.floor(np.log2(magnitude)).astype(np.int32) - 5, 0, 7)
+    code = (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F)
+    return (code ^ np.where(negative, 0x7F, 0xFF)).astype(np.uint8).tobytes()
+
+
+def read_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    """Parse a WAV file (PCM8/16/32 or mu-law) and return mono int16 PCM and its rate."""
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE file")
+
+    fmt = None
+    samples = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        size = struct.unpack("<I", data[pos + 4:pos + 8])[0]
+        body = data[pos + 8:pos + 8 + size]
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack("<HHIIHH", body[:16])
+            if fmt[0] == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                fmt = (struct.unpack("<H", body[24:26])[0],) + fmt[1:]
+        elif chunk_id == b"data":
+            samples = body
+            break
+        pos += 8 + size + (size & 1)
+
+    if fmt is None or samples is None:
+        raise ValueError("WAV file is missing fmt or data chunk")
+
+    format_tag, channels, rate, _, _, bits = fmt
+    if format_tag == WAVE_FORMAT_MULAW:
+        pcm = ulaw_decode(samples)
+    elif format_tag == WAVE_FORMAT_PCM and bits == 16:
+        pcm = np.frombuffer(samples[:len(samples) - len(samples) % 2], dtype="<i2")
+    elif format_tag == WAVE_FORMAT_PCM and bits == 8:
+        pcm = ((np.frombuffer(samples, dtype=np.uint8).astype(np.int16) - 128) << 8).astype(np.int16)
+    elif format_tag == WAVE_FORMAT_PCM and bits == 32:
+        pcm = (np.frombuffer(samples[:len(samples) - len(samples) % 4], dtype="<i4") >> 16).astype(np.int16)
+    else:
+        raise ValueError(f"Unsupported WAV encoding: format={format_tag} bits={bits}")
+
+    if channels > 1:
+        usable = len(pcm) - len(pcm) % channels
+        pcm = pcm[:usable].reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return pcm, rate
+
+
+def write_wav(pcm: np.ndarray, rate: int, mulaw: bool = False) -> bytes:
+    """Serialize mono int16 PCM as a WAV file, optionally mu-law encoded."""
+    if mulaw:
+        body = ulaw_encode(pcm)
+        format_tag, bits, block_align = WAVE_FORMAT_MULAW, 8, 1
+        # Non-PCM formats carry a cbSize field and a fact chunk
+        fmt_chunk = struct.pack("<HHIIHHH", format_tag, 1, rate, rate * block_align, block_align, bits, 0)
+        extra = b"fact" + struct.pack("<II", 4, len(body))
+    else:
+        body = pcm.astype("<i2").tobytes()
+        format_tag, bits, block_align = WAVE_FORMAT_PCM, 16, 2
+        fmt_chunk = struct.pack("<HHIIHH", format_tag, 1, rate, rate * block_align, block_align, bits)
+        extra = b""
+
+    chunks = (
+        b"fmt " + struct.pack("<I", len(fmt_chunk)) + fmt_chunk
+        + extra
+        + b"data" + struct.pack("<I", len(body)) + body
+        + (b"\x00" if len(body) & 1 else b"")
+    )
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WAVE" + chunks
+
+
+def resample(pcm: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """Linearly resample int16 PCM; downsampling averages first to limit aliasing."""
+    if src_rate == dst_rate or len(pcm) == 0:
+        return pcm
+    samples = pcm.astype(np.float32)
+    if src_rate > dst_rate:
+        # Box filter over the decimation ratio as a cheap anti-alias low-pass
+        width = int(round(src_rate / dst_rate))
+        if width > 1:
+            kernel = np.ones(width, dtype=np.float32) / width
+            samples = np.convolve(samples, kernel, mode="same")
+    n_out = int(round(len(samples) * dst_rate / src_rate))
+    positions = np.arange(n_out, dtype=np.float64) * (src_rate / dst_rate)
+    out = np.interp(positions, np.arange(len(samples)), samples)
+    return np.clip(np.round(out), -32768, 32767).astype(np.int16)
+
+
+def frame_energy_db(pcm: np.ndarray, frame_len: int) -> np.ndarray:
+    """RMS level in dBFS of each complete frame of ``frame_len`` samples."""
+    n_frames = len(pcm) // frame_len
+    if n_frames == 0:
+        return np.empty(0, dtype=np.float32)
+    frames = pcm[:n_frames * frame_len].astype(np.float32).reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames * frames, axis=1)) / 32768.0
+    return (20.0 * np.log10(np.maximum(rms, 1e-6))).astype(np.float32)
+
+
+def voiced_frames(pcm: np.ndarray, rate: int, threshold_db: float = -45.0, frame_ms: int = 20) -> np.ndarray:
+    """Boolean mask of the frames whose level is above ``threshold_db`` dBFS."""
+    return frame_energy_db(pcm, max(1, rate * frame_ms // 1000)) > threshold_db
+
+
+def trim_silence(pcm: np.ndarray, rate: int, threshold_db: float = -45.0, pad_ms: int = 100,
+                 frame_ms: int = 20) -> np.ndarray:
+    """Cut leading and trailing silence, keeping ``pad_ms`` around the voiced part."""
+    voiced = np.flatnonzero(voiced_frames(pcm, rate, threshold_db, frame_ms))
+    if len(voiced) == 0:
+        return pcm
+    frame_len = max(1, rate * frame_ms // 1000)
+    pad = rate * pad_ms // 1000
+    start = max(0, voiced[0] * frame_len - pad)
+    end = min(len(pcm), (voiced[-1] + 1) * frame_len + pad)
+    return pcm[start:end]
+
+
+def compact_speech(pcm: np.ndarray, rate: int, threshold_db: float = 12.0, min_level_db: float = -50.0,
+                   pad_ms: int = 200, max_pause_ms: int = 600, frame_ms: int = 20) -> np.ndarray:
+    """Drop leading/trailing silence and shorten internal pauses to ``max_pause_ms``.
+
+    A frame is speech when it is ``threshold_db`` above the recording's noise
+    floor (its 10th-percentile frame level) and above ``min_level_db``;
+    ``pad_ms`` around speech is kept so word edges aren't clipped. Returns the
+    input unchanged if it contains no speech.
+    """
+    frame_len = max(1, rate * frame_ms // 1000)
+    levels = frame_energy_db(pcm, frame_len)
+    if len(levels) == 0:
+        return pcm
+    threshold = max(float(np.percentile(levels, 10)) + threshold_db, min_level_db)
+    voiced = levels > threshold
+    if not voiced.any():
+        return pcm
+
+    pad = pad_ms // frame_ms
+    # Dilate by pad frames each side; "full" then cropped, since "same" returns the kernel's
+    # length when the recording has fewer frames than the kernel
+    speech = np.convolve(voiced, np.ones(2 * pad + 1), mode="full")[pad:pad + len(voiced)] > 0
+    # A pause keeps only the max_pause frames that follow the previous speech frame
+    index = np.arange(len(speech))
+    last_speech = np.maximum.accumulate(np.where(speech, index, -1))
+    keep = (last_speech >= 0) & (index - last_speech <= max_pause_ms // frame_ms)
+    keep[np.flatnonzero(speech)[-1] + 1:] = False
+
+    mask = np.repeat(keep, frame_len)
+    return pcm[:len(mask)][mask]
+
+
+def normalize_loudness(pcm: np.ndarray, target_dbfs: float = -18.0, peak_dbfs: float = -1.0,
+                       max_gain_db: float = 20.0, gate_db: float = -50.0, frame_len: int = 160) -> np.ndarray:
+    """Scale PCM so its speech RMS sits at ``target_dbfs`` without peaks above ``peak_dbfs``.
+
+    Only frames above ``gate_db`` count towards the RMS, so pauses don't drag the
+    estimate down and get amplified.
+    """
+    if len(pcm) == 0:
+        return pcm
+    levels = frame_energy_db(pcm, frame_len)
+    speech = levels[levels > gate_db]
+    if len(speech) == 0:
+        return pcm
+    # Mean power of the speech frames, back in dBFS
+    current_db = 10.0 * np.log10(np.mean(10.0 ** (speech / 10.0)))
+    peak = np.max(np.abs(pcm.astype(np.int32))) / 32768.0
+    peak_db = 20.0 * np.log10(max(peak, 1e-6))
+    gain_db = min(target_dbfs - current_db, peak_dbfs - peak_db, max_gain_db)
+    scaled = pcm.astype(np.float32) * np.float32(10.0 ** (gain_db / 20.0))
+    return np.clip(np.round(scaled), -32768, 32767).astype(np.int16)
+
+
+def telephony_wav(data: bytes, rate: int = 8000, target_dbfs: Optional[float] = None,
+                  trim_db: Optional[float] = None) -> bytes:
+    """Transcode a WAV file to mono mu-law at ``rate`` (Twilio's native PSTN format).
+
+    Optionally trims leading/trailing silence below ``trim_db`` dBFS and
+    normalizes loudness to ``target_dbfs``. Raises ValueError for non-WAV input.
+    """
+    pcm, src_rate = read_wav(data)
+    if trim_db is not None:
+        pcm = trim_silence(pcm, src_rate, threshold_db=trim_db)
+    pcm = resample(pcm, src_rate, rate)
+    if target_dbfs is not None:
+        pcm = normalize_loudness(pcm, target_dbfs=target_dbfs, frame_len=max(1, rate // 50))
+    return write_wav(pcm, rate, mulaw=True)
+
+
+class EnergyVAD:
+    """Incremental energy-based voice activity detector.
+
+    Feed it PCM as it arrives; ``process`` returns ``"start"`` when speech has
+    been present for ``start_ms``, ``"end"`` once it has been followed by
+    ``end_ms`` of silence (or the utterance hits ``max_utterance_ms``), and
+    None otherwise. The noise floor adapts during silence, so a frame counts
+    as speech when it is ``threshold_db`` above the floor and above
+    ``min_level_db``.
+    """
+
+    def __init__(self, sample_rate: int = 8000, frame_ms: int = 20, start_ms: int = 60,
+                 end_ms: int = 500, threshold_db: float = 12.0, min_level_db: float = -50.0,
+                 min_speech_ms: int = 200, max_utterance_ms: int = 30000):
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.frame_ms = frame_ms
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.end_frames = max(1, end_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_frames = max_utterance_ms // frame_ms
+        self.threshold_db = threshold_db
+        self.min_level_db = min_level_db
+
+        self.noise_db = -60.0
+        self.in_speech = False
+        self._pending = np.empty(0, dtype=np.int16)
+        self._speech_run = 0
+        self._silence_run = 0
+        self._speech_frames = 0
+        self._utterance_frames = 0
+
+    def reset(self) -> None:
+        self.in_speech = False
+        self._speech_run = 0
+        self._silence_run = 0
+        self._speech_frames = 0
+        self._utterance_frames = 0
+
+    def process(self, pcm: np.ndarray) -> Optional[str]:
+        if len(self._pending):
+            pcm = np.concatenate([self._pending, pcm])
+        levels = frame_energy_db(pcm, self.frame_len)
+        self._pending = pcm[len(levels) * self.frame_len:]
+
+        event = None
+        for level in levels:
+            is_speech = level > self.min_level_db and level > self.noise_db + self.threshold_db
+            if not self.in_speech:
+                if is_speech:
+                    self._speech_run += 1
+                    if self._speech_run >= self.start_frames:
+                        self.in_speech = True
+                        self._silence_run = 0
+                        self._speech_frames = self._speech_run
+                        self._utterance_frames = self._speech_run
+                        event = event or "start"
+                else:
+                    self._speech_run = 0
+                    # Track the noise floor, rising slowly and falling quickly
+                    rate = 0.05 if level > self.noise_db else 0.3
+                    self.noise_db += rate * (level - self.noise_db)
+                continue
+
+            self._utterance_frames += 1
+            if is_speech:
+                self._speech_frames += 1
+                self._silence_run = 0
+            else:
+                self._silence_run += 1
+
+            if self._silence_run >= self.end_frames or self._utterance_frames >= self.max_frames:
+                long_enough = self._speech_frames >= self.min_speech_frames
+                self.reset()
+                if long_enough:
+                    event = "end"
+        return event
+
+
+def chunk_bytes(data: bytes, size: int) -> List[bytes]:
+    return [data[i:i + size] for i in range(0, len(data), size)]
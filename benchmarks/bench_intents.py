@@ -0,0 +1,109 @@
+"""Micro-benchmark: compiled intent matching vs. per-keyword substring scans.
+
+Builds synthetic intent tables of increasing size and times both the old
+``any(word in text for word in keywords)`` ladder and ``IntentEngine.match``
+over transcripts of increasing length.
+
+    python benchmarks/bench_intents.py [--repeat 200] [--json results.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intents import IntentEngine, normalize  # noqa: E402
+
+ALPHABETS = {
+    "en": "abcdefghijklmnopqrstuvwxyz",
+    "hi": "कखगघचछजझटठडढतथदधनपफबभमयरलवशसह",
+    "te": "కఖగఘచఛజఝటఠడఢతథదధనపఫబభమయరలవశసహ",
+}
+
+
+def random_word(rng: random.Random, alphabet: str) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(3, 9)))
+
+
+def build_table(rng: random.Random, n_intents: int, keywords_per_language: int) -> dict:
+    intents = []
+    for i in range(n_intents):
+        intents.append({
+            "name": f"intent_{i}",
+            "keywords": {
+                lang: [random_word(rng, alphabet) for _ in range(keywords_per_language)]
+                for lang, alphabet in ALPHABETS.items()
+            },
+            "replies": {"en": f"reply {i}"},
+        })
+    return {"intents": intents, "fallback": {"en": "fallback"}}
+
+
+def build_transcript(rng: random.Random, n_words: int) -> str:
+    alphabet = ALPHABETS[rng.choice(list(ALPHABETS))]
+    return " ".join(random_word(rng, alphabet) for _ in range(n_words))
+
+
+def naive_ladder(table: dict) -> list:
+    """The pre-engine approach: one keyword list per intent, checked in order."""
+    return [
+        (spec["name"], [normalize(word) for words in spec["keywords"].values() for word in words])
+        for spec in table["intents"]
+    ]
+
+
+def naive_match(ladder: list, text: str):
+    text = normalize(text)
+    for name, keywords in ladder:
+        if any(word in text for word in keywords):
+            return name
+    return None
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    results = []
+    print(f"{'intents':>8} {'keywords':>9} {'words':>6} {'naive_us':>10} {'engine_us':>10} {'speedup':>8}")
+    for n_intents in (2, 20, 200, 1000):
+        table = build_table(rng, n_intents, keywords_per_language=5)
+        engine = IntentEngine(table)
+        ladder = naive_ladder(table)
+        for n_words in (5, 20, 80):
+            # Transcripts that match nothing are the worst case for the naive ladder
+            text = build_transcript(rng, n_words)
+            naive_us = timed(lambda: naive_match(ladder, text), args.repeat)
+            engine_us = timed(lambda: engine.match(text), args.repeat)
+            row = {
+                "intents": n_intents,
+                "keywords": engine.keyword_count,
+                "words": n_words,
+                "chars": len(text),
+                "naive_us": round(naive_us, 2),
+                "engine_us": round(engine_us, 2),
+            }
+            results.append(row)
+            print(f"{n_intents:>8} {engine.keyword_count:>9} {n_words:>6} "
+                  f"{naive_us:>10.1f} {engine_us:>10.1f} {naive_us / engine_us:>7.1f}x")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
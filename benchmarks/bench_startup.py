@@ -0,0 +1,149 @@
+"""Startup benchmark: import time and cold first-request latency.
+
+Measures, in a scratch directory with the fake vendors standing in for
+Sarvam and Twilio:
+
+* ``import``: wall time of ``import app_new`` in a fresh interpreter
+* ``boot``: gunicorn start until ``GET /`` answers (includes warm-up with WARMUP=1)
+* ``voice`` / ``language``: the first caller's first two webhooks on a cold
+  worker (``language`` synthesizes the greeting unless warm-up cached it)
+* ``language_warm``: the same webhook for a second caller
+
+Each scenario runs ``--runs`` times with an empty replies directory.
+
+    python benchmarks/bench_startup.py --runs 3 --json startup.json
+    python benchmarks/bench_startup.py --env WARMUP=1 --env GUNICORN_PRELOAD=1
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_vendors import FakeVendorServer, add_arguments, config_from_args  # noqa: E402
+from loadtest import REPO_DIR, wait_until_up  # noqa: E402
+
+IMPORT_SNIPPET = (
+    "import sys, time; sys.path.insert(0, {repo!r}); started = time.perf_counter(); "
+    "import app_new; print((time.perf_counter() - started) * 1000)"
+)
+
+
+def server_env(args, vendor_url: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "BASE_URL": f"http://127.0.0.1:{args.port}",
+        "SARVAM_API_KEY": "bench",
+        "SARVAM_STT_URL": f"{vendor_url}/stt",
+        "SARVAM_TTS_URL": f"{vendor_url}/tts",
+        "TWILIO_ACCOUNT_SID": "AC" + "0" * 32,
+        "TWILIO_AUTH_TOKEN": "bench",
+        "TWILIO_FROM": "+15550000000",
+        "TWILIO_API_BASE_URL": vendor_url,
+        "LOG_LEVEL": "WARNING",
+        "CAMPAIGN_RESUME": "0",
+    })
+    for pair in args.env:
+        key, _, value = pair.partition("=")
+        env[key] = value
+    return env
+
+
+def time_import(env: Dict[str, str], workdir: str) -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET.format(repo=REPO_DIR)], cwd=workdir, env=env,
+                         check=True, capture_output=True, text=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def timed_post(url: str, data: dict) -> float:
+    started = time.perf_counter()
+    requests.post(url, data=data, timeout=60).raise_for_status()
+    return (time.perf_counter() - started) * 1000
+
+
+def cold_start(args, env: Dict[str, str], workdir: str) -> Dict[str, float]:
+    target = f"http://127.0.0.1:{args.port}"
+    cmd = [
+        sys.executable, "-m", "gunicorn", "app_new:create_app()",
+        "-c", os.path.join(REPO_DIR, "gunicorn.conf.py"),
+        "--bind", f"127.0.0.1:{args.port}",
+        "--workers", "1",
+        "--chdir", workdir,
+        "--pythonpath", REPO_DIR,
+    ]
+    log_file = open(os.path.join(workdir, "server.log"), "ab")
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    try:
+        wait_until_up(f"{target}/", timeout=120)
+        row = {"boot": (time.perf_counter() - started) * 1000}
+        for step in ("first", "warm"):
+            form = {"CallSid": f"CA{uuid.uuid4().hex}", "From": "+919000000000", "To": "+15550000000"}
+            voice_ms = timed_post(f"{target}/twilio/voice", form)
+            language_ms = timed_post(f"{target}/twilio/language", {**form, "Digits": "1"})
+            if step == "first":
+                row.update({"voice": voice_ms, "language": language_ms})
+            else:
+                row["language_warm"] = language_ms
+        return row
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        log_file.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=5056)
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE for the server environment")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--vendor-port", type=int, default=0)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    vendors = FakeVendorServer(("127.0.0.1", args.vendor_port), config_from_args(args)).start()
+    samples: Dict[str, List[float]] = {}
+    try:
+        env = server_env(args, vendors.url)
+        for _ in range(args.runs):
+            workdir = tempfile.mkdtemp(prefix="ivr-startup-")
+            try:
+                samples.setdefault("import", []).append(time_import(env, workdir))
+                shutil.rmtree(os.path.join(workdir, "replies"), ignore_errors=True)
+                for step, value in cold_start(args, env, workdir).items():
+                    samples.setdefault(step, []).append(value)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        vendors.stop()
+
+    results = {
+        "config": {"runs": args.runs, "env": args.env, "tts_latency_ms": args.tts_latency_ms},
+        "steps": {
+            step: {"median_ms": round(statistics.median(values), 1), "min_ms": round(min(values), 1),
+                   "max_ms": round(max(values), 1)}
+            for step, values in samples.items()
+        },
+    }
+    print(f"{'step':>14} {'median_ms':>10} {'min_ms':>8} {'max_ms':>8}")
+    for step, row in results["steps"].items():
+        print(f"{step:>14} {row['median_ms']:>10.1f} {row['min_ms']:>8.1f} {row['max_ms']:>8.1f}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Chunked TTS benchmark: time to first audio versus time to all audio.
+
+Runs the app under gunicorn with the fake vendors (TTS latency growing with
+text length via ``--tts-ms-per-char``) and, with an empty replies directory,
+answers the language menu once per language, with TTS_CHUNKED off and on:
+
+* ``first_audio``: the ``/twilio/language`` webhook, i.e. until Twilio can
+  start playing the greeting
+* ``all_audio``: until every <Play> URL in its TwiML has been fetched, asked
+  for right away (Twilio only asks for each one when it gets to it)
+
+    python benchmarks/bench_tts_chunks.py --runs 3 --tts-ms-per-char 8
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_vendors import FakeVendorServer, add_arguments, config_from_args  # noqa: E402
+from loadtest import start_server, wait_until_up  # noqa: E402
+
+DIGITS = {"en": "1", "hi": "2", "te": "3"}
+PLAY_RE = re.compile(r"<Play>([^<]+)</Play>")
+
+
+def answer_menu(target: str, digit: str) -> Dict[str, float]:
+    form = {"CallSid": f"CA{uuid.uuid4().hex}", "From": "+919000000000", "To": "+15550000000"}
+    requests.post(f"{target}/twilio/voice", data=form, timeout=60).raise_for_status()
+
+    started = time.perf_counter()
+    resp = requests.post(f"{target}/twilio/language", data={**form, "Digits": digit}, timeout=60)
+    resp.raise_for_status()
+    first = time.perf_counter() - started
+    urls = [url.replace("&amp;", "&") for url in PLAY_RE.findall(resp.text)]
+    for url in urls:
+        requests.get(url, timeout=60).raise_for_status()
+    return {"first_audio": first * 1000, "all_audio": (time.perf_counter() - started) * 1000, "plays": len(urls)}
+
+
+def run_mode(args, vendor_url: str, chunked: bool) -> Dict[str, List[float]]:
+    samples: Dict[str, List[float]] = {}
+    for _ in range(args.runs):
+        workdir = tempfile.mkdtemp(prefix="ivr-chunks-")
+        args.env = args.base_env + [f"TTS_CHUNKED={int(chunked)}"]
+        proc = start_server(args, vendor_url, workdir)
+        try:
+            target = f"http://127.0.0.1:{args.port}"
+            wait_until_up(f"{target}/", timeout=60)
+            for language, digit in DIGITS.items():
+                for step, value in answer_menu(target, digit).items():
+                    samples.setdefault(f"{language}_{step}", []).append(value)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+            shutil.rmtree(workdir, ignore_errors=True)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=5057)
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE for the server environment")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--vendor-port", type=int, default=0)
+    add_arguments(parser)
+    parser.set_defaults(tts_latency_ms=150, tts_ms_per_char=8)
+    args = parser.parse_args()
+    args.base_env, args.workers, args.gunicorn_arg, args.log_level = args.env, 1, [], "WARNING"
+
+    vendors = FakeVendorServer(("127.0.0.1", args.vendor_port), config_from_args(args)).start()
+    try:
+        modes = {name: run_mode(args, vendors.url, chunked) for name, chunked in (("whole", False), ("chunked", True))}
+    finally:
+        vendors.stop()
+
+    results = {
+        "config": {"runs": args.runs, "env": args.base_env, "tts_latency_ms": args.tts_latency_ms,
+                   "tts_ms_per_char": args.tts_ms_per_char},
+        "modes": {
+            mode: {step: round(statistics.median(values), 1) for step, values in samples.items()}
+            for mode, samples in modes.items()
+        },
+    }
+    steps = list(results["modes"]["whole"])
+    print(f"{'median':>16} " + " ".join(f"{mode:>9}" for mode in results["modes"]))
+    for step in steps:
+        print(f"{step:>16} " + " ".join(f"{row[step]:>9.1f}" for row in results["modes"].values()))
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
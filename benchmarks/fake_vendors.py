@@ -0,0 +1,240 @@
+"""Local stand-ins for Sarvam STT/TTS and the Twilio recording host / REST API.
+
+Each endpoint sleeps for a configurable latency (plus uniform jitter, and
+for TTS optionally a per-character cost) and fails with a configurable
+probability, so load tests exercise the app's
+vendor paths without network access or vendor credits.
+
+    python benchmarks/fake_vendors.py --port 8765 --stt-latency-ms 400 --tts-latency-ms 600
+
+Endpoints:
+    POST /stt                              Sarvam speech-to-text
+    POST /tts                              Sarvam text-to-speech
+    GET  /recordings/<sid>[.wav]           Twilio recording media
+    POST /2010-04-01/Accounts/<sid>/Calls.json         create call
+    POST /2010-04-01/Accounts/<sid>/Calls/<sid>.json   update call
+    GET  /stats                            request/error counters
+
+Successful create/update calls are kept in ``FakeVendorServer.call_requests``
+as (Call SID or None for a create, form fields), for tests to inspect.
+"""
+import argparse
+import base64
+import io
+import json
+import math
+import random
+import re
+import struct
+import sys
+import threading
+import time
+import wave
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+TRANSCRIPTS = (
+    "I want to pay my electricity bill",
+    "how do I apply for a new connection",
+    "there is no power in my area since morning",
+    "बिल भुगतान कैसे करें",
+    "కొత్త కనెక్షన్ కావాలి",
+)
+
+
+def tone_wav(seconds: float, rate: int, silence: float = 0.25) -> bytes:
+    """16-bit mono WAV: a 440 Hz tone framed by silence."""
+    frames = int(seconds * rate)
+    edge = int(silence * rate)
+    samples = (
+        0 if i < edge or i >= frames - edge else int(8000 * math.sin(2 * math.pi * 440 * i / rate))
+        for i in range(frames)
+    )
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(struct.pack(f"<{frames}h", *samples))
+    return buf.getvalue()
+
+
+@dataclass
+class Endpoint:
+    latency_ms: float = 0.0
+    error_rate: float = 0.0
+
+
+@dataclass
+class VendorConfig:
+    stt: Endpoint = field(default_factory=Endpoint)
+    tts: Endpoint = field(default_factory=Endpoint)
+    recording: Endpoint = field(default_factory=Endpoint)
+    twilio_api: Endpoint = field(default_factory=Endpoint)
+    jitter_ms: float = 0.0
+    recording_seconds: float = 4.0
+    tts_seconds: float = 2.0
+    tts_ms_per_char: float = 0.0
+    seed: Optional[int] = None
+
+
+class FakeVendorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config: VendorConfig):
+        super().__init__(address, FakeVendorHandler)
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.call_requests: List[Tuple[Optional[str], Dict[str, str]]] = []
+        self.recording = tone_wav(config.recording_seconds, 8000)
+        self.tts_audio = base64.b64encode(tone_wav(config.tts_seconds, 22050)).decode("ascii")
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeVendorServer":
+        self.thread = threading.Thread(target=self.serve_forever, name="fake-vendors", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients that give up mid-request (hedged or aborted uploads) are expected
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def delay_and_fail(self, name: str, endpoint: Endpoint, extra_ms: float = 0.0) -> bool:
+        """Sleep for the endpoint's latency (plus ``extra_ms``); return True if this request should fail."""
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            jitter = self.rng.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+            failed = self.rng.random() < endpoint.error_rate
+            if failed:
+                self.errors[name] = self.errors.get(name, 0) + 1
+        time.sleep(max(0.0, endpoint.latency_ms + extra_ms + jitter) / 1000)
+        return failed
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"requests": dict(self.counts), "errors": dict(self.errors)}
+
+
+class FakeVendorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeVendorServer
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, data: dict) -> None:
+        self._send(status, json.dumps(data).encode())
+
+    def _drain(self) -> bytes:
+        # Requests' streamed uploads arrive chunked; both forms must be consumed
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b"".join(body)
+                body.append(self.rfile.read(size + 2)[:-2])
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def do_POST(self) -> None:
+        body = self._drain()
+        config = self.server.config
+        if self.path.startswith("/stt"):
+            if self.server.delay_and_fail("stt", config.stt):
+                return self._json(503, {"error": "fake STT failure"})
+            with self.server.lock:
+                transcript = self.server.rng.choice(TRANSCRIPTS)
+            return self._json(200, {"transcript": transcript})
+        if self.path.startswith("/tts"):
+            try:
+                chars = len(json.loads(body).get("text", ""))
+            except ValueError:
+                chars = 0
+            if self.server.delay_and_fail("tts", config.tts, chars * config.tts_ms_per_char):
+                return self._json(503, {"error": "fake TTS failure"})
+            return self._json(200, {"audios": [self.server.tts_audio]})
+        match = re.search(r"/Calls(?:/([^/.]+))?\.json$", self.path)
+        if match:
+            if self.server.delay_and_fail("twilio_api", config.twilio_api):
+                return self._json(500, {"message": "fake Twilio failure"})
+            with self.server.lock:
+                self.server.call_requests.append((match.group(1), dict(parse_qsl(body.decode("utf-8")))))
+            sid = match.group(1) or f"CA{random.getrandbits(128):032x}"
+            return self._json(200 if match.group(1) else 201, {"sid": sid, "status": "queued"})
+        self._json(404, {"error": "not found"})
+
+    def do_GET(self) -> None:
+        if self.path.startswith("/recordings/"):
+            if self.server.delay_and_fail("recording", self.server.config.recording):
+                return self._send(500, b"", "text/plain")
+            return self._send(200, self.server.recording, "audio/x-wav")
+        if self.path == "/stats":
+            return self._json(200, self.server.stats())
+        self._json(404, {"error": "not found"})
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group("fake vendors")
+    for name, latency in (("stt", 400), ("tts", 600), ("recording", 50), ("twilio-api", 100)):
+        group.add_argument(f"--{name}-latency-ms", type=float, default=latency)
+        group.add_argument(f"--{name}-error-rate", type=float, default=0.0)
+    group.add_argument("--jitter-ms", type=float, default=50)
+    group.add_argument("--recording-seconds", type=float, default=4.0)
+    group.add_argument("--tts-ms-per-char", type=float, default=0.0,
+                       help="extra TTS latency per character of text")
+    group.add_argument("--seed", type=int)
+
+
+def config_from_args(args: argparse.Namespace) -> VendorConfig:
+    return VendorConfig(
+        stt=Endpoint(args.stt_latency_ms, args.stt_error_rate),
+        tts=Endpoint(args.tts_latency_ms, args.tts_error_rate),
+        recording=Endpoint(args.recording_latency_ms, args.recording_error_rate),
+        twilio_api=Endpoint(args.twilio_api_latency_ms, args.twilio_api_error_rate),
+        jitter_ms=args.jitter_ms,
+        recording_seconds=args.recording_seconds,
+        tts_ms_per_char=args.tts_ms_per_char,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeVendorServer((args.host, args.port), config_from_args(args))
+    print(f"Fake vendors listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
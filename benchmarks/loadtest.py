@@ -0,0 +1,342 @@
+"""Offline load test: N synthetic callers against a real app server.
+
+Starts the fake vendors (``fake_vendors.py``) and ``gunicorn 'app_new:create_app()'`` in a
+scratch directory, then drives the Twilio webhook sequence for every caller:
+
+    /twilio/voice -> /twilio/language -> (/twilio/recording [-> /twilio/continue]
+    -> /twilio/action 1) x turns -> /twilio/action 3
+
+(``/twilio/continue`` only when the reply redirects to it, i.e. FLOW_INLINE=0.)
+
+Reports per-step and per-turn p50/p95/p99 latency, throughput and server
+memory (RSS of the gunicorn master and workers), and writes them as JSON.
+
+    python benchmarks/loadtest.py --callers 20 --turns 3 --workers 2 --json results.json
+    python benchmarks/loadtest.py --target http://127.0.0.1:5000   # already running server
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_vendors import FakeVendorServer, add_arguments, config_from_args  # noqa: E402
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(1, rank)) - 1]
+
+
+def summarize(samples: List[float]) -> dict:
+    values = sorted(samples)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 1) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 1),
+        "p95_ms": round(percentile(values, 95), 1),
+        "p99_ms": round(percentile(values, 99), 1),
+        "max_ms": round(values[-1], 1) if values else 0.0,
+    }
+
+
+def process_tree_rss(pid: int) -> int:
+    """Resident set size in bytes of a process and all of its descendants (Linux /proc)."""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as fh:
+                ppid = int(fh.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as fh:
+                for line in fh:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            pass
+    return total
+
+
+class MemorySampler:
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[int] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> dict:
+        self._stop.set()
+        self._thread.join()
+        if not self.samples:
+            return {}
+        return {
+            "start_rss_mb": round(self.samples[0] / 2 ** 20, 1),
+            "peak_rss_mb": round(max(self.samples) / 2 ** 20, 1),
+            "end_rss_mb": round(self.samples[-1] / 2 ** 20, 1),
+        }
+
+    def _run(self) -> None:
+        while True:
+            self.samples.append(process_tree_rss(self.pid))
+            if self._stop.wait(self.interval):
+                return
+
+
+class CallSimulator:
+    """Plays one synthetic caller through the webhook sequence."""
+
+    def __init__(self, target: str, recording_base: str, turns: int, fetch_audio: bool, timeout: float):
+        self.target = target.rstrip("/")
+        self.recording_base = recording_base.rstrip("/")
+        self.turns = turns
+        self.fetch_audio = fetch_audio
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.steps: Dict[str, List[float]] = {}
+        self.turn_ms: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.calls_completed = 0
+
+    def _record(self, step: str, elapsed_ms: float, ok: bool) -> None:
+        with self.lock:
+            self.steps.setdefault(step, []).append(elapsed_ms)
+            if not ok:
+                self.errors[step] = self.errors.get(step, 0) + 1
+
+    def _post(self, session: requests.Session, step: str, path: str, data: dict) -> str:
+        start = time.perf_counter()
+        ok = False
+        try:
+            resp = session.post(f"{self.target}{path}", data=data, timeout=self.timeout)
+            ok = resp.status_code < 400
+            return resp.text
+        except requests.RequestException:
+            return ""
+        finally:
+            self._record(step, (time.perf_counter() - start) * 1000, ok)
+
+    def _play(self, session: requests.Session, twiml: str) -> None:
+        # What Twilio does with each <Play> URL in the TwiML
+        if not self.fetch_audio:
+            return
+        start = 0
+        while True:
+            start = twiml.find("<Play>", start)
+            if start < 0:
+                return
+            end = twiml.find("</Play>", start)
+            url = twiml[start + 6:end]
+            start = end
+            began = time.perf_counter()
+            ok = False
+            try:
+                ok = session.get(url, timeout=self.timeout).status_code == 200
+            except requests.RequestException:
+                pass
+            self._record("play", (time.perf_counter() - began) * 1000, ok)
+
+    def run_call(self, caller: int) -> None:
+        call_sid = f"CA{uuid.uuid4().hex}"
+        form = {"CallSid": call_sid, "From": f"+9190000{caller:05d}", "To": "+15550000000"}
+        digits = str(caller % 3 + 1)
+        with requests.Session() as session:
+            self._post(session, "voice", "/twilio/voice", form)
+            self._play(session, self._post(session, "language", "/twilio/language", {**form, "Digits": digits}))
+            for turn in range(self.turns):
+                started = time.perf_counter()
+                recording_url = f"{self.recording_base}/recordings/RE{uuid.uuid4().hex}"
+                twiml = self._post(session, "recording", "/twilio/recording",
+                                   {**form, "RecordingUrl": recording_url, "RecordingDuration": "4"})
+                self._play(session, twiml)
+                if "/twilio/continue</Redirect>" in twiml:
+                    self._post(session, "continue", "/twilio/continue", form)
+                last = turn == self.turns - 1
+                self._play(session, self._post(session, "action", "/twilio/action",
+                                               {**form, "Digits": "3" if last else "1"}))
+                with self.lock:
+                    self.turn_ms.append((time.perf_counter() - started) * 1000)
+            self._post(session, "status", "/twilio/status", {**form, "CallStatus": "completed"})
+        with self.lock:
+            self.calls_completed += 1
+
+
+def start_server(args, vendor_url: str, workdir: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "BASE_URL": f"http://127.0.0.1:{args.port}",
+        "SARVAM_API_KEY": "load-test",
+        "SARVAM_STT_URL": f"{vendor_url}/stt",
+        "SARVAM_TTS_URL": f"{vendor_url}/tts",
+        "TWILIO_ACCOUNT_SID": "AC" + "0" * 32,
+        "TWILIO_AUTH_TOKEN": "load-test",
+        "TWILIO_FROM": "+15550000000",
+        "TWILIO_API_BASE_URL": vendor_url,
+        "LOG_LEVEL": args.log_level,
+        "CAMPAIGN_RESUME": "0",
+    })
+    for pair in args.env:
+        key, _, value = pair.partition("=")
+        env[key] = value
+    cmd = [
+        sys.executable, "-m", "gunicorn", "app_new:create_app()",
+        "--bind", f"127.0.0.1:{args.port}",
+        "--workers", str(args.workers),
+        "--chdir", workdir,
+        "--pythonpath", REPO_DIR,
+        "--timeout", "120",
+    ] + args.gunicorn_arg
+    log_file = open(os.path.join(workdir, "server.log"), "wb")
+    return subprocess.Popen(cmd, cwd=workdir, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not come up within {timeout:.0f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--callers", type=int, default=10, help="concurrent synthetic callers")
+    parser.add_argument("--calls", type=int, help="total calls to place (default: one per caller)")
+    parser.add_argument("--turns", type=int, default=2, help="questions asked per call")
+    parser.add_argument("--ramp-seconds", type=float, default=1.0, help="spread caller start times")
+    parser.add_argument("--no-fetch-audio", dest="fetch_audio", action="store_false",
+                        help="don't download <Play> URLs like Twilio would")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout (s)")
+    parser.add_argument("--json", help="write results to this file")
+
+    server = parser.add_argument_group("server under test")
+    server.add_argument("--target", help="URL of an already running server (skips gunicorn)")
+    server.add_argument("--port", type=int, default=5055)
+    server.add_argument("--workers", type=int, default=1)
+    server.add_argument("--gunicorn-arg", action="append", default=[],
+                        help="extra gunicorn argument, e.g. --gunicorn-arg=--threads=8")
+    server.add_argument("--env", action="append", default=[], help="KEY=VALUE for the server environment")
+    server.add_argument("--log-level", default="WARNING")
+    server.add_argument("--keep-workdir", action="store_true")
+
+    parser.add_argument("--vendor-port", type=int, default=0)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    vendors = FakeVendorServer(("127.0.0.1", args.vendor_port), config_from_args(args)).start()
+    workdir = tempfile.mkdtemp(prefix="ivr-loadtest-")
+    proc: Optional[subprocess.Popen] = None
+    sampler: Optional[MemorySampler] = None
+    target = args.target
+    try:
+        if target is None:
+            proc = start_server(args, vendors.url, workdir)
+            target = f"http://127.0.0.1:{args.port}"
+            wait_until_up(f"{target}/")
+            sampler = MemorySampler(proc.pid)
+            sampler.start()
+
+        simulator = CallSimulator(target, vendors.url, args.turns, args.fetch_audio, args.timeout)
+        total_calls = args.calls or args.callers
+        stagger = args.ramp_seconds / max(1, args.callers)
+
+        def caller(index: int) -> None:
+            if index < args.callers:
+                time.sleep(index * stagger)
+            simulator.run_call(index)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.callers) as pool:
+            list(pool.map(caller, range(total_calls)))
+        elapsed = time.perf_counter() - started
+
+        memory = sampler.stop() if sampler else {}
+        turns = len(simulator.turn_ms)
+        results = {
+            "config": {
+                "callers": args.callers,
+                "calls": total_calls,
+                "turns_per_call": args.turns,
+                "workers": args.workers if args.target is None else None,
+                "gunicorn_args": args.gunicorn_arg,
+                "vendors": {
+                    "stt_latency_ms": args.stt_latency_ms, "tts_latency_ms": args.tts_latency_ms,
+                    "recording_latency_ms": args.recording_latency_ms, "jitter_ms": args.jitter_ms,
+                    "stt_error_rate": args.stt_error_rate, "tts_error_rate": args.tts_error_rate,
+                },
+            },
+            "summary": {
+                "elapsed_seconds": round(elapsed, 2),
+                "calls_completed": simulator.calls_completed,
+                "turns": turns,
+                "turns_per_second": round(turns / elapsed, 2),
+                "calls_per_second": round(simulator.calls_completed / elapsed, 3),
+                "errors": simulator.errors,
+            },
+            "turn": summarize(simulator.turn_ms),
+            "steps": {step: summarize(samples) for step, samples in simulator.steps.items()},
+            "memory": memory,
+            "vendor_requests": vendors.stats(),
+        }
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+        vendors.stop()
+        if args.keep_workdir:
+            print(f"Server working directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'step':>10} {'count':>6} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'max_ms':>8}")
+    for step, row in [("turn", results["turn"])] + sorted(results["steps"].items()):
+        print(f"{step:>10} {row['count']:>6} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+              f"{row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+    summary = results["summary"]
+    print(f"{summary['turns']} turns in {summary['elapsed_seconds']}s "
+          f"({summary['turns_per_second']} turns/s), errors: {summary['errors'] or 'none'}")
+    if memory:
+        print(f"server RSS: start {memory['start_rss_mb']} MB, peak {memory['peak_rss_mb']} MB")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Per-call state storage.
+
+Webhooks for one call can land on any gunicorn worker, so call state (the
+selected language, interaction count, engine mode) lives behind the small
+``CallStateStore`` interface:
+
+* ``MemoryCallStateStore``: in-process LRU with a TTL; fastest, but only
+  correct with a single worker.
+* ``SQLiteCallStateStore``: a WAL-mode SQLite file shared by every worker on
+  the instance. ``update`` runs inside ``BEGIN IMMEDIATE`` so read-modify-write
+  is atomic across processes.
+
+Both bound their footprint with a TTL and a maximum entry count, and entries
+are deleted as soon as Twilio reports the call finished.
+"""
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+StateUpdater = Callable[[dict], None]
+
+
+class CallStateStore(ABC):
+    """Interface for call state backends."""
+
+    @abstractmethod
+    def get(self, call_sid: str, default: Optional[dict] = None) -> Optional[dict]:
+        """Return a copy of the state for a call, or ``default``."""
+
+    @abstractmethod
+    def set(self, call_sid: str, state: dict) -> None:
+        """Replace the state for a call."""
+
+    @abstractmethod
+    def update(self, call_sid: str, fn: StateUpdater, default: Optional[dict] = None) -> dict:
+        """Atomically apply ``fn`` to the call's state (starting from ``default``) and return it."""
+
+    def merge(self, call_sid: str, changes: dict, default: Optional[dict] = None) -> dict:
+        return self.update(call_sid, lambda state: state.update(changes), default)
+
+    @abstractmethod
+    def delete(self, call_sid: str) -> None:
+        """Forget a call."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """Counters for /stats."""
+
+
+class MemoryCallStateStore(CallStateStore):
+    """Process-local LRU + TTL store."""
+
+    def __init__(self, ttl_seconds: int = 7200, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # call_sid -> (expires_at, state)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.expired = 0
+        self.evicted = 0
+
+    def _live(self, call_sid: str, now: float) -> Optional[dict]:
+        entry = self._entries.get(call_sid)
+        if entry is None:
+            return None
+        if entry[0] < now:
+            del self._entries[call_sid]
+            self.expired += 1
+            return None
+        return entry[1]
+
+    def _store(self, call_sid: str, state: dict, now: float) -> None:
+        self._entries[call_sid] = (now + self.ttl_seconds, state)
+        self._entries.move_to_end(call_sid)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    def get(self, call_sid, default=None):
+        with self._lock:
+            state = self._live(call_sid, time.time())
+            if state is None:
+                return copy.deepcopy(default)
+            return copy.deepcopy(state)
+
+    def set(self, call_sid, state):
+        with self._lock:
+            self._store(call_sid, copy.deepcopy(state), time.time())
+
+    def update(self, call_sid, fn, default=None):
+        with self._lock:
+            now = time.time()
+            # Work on a copy so a raising fn leaves the stored state as it was
+            state = copy.deepcopy(self._live(call_sid, now) or default or {})
+            fn(state)
+            self._store(call_sid, state, now)
+            return copy.deepcopy(state)
+
+    def delete(self, call_sid):
+        with self._lock:
+            self._entries.pop(call_sid, None)
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "entries": len(self._entries),
+                    "expired": self.expired, "evicted": self.evicted}
+
+
+class SQLiteCallStateStore(CallStateStore):
+    """SQLite (WAL) store shared by all worker processes on one host."""
+
+    PURGE_EVERY = 200
+
+    def __init__(self, path: str, ttl_seconds: int = 7200, max_entries: int = 10000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+        # Create the schema with a throwaway connection so nothing is shared across fork()
+        conn = sqlite3.connect(path, timeout=5.0)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS call_state ("
+                " call_sid TEXT PRIMARY KEY,"
+                " state TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS call_state_expires ON call_state (expires_at)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _read(self, conn: sqlite3.Connection, call_sid: str) -> Optional[dict]:
+        row = conn.execute(
+            "SELECT state FROM call_state WHERE call_sid = ? AND expires_at >= ?",
+            (call_sid, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, conn: sqlite3.Connection, call_sid: str, state: dict) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO call_state (call_sid, state, expires_at) VALUES (?, ?, ?)",
+            (call_sid, json.dumps(state, ensure_ascii=False), time.time() + self.ttl_seconds),
+        )
+
+    def _maybe_purge(self, conn: sqlite3.Connection) -> None:
+        with self._writes_lock:
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY:
+                return
+        self.purge(conn)
+
+    def purge(self, conn: Optional[sqlite3.Connection] = None) -> None:
+        """Delete expired rows, then the soonest-expiring rows beyond ``max_entries``."""
+        conn = conn or self._conn()
+        conn.execute("DELETE FROM call_state WHERE expires_at < ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM call_state WHERE call_sid IN ("
+            " SELECT call_sid FROM call_state ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def get(self, call_sid, default=None):
+        state = self._read(self._conn(), call_sid)
+        return copy.deepcopy(default) if state is None else state
+
+    def set(self, call_sid, state):
+        conn = self._conn()
+        self._write(conn, call_sid, state)
+        self._maybe_purge(conn)
+
+    def update(self, call_sid, fn, default=None):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = self._read(conn, call_sid)
+            state = copy.deepcopy(default or {}) if state is None else state
+            fn(state)
+            self._write(conn, call_sid, state)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._maybe_purge(conn)
+        return state
+
+    def delete(self, call_sid):
+        self._conn().execute("DELETE FROM call_state WHERE call_sid = ?", (call_sid,))
+
+    def stats(self):
+        count = self._conn().execute("SELECT COUNT(*) FROM call_state").fetchone()[0]
+        return {"backend": "sqlite", "entries": count}
+
+
+def create_store(backend: str, path: str = "call_state.db", ttl_seconds: int = 7200,
+                 max_entries: int = 10000) -> CallStateStore:
+    """Build the configured call state backend ("memory" or "sqlite")."""
+    if backend == "memory":
+        return MemoryCallStateStore(ttl_seconds=ttl_seconds, max_entries=max_entries)
+    if backend == "sqlite":
+        return SQLiteCallStateStore(path, ttl_seconds=ttl_seconds, max_entries=max_entries)
+    raise ValueError(f"Unknown call state backend: {backend}")
@@ -0,0 +1,419 @@
+"""Outbound call campaigns.
+
+A campaign is a list of (phone, language) targets persisted in SQLite, plus a
+``Dialer`` that works through them:
+
+* at most ``max_concurrent`` calls are dialing or live at once
+* calls are placed no faster than ``calls_per_second`` (token bucket)
+* busy / no-answer / failed calls are retried with exponential backoff
+* progress lives in the database, so a restarted process resumes where the
+  previous one stopped; a lease on the campaign row keeps two workers from
+  dialing the same campaign
+
+Target lifecycle: pending -> dialing -> active -> done | retry -> ... | failed
+"""
+import csv
+import io
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from logs import get_logger
+
+log = get_logger(__name__)
+
+PHONE_RE = re.compile(r"^\+?[0-9]{8,15}$")
+
+# Twilio final statuses that are worth another attempt
+RETRYABLE_STATUSES = ("busy", "no-answer", "failed")
+
+# Called with a target row, returns the Twilio Call SID
+DialFn = Callable[[dict], str]
+
+
+def parse_targets(lines: Iterable[str], fmt: str, default_language: str = "en",
+                  languages: Iterable[str] = ("en", "hi", "te")) -> Iterator[Tuple[Optional[str], str]]:
+    """Yield (phone, language) from CSV or JSONL lines; phone is None for rejected rows.
+
+    A JSONL line that isn't a JSON object raises ValueError naming the line.
+    """
+    languages = tuple(languages)
+
+    if fmt == "csv":
+        rows: Iterable[dict] = csv.DictReader(lines)
+    elif fmt == "jsonl":
+        rows = _jsonl_rows(lines)
+    else:
+        raise ValueError(f"Unsupported campaign format: {fmt}")
+
+    for row in rows:
+        row = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+        phone = str(row.get("phone") or row.get("number") or row.get("to") or "")
+        phone = re.sub(r"[\s\-()]", "", phone)
+        language = str(row.get("language") or default_language).strip().lower()
+        if not PHONE_RE.match(phone) or language not in languages:
+            yield None, language
+            continue
+        if not phone.startswith("+"):
+            phone = "+" + phone
+        yield phone, language
+
+
+def _jsonl_rows(lines: Iterable[str]) -> Iterator[dict]:
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Line {number}: invalid JSON ({e})") from None
+        if not isinstance(row, dict):
+            raise ValueError(f"Line {number}: expected a JSON object, got {type(row).__name__}")
+        yield row
+
+
+class TokenBucket:
+    """Blocking rate limiter: ``rate`` tokens per second, bursts up to ``burst``."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop: Optional[threading.Event] = None) -> bool:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                delay = (1 - self.tokens) / self.rate
+            if stop is not None:
+                if stop.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
+
+
+class CampaignStore:
+    """SQLite persistence for campaigns and their targets."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = sqlite3.connect(path, timeout=10.0)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS campaigns (
+                    id TEXT PRIMARY KEY,
+                    name TEXT,
+                    mode TEXT NOT NULL DEFAULT 'record',
+                    status TEXT NOT NULL DEFAULT 'created',
+                    created_at REAL NOT NULL,
+                    rejected INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_until REAL NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS targets (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    campaign_id TEXT NOT NULL,
+                    phone TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    call_sid TEXT,
+                    last_status TEXT,
+                    updated_at REAL NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS targets_queue
+                    ON targets (campaign_id, status, next_attempt_at);
+                CREATE INDEX IF NOT EXISTS targets_call_sid ON targets (call_sid);
+                """
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, name: str, mode: str, targets: Iterable[Tuple[Optional[str], str]],
+               batch_size: int = 1000) -> Tuple[str, int, int]:
+        """Insert a campaign and stream its targets in; return (id, accepted, rejected).
+
+        Everything happens in one transaction: if ``targets`` raises (a bad
+        line in the upload), nothing is kept. Other writers wait while it
+        runs, so ``targets`` should come from a local file, not the network.
+        """
+        campaign_id = uuid.uuid4().hex[:12]
+        conn = self._conn()
+        accepted = rejected = 0
+        batch: List[tuple] = []
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO campaigns (id, name, mode, created_at) VALUES (?, ?, ?, ?)",
+                (campaign_id, name, mode, time.time()),
+            )
+            for phone, language in targets:
+                if phone is None:
+                    rejected += 1
+                    continue
+                batch.append((campaign_id, phone, language))
+                accepted += 1
+                if len(batch) >= batch_size:
+                    conn.executemany("INSERT INTO targets (campaign_id, phone, language) VALUES (?, ?, ?)", batch)
+                    batch.clear()
+            if batch:
+                conn.executemany("INSERT INTO targets (campaign_id, phone, language) VALUES (?, ?, ?)", batch)
+            conn.execute("UPDATE campaigns SET rejected = ? WHERE id = ?", (rejected, campaign_id))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return campaign_id, accepted, rejected
+
+    def get(self, campaign_id: str) -> Optional[dict]:
+        row = self._conn().execute("SELECT * FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
+        return dict(row) if row else None
+
+    def set_status(self, campaign_id: str, status: str) -> None:
+        self._conn().execute("UPDATE campaigns SET status = ? WHERE id = ?", (status, campaign_id))
+
+    def running(self) -> List[str]:
+        rows = self._conn().execute("SELECT id FROM campaigns WHERE status = 'running'").fetchall()
+        return [row["id"] for row in rows]
+
+    def acquire_lease(self, campaign_id: str, owner: str, ttl: float) -> bool:
+        """Take or renew the right to dial a campaign; False if another owner holds it."""
+        now = time.time()
+        cur = self._conn().execute(
+            "UPDATE campaigns SET lease_owner = ?, lease_until = ?"
+            " WHERE id = ? AND (lease_owner IS NULL OR lease_owner = ? OR lease_until < ?)",
+            (owner, now + ttl, campaign_id, owner, now),
+        )
+        return cur.rowcount == 1
+
+    def release_lease(self, campaign_id: str, owner: str) -> None:
+        self._conn().execute(
+            "UPDATE campaigns SET lease_owner = NULL, lease_until = 0 WHERE id = ? AND lease_owner = ?",
+            (campaign_id, owner),
+        )
+
+    def recover(self, campaign_id: str) -> int:
+        """Return targets stuck in 'dialing' (process died mid API call) to the queue."""
+        cur = self._conn().execute(
+            "UPDATE targets SET status = 'pending', updated_at = ? WHERE campaign_id = ? AND status = 'dialing'",
+            (time.time(), campaign_id),
+        )
+        return cur.rowcount
+
+    def claim(self, campaign_id: str, limit: int) -> List[dict]:
+        """Atomically move up to ``limit`` due targets to 'dialing' and return them."""
+        if limit <= 0:
+            return []
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT * FROM targets WHERE campaign_id = ? AND status IN ('pending', 'retry')"
+                " AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?",
+                (campaign_id, now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE targets SET status = 'dialing', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                [(now, row["id"]) for row in rows],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [dict(row, attempts=row["attempts"] + 1) for row in rows]
+
+    def mark_active(self, target_id: int, call_sid: str) -> None:
+        # A status callback can beat the API response; leave its result in place
+        self._conn().execute(
+            "UPDATE targets SET status = CASE status WHEN 'dialing' THEN 'active' ELSE status END,"
+            " call_sid = ?, updated_at = ? WHERE id = ?",
+            (call_sid, time.time(), target_id),
+        )
+
+    def record_result(self, target_id: int, call_status: str, max_attempts: int, backoff_seconds: float) -> str:
+        """Apply a final call status to a target and return its new state."""
+        conn = self._conn()
+        row = conn.execute("SELECT attempts FROM targets WHERE id = ?", (target_id,)).fetchone()
+        if row is None:
+            return "unknown"
+        if call_status in RETRYABLE_STATUSES and row["attempts"] < max_attempts:
+            status = "retry"
+            next_attempt = time.time() + backoff_seconds * (2 ** (row["attempts"] - 1))
+        else:
+            status = "done" if call_status == "completed" else "failed"
+            next_attempt = 0
+        conn.execute(
+            "UPDATE targets SET status = ?, last_status = ?, next_attempt_at = ?, updated_at = ? WHERE id = ?",
+            (status, call_status, next_attempt, time.time(), target_id),
+        )
+        return status
+
+    def expire_active(self, campaign_id: str, timeout: float) -> int:
+        """Close out calls that never produced a status callback."""
+        cur = self._conn().execute(
+            "UPDATE targets SET status = 'done', last_status = 'unknown', updated_at = ?"
+            " WHERE campaign_id = ? AND status = 'active' AND updated_at < ?",
+            (time.time(), campaign_id, time.time() - timeout),
+        )
+        return cur.rowcount
+
+    def counts(self, campaign_id: str) -> Dict[str, int]:
+        rows = self._conn().execute(
+            "SELECT status, COUNT(*) AS n FROM targets WHERE campaign_id = ? GROUP BY status",
+            (campaign_id,),
+        ).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+class Dialer:
+    """Works through one campaign's queue on a background thread."""
+
+    def __init__(self, store: CampaignStore, campaign_id: str, dial: DialFn,
+                 max_concurrent: int = 10, calls_per_second: float = 1.0,
+                 max_attempts: int = 3, backoff_seconds: float = 60.0,
+                 active_timeout: float = 900.0, poll_interval: float = 0.5,
+                 lease_ttl: float = 30.0):
+        self.store = store
+        self.campaign_id = campaign_id
+        self.dial = dial
+        self.max_concurrent = max_concurrent
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.active_timeout = active_timeout
+        self.poll_interval = poll_interval
+        self.lease_ttl = lease_ttl
+
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.bucket = TokenBucket(calls_per_second, burst=max(1, int(calls_per_second)))
+        self.executor = ThreadPoolExecutor(max_workers=max(1, min(max_concurrent, 32)),
+                                           thread_name_prefix=f"dialer-{campaign_id}")
+
+        self.placed = 0
+        self.api_errors = 0
+        self.started_at: Optional[float] = None
+        self._placed_times: deque = deque(maxlen=10000)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._futures: set = set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """Start dialing; False if another process holds the campaign lease."""
+        if self.running:
+            return True
+        if not self.store.acquire_lease(self.campaign_id, self.owner, self.lease_ttl):
+            return False
+        recovered = self.store.recover(self.campaign_id)
+        if recovered:
+            log.info("[CAMPAIGN] %s: requeued %d targets interrupted mid-dial", self.campaign_id, recovered)
+        self.store.set_status(self.campaign_id, "running")
+        self.started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"dialer-{self.campaign_id}", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, status: str = "paused") -> None:
+        self._stop.set()
+        self.store.set_status(self.campaign_id, status)
+        self.store.release_lease(self.campaign_id, self.owner)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if not self.store.acquire_lease(self.campaign_id, self.owner, self.lease_ttl):
+                log.warning("[CAMPAIGN] %s: lost lease, stopping", self.campaign_id)
+                return
+            self.store.expire_active(self.campaign_id, self.active_timeout)
+
+            counts = self.store.counts(self.campaign_id)
+            in_flight = counts.get("dialing", 0) + counts.get("active", 0)
+            # Claim no more than one pacing burst so unplaced targets don't sit in 'dialing'
+            batch = self.store.claim(self.campaign_id, min(self.max_concurrent - in_flight, self.bucket.capacity))
+
+            if not batch:
+                if in_flight == 0 and not counts.get("pending") and not counts.get("retry"):
+                    log.info("[CAMPAIGN] %s: finished %s", self.campaign_id, counts)
+                    self.stop(status="completed")
+                    return
+                self._stop.wait(self.poll_interval)
+                continue
+
+            for target in batch:
+                if not self.bucket.acquire(self._stop):
+                    break
+                self._futures.add(self.executor.submit(self._place, target))
+            self._futures = {f for f in self._futures if not f.done()}
+
+        # Let in-flight API calls land, then requeue anything claimed but never dialed
+        wait(self._futures)
+        self._futures.clear()
+        self.store.recover(self.campaign_id)
+        # stop() may have released the lease just before the loop renewed it
+        self.store.release_lease(self.campaign_id, self.owner)
+
+    def _place(self, target: dict) -> None:
+        try:
+            call_sid = self.dial(target)
+        except Exception as e:
+            self.api_errors += 1
+            log.error("[CAMPAIGN] %s: dialing %s failed: %s", self.campaign_id, target["phone"], e)
+            self.store.record_result(target["id"], "failed", self.max_attempts, self.backoff_seconds)
+            return
+        self.store.mark_active(target["id"], call_sid)
+        self.placed += 1
+        self._placed_times.append(time.monotonic())
+
+    def calls_per_second(self, window: float = 10.0) -> float:
+        cutoff = time.monotonic() - window
+        return sum(1 for t in list(self._placed_times) if t >= cutoff) / window
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "placed": self.placed,
+            "api_errors": self.api_errors,
+            "calls_per_second_10s": round(self.calls_per_second(10.0), 3),
+            "calls_per_second_60s": round(self.calls_per_second(60.0), 3),
+            "elapsed_seconds": round(time.time() - self.started_at, 1) if self.started_at else 0,
+        }
+
+
+def text_lines(stream) -> io.TextIOWrapper:
+    """Wrap a binary upload stream for line-by-line parsing."""
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
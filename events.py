@@ -0,0 +1,456 @@
+"""Append-only log of call events, and a CLI to summarize and export it.
+
+The app records one event per webhook, per caller turn and per call status
+change (see README, "Event log"). ``EventLog.emit`` only puts the event on a
+bounded queue; a background thread writes batches of JSON lines to rotating
+segments and fsyncs them every ``fsync_interval`` seconds, so a request never
+waits on the disk. When the queue is full, events are dropped and counted.
+
+Each process writes its own segments,
+``<directory>/events_<YYYYMMDD>_<pid>_<token>_<seq>.jsonl``, starting a new one
+at ``segment_bytes`` or when the (UTC) day changes; the oldest segments are
+deleted once the directory holds more than ``max_bytes``. A segment another
+running process may still be writing (the newest of a live pid) is never
+deleted; every worker's closed segments count against the same quota.
+
+Fields for an event can be collected as the work happens: ``begin`` (or
+``EventLog.record``) opens a dict in the current context, and ``annotate`` /
+``timed`` add to it from anywhere below, including tasks that were handed a
+copy of the context.
+
+    python events.py summarize [--dir events] [--since 2026-10-01] [--utc-offset 5.5] [--json]
+    python events.py export --out events.npz [--dir events] [--since ...] [--until ...]
+"""
+import argparse
+import atexit
+import contextvars
+import glob
+import json
+import math
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from logs import get_logger
+from procs import pid_alive
+
+log = get_logger(__name__)
+
+_fields: contextvars.ContextVar = contextvars.ContextVar("event_fields", default=None)
+
+# events_<day>_<pid>_<token>_<seq>.jsonl
+SEGMENT_RE = re.compile(r"^events_(\d{8})_(\d+)_([0-9a-f]+)_(\d+)\.jsonl$")
+
+
+def begin(**fields) -> dict:
+    """Start collecting fields for an event in the current context and return them."""
+    collected = dict(fields)
+    _fields.set(collected)
+    return collected
+
+
+def annotate(**fields) -> None:
+    """Add fields to the event being collected, if any."""
+    collected = _fields.get()
+    if collected is not None:
+        collected.update(fields)
+
+
+@contextmanager
+def timed(field: str) -> Iterator[None]:
+    """Annotate the time a block takes, in milliseconds, as ``field``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        annotate(**{field: round((time.perf_counter() - started) * 1000, 1)})
+
+
+class EventLog:
+    """Batched, append-only JSONL writer with a bounded queue."""
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024,
+                 max_bytes: int = 1024 * 1024 * 1024, queue_size: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 1.0, fsync_interval: float = 5.0,
+                 enabled: bool = True):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.enabled = enabled
+
+        self.written = 0
+        self.dropped = 0
+        self._reset()
+        if enabled:
+            os.makedirs(directory, exist_ok=True)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _reset(self) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        self._token = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._file = None
+        self._day: Optional[str] = None
+        self._size = 0
+        self._last_fsync = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _after_fork(self) -> None:
+        # Events queued in the parent stay with the parent
+        started = self._thread is not None
+        self._reset()
+        if started:
+            self.start()
+
+    def emit(self, kind: str, **fields) -> None:
+        """Queue an event; never blocks."""
+        if not self.enabled:
+            return
+        try:
+            self._queue.put_nowait({"ts": round(time.time(), 3), "kind": kind, **fields})
+        except queue.Full:
+            self.dropped += 1
+
+    @contextmanager
+    def record(self, kind: str, **fields) -> Iterator[dict]:
+        """Emit one event for a block.
+
+        The event has ``fields``, whatever is annotated inside the block, its
+        duration as ``ms`` and, if the block raises, the exception type as ``error``.
+        """
+        token = _fields.set(dict(fields))
+        collected = _fields.get()
+        started = time.perf_counter()
+        try:
+            yield collected
+        except BaseException as e:
+            collected.setdefault("error", type(e).__name__)
+            raise
+        finally:
+            _fields.reset(token)
+            collected["ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self.emit(kind, **collected)
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write out what is queued, fsync and stop the writer."""
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take()
+            try:
+                if batch:
+                    self._write(batch)
+                if self._file is not None and time.monotonic() - self._last_fsync >= self.fsync_interval:
+                    self._sync()
+            except Exception:
+                log.exception("[EVENTS] Write failed, %d events lost", len(batch))
+                self._close()
+            if self._stop.is_set() and self._queue.empty():
+                break
+        self._close()
+
+    def _take(self) -> List[dict]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[dict]) -> None:
+        data = "".join(json.dumps(event, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+                       for event in batch).encode("utf-8")
+        day = time.strftime("%Y%m%d", time.gmtime())
+        if self._file is None or day != self._day or (self._size and self._size + len(data) > self.segment_bytes):
+            self._rotate(day)
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+        self.written += len(batch)
+
+    def _rotate(self, day: str) -> None:
+        self._close()
+        self._seq += 1
+        self._day = day
+        path = os.path.join(self.directory, f"events_{day}_{os.getpid()}_{self._token}_{self._seq:04d}.jsonl")
+        self._file = open(path, "ab")
+        self._size = 0
+        self._prune()
+
+    def _sync(self) -> None:
+        os.fsync(self._file.fileno())
+        self._last_fsync = time.monotonic()
+
+    def _close(self) -> None:
+        if self._file is not None:
+            try:
+                self._sync()
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _prune(self) -> None:
+        segments = []
+        # (pid, token) -> (day, seq, path) of the newest segment of each writer
+        newest: Dict[tuple, tuple] = {}
+        for path in glob.glob(os.path.join(self.directory, "events_*.jsonl")):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            segments.append((st.st_mtime, path, st.st_size))
+            match = SEGMENT_RE.match(os.path.basename(path))
+            if match:
+                day, pid, token, seq = match.groups()
+                writer = (int(pid), token)
+                newest[writer] = max(newest.get(writer, ("", 0, "")), (day, int(seq), path))
+        # Deleting a segment that a live worker still has open would lose what it writes next
+        open_segments = {path for (pid, _), (_, _, path) in newest.items() if pid_alive(pid)}
+        if self._file is not None:
+            open_segments.add(self._file.name)
+
+        total = sum(size for _, _, size in segments)
+        for _, path, size in sorted(segments):
+            if total <= self.max_bytes:
+                break
+            if path in open_segments:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "written": self.written,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize(),
+            "segment": os.path.basename(self._file.name) if self._file is not None else None,
+        }
+
+
+def read_events(directory: str) -> Iterator[dict]:
+    """Every event in the directory's segments, one segment at a time."""
+    for path in sorted(glob.glob(os.path.join(directory, "events_*.jsonl"))):
+        with open(path, "rb") as fh:
+            for line in fh:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Torn last line of a segment whose writer died mid-batch
+                    continue
+
+
+class Quantiles:
+    """Streaming percentiles of millisecond values, to within ~2.5% (or 0.1 ms), in bounded memory."""
+
+    GROWTH = 1.05
+    RESOLUTION = 0.1
+
+    def __init__(self):
+        self.buckets: Counter = Counter()
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        scaled = value / self.RESOLUTION
+        self.buckets[int(math.log(scaled) / math.log(self.GROWTH)) if scaled >= 1 else 0] += 1
+        self.count += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = pct / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return round(self.GROWTH ** (bucket + 0.5) * self.RESOLUTION, 1) if bucket else 0.0
+        return None
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {"count": self.count, **{f"p{pct}": self.percentile(pct) for pct in (50, 90, 99)}}
+
+
+LATENCIES = {"webhook": ("ms",), "turn": ("ms", "stt_ms", "query_ms", "tts_ms")}
+
+
+class DaySummary:
+    def __init__(self):
+        self.calls = set()
+        self.kinds: Counter = Counter()
+        self.languages: Counter = Counter()
+        self.intents: Counter = Counter()
+        self.outcomes: Counter = Counter()
+        self.fallbacks: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.call_statuses: Counter = Counter()
+        self.latency: Dict[str, Quantiles] = {}
+        self.webhooks = Quantiles()
+
+    def add(self, event: dict) -> None:
+        kind = event.get("kind")
+        self.kinds[kind] += 1
+        if event.get("call_sid"):
+            self.calls.add(event["call_sid"])
+        if event.get("fallback"):
+            self.fallbacks[event["fallback"]] += 1
+        if event.get("error"):
+            self.errors[f"{kind}:{event['error']}"] += 1
+        if kind == "call":
+            self.call_statuses[event.get("call_status")] += 1
+            if isinstance(event.get("webhooks"), int):
+                self.webhooks.add(event["webhooks"])
+        if kind == "turn" and not event.get("replayed"):
+            self.languages[event.get("language")] += 1
+            self.intents[event.get("intent") or "(none)"] += 1
+            self.outcomes[event.get("outcome") or ("error" if event.get("error") else "ok")] += 1
+        if kind in LATENCIES and not event.get("replayed"):
+            for field in LATENCIES[kind]:
+                value = event.get(field)
+                if isinstance(value, (int, float)):
+                    name = f"{kind}_{field}" if field != "ms" else f"{kind}_ms"
+                    self.latency.setdefault(name, Quantiles()).add(value)
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": len(self.calls),
+            "events": dict(self.kinds),
+            "languages": dict(self.languages.most_common()),
+            "intents": dict(self.intents.most_common()),
+            "outcomes": dict(self.outcomes.most_common()),
+            "fallbacks": dict(self.fallbacks.most_common()),
+            "errors": dict(self.errors.most_common()),
+            "call_statuses": dict(self.call_statuses.most_common()),
+            "latency_ms": {name: q.summary() for name, q in sorted(self.latency.items())},
+            "webhooks_per_call": self.webhooks.summary(),
+        }
+
+
+def day_of(ts: float, utc_offset_hours: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ts + utc_offset_hours * 3600))
+
+
+def summarize(events: Iterator[dict], utc_offset_hours: float = 0.0, since: Optional[str] = None,
+              until: Optional[str] = None) -> Dict[str, dict]:
+    """Per-day summaries (day -> summary dict) of a stream of events."""
+    days: Dict[str, DaySummary] = {}
+    for event in events:
+        day = day_of(event.get("ts", 0), utc_offset_hours)
+        if (since and day < since) or (until and day > until):
+            continue
+        days.setdefault(day, DaySummary()).add(event)
+    return {day: days[day].to_dict() for day in sorted(days)}
+
+
+def _print_summary(summaries: Dict[str, dict]) -> None:
+    for day, summary in summaries.items():
+        print(f"== {day}: {summary['calls']} calls, "
+              + ", ".join(f"{count} {kind}" for kind, count in summary["events"].items()))
+        for key in ("languages", "intents", "outcomes", "fallbacks", "errors", "call_statuses"):
+            if summary[key]:
+                print(f"  {key:<14} " + ", ".join(f"{name}={count}" for name, count in summary[key].items()))
+        for name, q in list(summary["latency_ms"].items()) + [("webhooks/call", summary["webhooks_per_call"])]:
+            if q["count"]:
+                print(f"  {name:<14} n={q['count']} p50={q['p50']} p90={q['p90']} p99={q['p99']}")
+
+
+# Columns of the export: numeric ones as float64 (NaN when absent), the rest
+# dictionary-encoded as int32 codes (-1 when absent) plus a "<name>__values" array
+NUMERIC_COLUMNS = ("ts", "ms", "status", "stt_ms", "query_ms", "tts_ms", "score", "call_duration", "webhooks",
+                   "replayed")
+STRING_COLUMNS = ("kind", "call_sid", "route", "state", "screen", "digits", "language", "mode", "intent",
+                  "outcome", "fallback", "error", "call_status")
+
+
+def export(events: Iterator[dict], out_path: str, utc_offset_hours: float = 0.0, since: Optional[str] = None,
+           until: Optional[str] = None) -> int:
+    """Write events to a compressed columnar ``.npz`` file; returns the number of rows."""
+    from array import array
+
+    import numpy as np
+
+    numeric = {name: array("d") for name in NUMERIC_COLUMNS}
+    codes = {name: array("i") for name in STRING_COLUMNS}
+    values: Dict[str, Dict[str, int]] = {name: {} for name in STRING_COLUMNS}
+    rows = 0
+    for event in events:
+        day = day_of(event.get("ts", 0), utc_offset_hours)
+        if (since and day < since) or (until and day > until):
+            continue
+        for name, column in numeric.items():
+            value = event.get(name)
+            column.append(float(value) if isinstance(value, (int, float)) else math.nan)
+        for name, column in codes.items():
+            value = event.get(name)
+            if value is None:
+                column.append(-1)
+            else:
+                column.append(values[name].setdefault(str(value), len(values[name])))
+        rows += 1
+
+    arrays = {name: np.frombuffer(column, dtype=np.float64) for name, column in numeric.items()}
+    for name, column in codes.items():
+        arrays[name] = np.frombuffer(column, dtype=np.int32)
+        arrays[f"{name}__values"] = np.array(list(values[name]), dtype=str)
+    np.savez_compressed(out_path, **arrays)
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Summarize or export the IVR event log.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("summarize", "export"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--dir", default=os.environ.get("EVENT_LOG_DIR", os.path.join(os.getcwd(), "events")))
+        cmd.add_argument("--since", help="first day (YYYY-MM-DD) to include")
+        cmd.add_argument("--until", help="last day (YYYY-MM-DD) to include")
+        cmd.add_argument("--utc-offset", type=float, default=0.0, help="hours added to UTC to get the day, e.g. 5.5")
+    sub.choices["summarize"].add_argument("--json", action="store_true", help="print JSON instead of text")
+    sub.choices["export"].add_argument("--out", required=True, help="output .npz file")
+    args = parser.parse_args(argv)
+
+    events = read_events(args.dir)
+    if args.command == "summarize":
+        summaries = summarize(events, args.utc_offset, args.since, args.until)
+        if args.json:
+            json.dump(summaries, sys.stdout, indent=2, ensure_ascii=False)
+            print()
+        else:
+            _print_summary(summaries)
+    else:
+        rows = export(events, args.out, args.utc_offset, args.since, args.until)
+        print(f"Wrote {rows} events to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
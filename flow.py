@@ -0,0 +1,227 @@
+"""Declarative IVR call flow, compiled to pre-rendered TwiML.
+
+The call flow lives in a JSON spec (``flow.json``): the prompts per language
+and a set of named states. Every state is a webhook at ``/twilio/<state>``
+and is one of:
+
+* a screen, with a list of ``verbs``:
+
+  - ``{"say": "<prompt>", "language": "en"}``: a prompt spoken with <Say>
+  - ``{"play": "<prompt>", "fallback": "..."}``: a prompt played as TTS audio;
+    without audio it is spoken with <Say>, or as the English ``fallback`` for
+    languages Twilio has no voice for
+  - ``{"gather": "<state>", "timeout": 5, "verbs": [...]}``: one DTMF digit, sent to a state
+  - ``{"listen": "<state>"}``: capture the caller's question, with <Record>
+    (action: the state) or <Connect><Stream>, depending on the call's mode
+  - ``{"redirect": "<state>"}``, ``{"pause": 2}``, ``{"hangup": true}``
+
+  Any verb can be limited to some call modes with ``"modes": ["record"]``.
+  ``start_call`` resets the call state; ``set_language`` maps the pressed
+  digit to the caller's language.
+
+  With ``inline``, a redirect to a screen that doesn't change the call state
+  (no ``start_call`` / ``set_language``) is replaced by that screen's verbs,
+  saving Twilio a round trip; redirects that would loop are kept.
+* a menu, with ``digits`` (digit -> state) and a ``default`` state; it answers
+  with the chosen state's TwiML directly, without another round trip.
+
+At startup every screen is rendered once per language and call mode into a
+``Template``: the TwiML as UTF-8 bytes, split at the ``play`` verbs, whose
+audio URLs are the only part that changes between requests (a prompt
+synthesized in chunks fills its slot with one <Play> per chunk). Answering a
+webhook is then a join of byte strings.
+"""
+import json
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from twilio.twiml.voice_response import Connect, Gather, VoiceResponse
+
+_SLOT_MARKER = "@@slot{}@@"
+
+
+class Slot(NamedTuple):
+    """A ``play`` verb: the prompt to synthesize and the pre-rendered <Say> used without audio."""
+    prompt: str
+    text: str
+    say: bytes
+
+
+class Template:
+    """Pre-rendered TwiML with a hole for each ``play`` verb."""
+
+    def __init__(self, parts: List[bytes], slots: List[Slot]):
+        self.parts = parts
+        self.slots = slots
+
+    def render(self, audio_urls: Iterable[Optional[List[str]]]) -> Tuple[bytes, List[Slot]]:
+        """Fill each slot with a <Play> verb per audio URL, in order; None (or no URLs)
+        falls back to the slot's <Say>.
+
+        Returns the TwiML and the slots that fell back.
+        """
+        out = [self.parts[0]]
+        said = []
+        for slot, urls, part in zip(self.slots, audio_urls, self.parts[1:]):
+            if urls:
+                out.extend(b"<Play>" + escape(url).encode("utf-8") + b"</Play>" for url in urls)
+            else:
+                out.append(slot.say)
+                said.append(slot)
+            out.append(part)
+        return b"".join(out), said
+
+    def fragment(self) -> "Template":
+        """The same template without the XML declaration and <Response>, to append to other TwiML."""
+        parts = list(self.parts)
+        parts[0] = parts[0][parts[0].index(b"<Response>") + len(b"<Response>"):]
+        parts[-1] = parts[-1][:parts[-1].rindex(b"</Response>")]
+        return Template(parts, self.slots)
+
+
+def _fragment(vr: VoiceResponse) -> str:
+    """The TwiML of a response's verbs, without the XML declaration and <Response>."""
+    xml = str(vr)
+    return xml[xml.index("<Response>") + len("<Response>"):xml.rindex("</Response>")]
+
+
+class Flow:
+    """Compiled call flow."""
+
+    def __init__(self, spec: dict, base_url: str, stream_url: str, languages: Dict[str, str],
+                 say_languages: Iterable[str] = (), modes: Iterable[str] = ("record", "stream"),
+                 inline: bool = False):
+        self.base_url = base_url.rstrip("/")
+        self.stream_url = stream_url
+        self.languages = languages
+        self.say_languages = frozenset(say_languages)
+        self.modes = tuple(modes)
+        self.inline = inline
+        self.prompts: Dict[str, Dict[str, str]] = spec["prompts"]
+        self.states: Dict[str, dict] = spec["states"]
+
+        self._check()
+        self.templates: Dict[Tuple[str, str, str], Template] = {
+            (name, language, mode): self._compile(name, language, mode)
+            for name, state in self.states.items() if "verbs" in state
+            for language in languages
+            for mode in self.modes
+        }
+        self.fragments = {key: template.fragment() for key, template in self.templates.items()}
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "Flow":
+        with open(path, encoding="utf-8") as fh:
+            return cls(json.load(fh), **kwargs)
+
+    def resolve(self, state: str, digits: Optional[str]) -> str:
+        """Follow menu states to the screen that answers a webhook."""
+        seen = set()
+        while "verbs" not in self.states[state]:
+            if state in seen:
+                raise ValueError(f"Menu loop at state '{state}'")
+            seen.add(state)
+            menu = self.states[state]
+            state = menu["digits"].get(digits or "", menu["default"])
+        return state
+
+    def template(self, state: str, language: str, mode: str) -> Template:
+        return self.templates[(state, language, mode)]
+
+    def fragment(self, state: str, language: str, mode: str) -> Template:
+        return self.fragments[(state, language, mode)]
+
+    def url(self, state: str) -> str:
+        return f"{self.base_url}/twilio/{state}"
+
+    def _check(self) -> None:
+        """Reject references to unknown states and prompts before anything is compiled."""
+        def check_state(name: str, where: str) -> None:
+            if name not in self.states and name != "recording":
+                raise ValueError(f"{where}: unknown state '{name}'")
+
+        def check_verbs(verbs: List[dict], where: str) -> None:
+            for verb in verbs:
+                for key in ("gather", "redirect"):
+                    if key in verb:
+                        check_state(verb[key], where)
+                if "listen" in verb:
+                    check_state(verb["listen"], where)
+                for key in ("say", "play"):
+                    if key in verb and not any(verb[key] in prompts for prompts in self.prompts.values()):
+                        raise ValueError(f"{where}: unknown prompt '{verb[key]}'")
+                check_verbs(verb.get("verbs", []), where)
+
+        for name, state in self.states.items():
+            if "verbs" in state:
+                check_verbs(state["verbs"], f"state '{name}'")
+            else:
+                for target in list(state["digits"].values()) + [state["default"]]:
+                    check_state(target, f"menu '{name}'")
+
+    def _prompt(self, key: str, language: str) -> str:
+        return self.prompts[language].get(key) or self.prompts["en"][key]
+
+    def _compile(self, name: str, language: str, mode: str) -> Template:
+        slots: List[Slot] = []
+        vr = VoiceResponse()
+        self._append(vr, self.states[name]["verbs"], language, mode, slots, (name,))
+
+        xml = str(vr)
+        parts = []
+        for index in range(len(slots)):
+            before, xml = xml.split(f"<Play>{_SLOT_MARKER.format(index)}</Play>", 1)
+            parts.append(before.encode("utf-8"))
+        parts.append(xml.encode("utf-8"))
+        return Template(parts, slots)
+
+    def _inlinable(self, state: str, screens: Tuple[str, ...]) -> bool:
+        spec = self.states.get(state, {})
+        return (self.inline and "verbs" in spec and state not in screens
+                and not spec.get("start_call") and "set_language" not in spec)
+
+    def _append(self, target, verbs: List[dict], language: str, mode: str, slots: List[Slot],
+                screens: Tuple[str, ...] = ()) -> None:
+        """Add verbs to ``target``; ``screens`` are the states being compiled (to stop inline loops)."""
+        lang_code = self.languages[language]
+        for verb in verbs:
+            if mode not in verb.get("modes", self.modes):
+                continue
+            if "say" in verb:
+                say_language = verb.get("language", language)
+                target.say(self._prompt(verb["say"], say_language), language=self.languages[say_language])
+            elif "play" in verb:
+                text = self._prompt(verb["play"], language)
+                fallback = VoiceResponse()
+                if language in self.say_languages:
+                    fallback.say(text, language=lang_code)
+                else:
+                    fallback.say(verb.get("fallback", text), language=self.languages["en"])
+                slots.append(Slot(verb["play"], text, _fragment(fallback).encode("utf-8")))
+                target.play(_SLOT_MARKER.format(len(slots) - 1))
+            elif "gather" in verb:
+                gather = Gather(num_digits=verb.get("num_digits", 1), action=self.url(verb["gather"]),
+                                method="POST", timeout=verb.get("timeout", 5))
+                self._append(gather, verb.get("verbs", []), language, mode, slots, screens)
+                target.append(gather)
+            elif "listen" in verb:
+                if mode == "stream":
+                    connect = Connect()
+                    stream = connect.stream(url=self.stream_url)
+                    stream.parameter(name="language", value=language)
+                    target.append(connect)
+                else:
+                    target.record(action=self.url(verb["listen"]), method="POST", max_length=60,
+                                  play_beep=True, timeout=5)
+            elif "redirect" in verb:
+                if self._inlinable(verb["redirect"], screens):
+                    self._append(target, self.states[verb["redirect"]]["verbs"], language, mode, slots,
+                                 screens + (verb["redirect"],))
+                else:
+                    target.redirect(self.url(verb["redirect"]))
+            elif "pause" in verb:
+                target.pause(length=verb["pause"])
+            elif verb.get("hangup"):
+                target.hangup()
+            else:
+                raise ValueError(f"Unknown verb: {verb}")
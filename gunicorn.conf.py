@@ -0,0 +1,78 @@
+"""Gunicorn settings for the IVR.
+
+Almost all of a webhook's time is spent waiting on Sarvam or Twilio, so a
+worker must keep serving other callers while one request waits on a vendor.
+Two profiles, chosen with GUNICORN_WORKER_CLASS:
+
+* ``gthread`` (default): each worker runs GUNICORN_THREADS request threads.
+  Blocking vendor calls release the GIL, so a worker handles up to
+  ``threads`` requests at once. Needs nothing beyond gunicorn.
+* ``gevent``: green threads with cooperative, non-blocking sockets (requests
+  and the Twilio client are monkey-patched by the worker). A worker handles up
+  to GUNICORN_WORKER_CONNECTIONS requests at once. Requires ``pip install gevent``.
+
+Concurrency limit per instance = workers x threads (gthread) or workers x
+worker_connections (gevent). A call in "stream" mode holds one of those
+slots for its whole duration (the Media Streams WebSocket); a call in
+"record" mode only holds one while a webhook is being answered.
+
+Startup: with GUNICORN_PRELOAD=1 the master imports the app once and forks
+workers from it, so a worker restart doesn't pay for the imports again
+(gthread only: gevent has to patch the standard library before the app is
+imported, which happens in the worker). Each
+worker starts its background threads in ``post_worker_init``, and with
+WARMUP=1 also runs ``app_new.warm_up`` there, before it accepts its first
+request.
+
+    gunicorn -c gunicorn.conf.py 'app_new:create_app()'
+"""
+import glob
+import multiprocessing
+import os
+import sys
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+# Call state, metrics and campaign leases are shared through files, so any worker count is safe
+workers = int(os.environ.get("WEB_CONCURRENCY", min(2, multiprocessing.cpu_count())))
+threads = int(os.environ.get("GUNICORN_THREADS", "32"))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "200"))
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "0") == "1"
+if preload_app and worker_class == "gevent":
+    # gevent workers monkey-patch after the fork; a preloaded app would already hold the
+    # master's unpatched sockets, locks and thread pools
+    raise RuntimeError("GUNICORN_PRELOAD=1 does not work with GUNICORN_WORKER_CLASS=gevent")
+
+# A recording turn can legitimately take connect + read timeouts for STT and TTS;
+# the worker timeout only has to catch a wedged worker, not a slow vendor
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+# Twilio reuses connections for its webhook and <Play> fetches
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    # Metrics snapshots (and their archive) from the previous master's workers; counters
+    # restart from zero with the new master, as Prometheus expects after a restart
+    directory = os.environ.get("METRICS_DIR", os.path.join(os.getcwd(), "metrics"))
+    for path in glob.glob(os.path.join(directory, "metrics_*.json*")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def post_worker_init(worker):
+    # Runs before the worker accepts connections; warm-up must finish well within `timeout`
+    app_module = sys.modules.get("app_new")
+    if app_module is None:
+        return
+    app_module.start_services()
+    if app_module.WARMUP:
+        app_module.warm_up()
@@ -0,0 +1,135 @@
+"""Data-driven intent matching for caller transcripts.
+
+Intents, their keywords per language and their reply templates live in a
+JSON table (``intents.json``). At load time every keyword of every intent
+and language is compiled into one Aho-Corasick automaton, so matching a
+transcript is a single pass over its characters regardless of how many
+intents or keywords exist.
+
+Keywords and transcripts go through the same normalization: Unicode NFC (so
+precomposed and decomposed Devanagari/Telugu forms compare equal), casefold,
+removal of zero-width joiners, and whitespace collapsing. Matching keeps the
+substring semantics of the old ``word in text`` checks.
+
+When several intents match, each scores ``weight`` per distinct keyword hit;
+the highest score wins and ties go to the intent listed first.
+"""
+import json
+import re
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# ZWNJ / ZWJ / BOM show up inconsistently in Indic STT output and keywords
+_INVISIBLE_RE = re.compile("[\u200b\u200c\u200d\ufeff]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFC", text or "")
+    text = _INVISIBLE_RE.sub("", text).casefold()
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+class Intent(NamedTuple):
+    name: str
+    weight: float
+    replies: Dict[str, str]
+
+
+class IntentMatch(NamedTuple):
+    intent: Intent
+    score: float
+    keywords: Tuple[str, ...]
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over normalized keywords."""
+
+    def __init__(self, keywords: Iterable[Tuple[str, int]]):
+        # Node 0 is the root; each node has transitions, a failure link and outputs
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, int]]] = [[]]
+
+        for keyword, payload in keywords:
+            node = 0
+            for ch in keyword:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((keyword, payload))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt].extend(self._out[self._fail[nxt]])
+
+    @property
+    def size(self) -> int:
+        return len(self._goto)
+
+    def find(self, text: str) -> Iterable[Tuple[str, int]]:
+        """Yield (keyword, payload) for every occurrence in ``text``."""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                yield from out[node]
+
+
+class IntentEngine:
+    """Compiled intent table."""
+
+    def __init__(self, table: dict):
+        self.intents: List[Intent] = []
+        self.fallback: Dict[str, str] = table.get("fallback", {})
+
+        keywords: List[Tuple[str, int]] = []
+        for index, spec in enumerate(table.get("intents", [])):
+            self.intents.append(Intent(spec["name"], float(spec.get("weight", 1.0)), spec.get("replies", {})))
+            for words in spec.get("keywords", {}).values():
+                for word in words:
+                    normalized = normalize(word)
+                    if normalized:
+                        keywords.append((normalized, index))
+
+        self.keyword_count = len(keywords)
+        self.automaton = KeywordAutomaton(keywords)
+
+    @classmethod
+    def from_file(cls, path: str) -> "IntentEngine":
+        with open(path, encoding="utf-8") as fh:
+            return cls(json.load(fh))
+
+    def match(self, text: str) -> Optional[IntentMatch]:
+        """Return the best scoring intent for a transcript, or None."""
+        hits: Dict[int, set] = {}
+        for keyword, index in self.automaton.find(normalize(text)):
+            hits.setdefault(index, set()).add(keyword)
+        if not hits:
+            return None
+
+        best_index = max(hits, key=lambda i: (self.intents[i].weight * len(hits[i]), -i))
+        intent = self.intents[best_index]
+        return IntentMatch(intent, intent.weight * len(hits[best_index]), tuple(sorted(hits[best_index])))
+
+    def reply(self, match: Optional[IntentMatch], language: str, **slots) -> str:
+        """Render the reply template for a match (or the fallback) in a language."""
+        templates = match.intent.replies if match else self.fallback
+        template = templates.get(language) or templates.get("en") or ""
+        return template.format(**slots)
@@ -0,0 +1,216 @@
+"""Logging setup for the IVR: levels, JSON lines, per-call tracing.
+
+* Records are handed to a bounded queue and written by a background
+  ``QueueListener`` thread, so request threads never block on stdout. When
+  the queue is full, records are dropped and counted rather than stalling.
+* Every record carries the ``call_sid`` (the trace id for a call) and the
+  ``request_id`` bound to the current context by ``bind_call``.
+* DEBUG output can be switched on for individual calls while the process
+  stays at INFO: loggers from ``get_logger`` treat DEBUG as enabled when the
+  current call is traced, and as disabled (one contextvar lookup) otherwise.
+* ``redact`` strips audio/base64 blobs and credentials from vendor payloads,
+  and ``log_payload`` only emits a sampled fraction of them.
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import uuid
+from typing import Any, Callable, Iterable, Optional
+
+_call_sid = contextvars.ContextVar("call_sid", default=None)
+_request_id = contextvars.ContextVar("request_id", default=None)
+_traced = contextvars.ContextVar("traced", default=False)
+
+ROOT_LOGGER = "ivr"
+
+# Payload keys whose values are never logged verbatim
+SENSITIVE_KEYS = ("audio", "audios", "audio_base64", "base64_audio", "base64", "data", "file",
+                  "authorization", "auth", "auth_token", "api-subscription-key", "password", "token")
+_BASE64_RE = re.compile(r"[A-Za-z0-9+/=]{200,}")
+_BEARER_RE = re.compile(r"(Bearer\s+)[^\s'\"]+")
+
+_state = {"payload_sample_rate": 0.01, "traced_calls": frozenset(), "trace_lookup": None,
+          "listener": None, "handler": None}
+
+
+class TracingLogger(logging.Logger):
+    """Logger that also enables DEBUG for traced calls."""
+
+    def isEnabledFor(self, level: int) -> bool:
+        if super().isEnabledFor(level):
+            return True
+        return level >= logging.DEBUG and _traced.get()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Return a tracing-aware logger under the ``ivr`` namespace."""
+    full_name = ROOT_LOGGER if name in ("__main__", ROOT_LOGGER) else f"{ROOT_LOGGER}.{name}"
+    manager = logging.Logger.manager
+    previous = manager.loggerClass
+    manager.setLoggerClass(TracingLogger)
+    try:
+        return logging.getLogger(full_name)
+    finally:
+        manager.loggerClass = previous
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def bind_call(call_sid: Optional[str], request_id: Optional[str] = None, traced: Optional[bool] = None):
+    """Bind a call to the current context (request thread or worker task)."""
+    _call_sid.set(call_sid)
+    _request_id.set(request_id or new_request_id())
+    if traced is None:
+        traced = bool(call_sid) and _trace_requested(call_sid)
+    _traced.set(traced)
+
+
+def _trace_requested(call_sid: str) -> bool:
+    if call_sid in _state["traced_calls"]:
+        return True
+    lookup = _state["trace_lookup"]
+    try:
+        return bool(lookup and lookup(call_sid))
+    except Exception:
+        return False
+
+
+def redact(value: Any, max_string: int = 200) -> Any:
+    """Copy of a payload with audio, base64 blobs and credentials removed."""
+    if isinstance(value, dict):
+        out = {}
+        for key, item in value.items():
+            if str(key).lower() in SENSITIVE_KEYS:
+                out[key] = f"<redacted {len(item) if hasattr(item, '__len__') else '?'} items/chars>"
+            else:
+                out[key] = redact(item, max_string)
+        return out
+    if isinstance(value, (list, tuple)):
+        return [redact(item, max_string) for item in value]
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, str):
+        return scrub(value)[:max_string] + ("..." if len(value) > max_string else "")
+    return value
+
+
+def scrub(text: str) -> str:
+    """Remove base64 runs and bearer tokens from free text."""
+    text = _BASE64_RE.sub(lambda m: f"<base64 {len(m.group(0))} chars>", text)
+    return _BEARER_RE.sub(r"\1<redacted>", text)
+
+
+def log_payload(logger: logging.Logger, label: str, payload: Any) -> None:
+    """Log a vendor payload at DEBUG: always for traced calls, otherwise sampled."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if not _traced.get() and random.random() >= _state["payload_sample_rate"]:
+        return
+    logger.debug("%s: %s", label, redact(payload))
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.call_sid = _call_sid.get()
+        record.request_id = _request_id.get()
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks: drops records when the queue is full."""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only resolve the message here; full formatting happens on the listener thread
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": scrub(record.getMessage()),
+        }
+        if getattr(record, "call_sid", None):
+            entry["call_sid"] = record.call_sid
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(call_sid)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        record.message = scrub(record.getMessage())
+        return scrub(super().format(record))
+
+
+def configure_logging(level: str = "INFO", fmt: str = "json", queue_size: int = 10000,
+                      payload_sample_rate: float = 0.01, traced_calls: Iterable[str] = (),
+                      trace_lookup: Optional[Callable[[str], bool]] = None, stream=None) -> None:
+    """Install the queue-backed handler on the ``ivr`` logger. Safe to call again.
+
+    ``traced_calls`` are always logged at DEBUG; ``trace_lookup(call_sid)`` can
+    switch tracing on for other calls at runtime.
+    """
+    _state["payload_sample_rate"] = payload_sample_rate
+    _state["traced_calls"] = frozenset(sid for sid in traced_calls if sid)
+    _state["trace_lookup"] = trace_lookup
+
+    root = get_logger(ROOT_LOGGER)
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+    root.propagate = False
+
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(ContextFilter())
+    listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=False)
+    listener.start()
+
+    root.addHandler(handler)
+    _state["handler"] = handler
+    _state["listener"] = listener
+
+
+def shutdown_logging() -> None:
+    """Flush and stop the background writer."""
+    root = logging.getLogger(ROOT_LOGGER)
+    if _state["handler"] is not None:
+        root.removeHandler(_state["handler"])
+        _state["handler"] = None
+    if _state["listener"] is not None:
+        _state["listener"].stop()
+        _state["listener"] = None
+
+
+def dropped_records() -> int:
+    return DroppingQueueHandler.dropped
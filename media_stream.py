@@ -0,0 +1,185 @@
+"""Conversation engine for Twilio Media Streams (``<Connect><Stream>``).
+
+Twilio sends the caller's audio over a WebSocket as base64 8 kHz mu-law
+frames (20 ms each). ``MediaStreamSession`` runs them through ``EnergyVAD``
+as they arrive, so end-of-speech is detected a few hundred milliseconds after
+the caller stops talking instead of after Record's fixed silence timeout. The
+buffered utterance is handed to a turn handler on a worker thread and the
+mu-law reply it returns is streamed back over the same socket. A handler can
+also return an iterable of mu-law pieces (e.g. one per synthesized sentence);
+each is sent as soon as the handler yields it. If a turn fails, the caller
+hears the audio from the ``on_error`` callback (a cached apology), or a short
+tone when it has none, instead of silence.
+"""
+import base64
+import contextvars
+import json
+import threading
+from collections import deque
+from concurrent.futures import Executor
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from audio import EnergyVAD, chunk_bytes, ulaw_decode, ulaw_encode
+from logs import bind_call, get_logger
+
+log = get_logger(__name__)
+
+STREAM_SAMPLE_RATE = 8000
+
+# (session, utterance PCM) -> mu-law reply audio (or its pieces, in order), or None to stay silent
+TurnHandler = Callable[["MediaStreamSession", np.ndarray], Optional[Union[bytes, Iterable[bytes]]]]
+# session -> mu-law audio to play when a turn fails, or None for ERROR_TONE
+ErrorAudio = Callable[["MediaStreamSession"], Optional[bytes]]
+
+
+def _error_tone() -> bytes:
+    # Two 150 ms beeps at 480 Hz, 100 ms apart
+    t = np.arange(int(0.15 * STREAM_SAMPLE_RATE)) / STREAM_SAMPLE_RATE
+    beep = (6000 * np.sin(2 * np.pi * 480 * t)).astype(np.int16)
+    gap = np.zeros(int(0.1 * STREAM_SAMPLE_RATE), dtype=np.int16)
+    return ulaw_encode(np.concatenate([beep, gap, beep]))
+
+
+ERROR_TONE = _error_tone()
+
+
+class MediaStreamSession:
+    """One Media Streams WebSocket connection."""
+
+    def __init__(self, ws, on_utterance: TurnHandler, executor: Executor,
+                 vad: Optional[EnergyVAD] = None, preroll_ms: int = 200,
+                 send_chunk_bytes: int = 8000, on_error: Optional[ErrorAudio] = None):
+        self.ws = ws
+        self.on_utterance = on_utterance
+        self.on_error = on_error
+        self.executor = executor
+        self.vad = vad or EnergyVAD(sample_rate=STREAM_SAMPLE_RATE)
+        self.send_chunk_bytes = send_chunk_bytes
+
+        self.stream_sid: Optional[str] = None
+        self.call_sid: Optional[str] = None
+        self.parameters: Dict[str, str] = {}
+
+        self.busy = False
+        self.playing = False
+        self.turns = 0
+
+        # Audio from just before the VAD triggers, so word onsets aren't clipped
+        self._preroll: deque = deque(maxlen=max(1, preroll_ms // 20))
+        self._utterance: Optional[List[np.ndarray]] = None
+        self._send_lock = threading.Lock()
+        self._mark_seq = 0
+
+    def run(self) -> None:
+        """Read messages until Twilio stops the stream or closes the socket."""
+        while True:
+            raw = self.ws.receive()
+            if raw is None:
+                break
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                continue
+            if not self.handle(message):
+                break
+
+    def handle(self, message: dict) -> bool:
+        """Process one Twilio message; return False when the stream has ended."""
+        event = message.get("event")
+        if event == "start":
+            start = message.get("start", {})
+            self.stream_sid = start.get("streamSid") or message.get("streamSid")
+            self.call_sid = start.get("callSid")
+            self.parameters = start.get("customParameters") or {}
+            bind_call(self.call_sid)
+            log.info("[STREAM] Started %s for call %s, params: %s", self.stream_sid, self.call_sid, self.parameters)
+        elif event == "media":
+            media = message.get("media", {})
+            if media.get("track", "inbound") == "inbound":
+                self.feed(ulaw_decode(base64.b64decode(media.get("payload", ""))))
+        elif event == "mark":
+            self.playing = False
+        elif event == "stop":
+            log.info("[STREAM] Stopped %s", self.stream_sid)
+            return False
+        return True
+
+    def feed(self, pcm: np.ndarray) -> None:
+        """Run inbound PCM through the VAD and dispatch finished utterances."""
+        if self.busy:
+            # Still answering the previous question; ignore talk-over
+            return
+
+        event = self.vad.process(pcm)
+        if self._utterance is not None:
+            self._utterance.append(pcm)
+        elif event == "start" or self.vad.in_speech:
+            self._utterance = list(self._preroll) + [pcm]
+            self._preroll.clear()
+        else:
+            self._preroll.append(pcm)
+
+        if event == "start" and self.playing:
+            # Caller barged in over our reply
+            self.clear()
+
+        if event == "end" and self._utterance:
+            utterance = np.concatenate(self._utterance)
+            self._utterance = None
+            self.busy = True
+            log.info("[STREAM] End of speech after %.2fs of audio", len(utterance) / STREAM_SAMPLE_RATE)
+            # Carry the call's logging context over to the worker thread
+            self.executor.submit(contextvars.copy_context().run, self._run_turn, utterance)
+
+    def _run_turn(self, utterance: np.ndarray) -> None:
+        try:
+            reply = self.on_utterance(self, utterance)
+            if reply:
+                self.send_audio(reply)
+            self.turns += 1
+        except Exception:
+            log.exception("[STREAM] Turn failed for call %s", self.call_sid)
+            self._apologize()
+        finally:
+            self.busy = False
+
+    def _apologize(self) -> None:
+        """Tell the caller the turn failed, so they aren't left in silence."""
+        audio = None
+        if self.on_error is not None:
+            try:
+                audio = self.on_error(self)
+            except Exception:
+                log.exception("[STREAM] No error prompt for call %s", self.call_sid)
+        try:
+            self.send_audio(audio or ERROR_TONE)
+        except Exception:
+            log.exception("[STREAM] Could not send the error prompt for call %s", self.call_sid)
+
+    def _send(self, message: dict) -> None:
+        with self._send_lock:
+            self.ws.send(json.dumps(message))
+
+    def send_audio(self, ulaw: Union[bytes, Iterable[bytes]]) -> None:
+        """Stream mu-law audio back to the caller, followed by a mark.
+
+        Given an iterable of pieces, each piece is sent as soon as it is produced.
+        """
+        pieces = [ulaw] if isinstance(ulaw, bytes) else ulaw
+        for piece in pieces:
+            for chunk in chunk_bytes(piece, self.send_chunk_bytes):
+                self._send({
+                    "event": "media",
+                    "streamSid": self.stream_sid,
+                    "media": {"payload": base64.b64encode(chunk).decode("ascii")},
+                })
+        self._mark_seq += 1
+        self.playing = True
+        self._send({"event": "mark", "streamSid": self.stream_sid, "mark": {"name": f"reply-{self._mark_seq}"}})
+
+    def clear(self) -> None:
+        """Drop any reply audio Twilio has buffered but not yet played."""
+        self.playing = False
+        self._send({"event": "clear", "streamSid": self.stream_sid})
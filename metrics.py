@@ -0,0 +1,296 @@
+"""Latency histograms and counters, exported in Prometheus text format.
+
+Each gunicorn worker aggregates its observations in memory and periodically
+writes a snapshot to ``<directory>/metrics_<pid>_<token>.json``. ``/metrics``
+merges every snapshot in the directory, so a scrape that lands on any worker
+sees the totals of all of them. The snapshots of exited workers are folded
+into ``metrics_archive.json`` and deleted, so counters never go backwards and
+the directory holds one file per live worker plus the archive. gunicorn.conf.py
+empties the directory when the master starts.
+"""
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from logs import get_logger
+from procs import pid_alive
+
+log = get_logger(__name__)
+
+# Seconds; spans a cache hit (ms) up to a slow vendor round-trip
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+ARCHIVE = "metrics_archive.json"
+SNAPSHOT_RE = re.compile(r"^metrics_(\d+)_[0-9a-f]+\.json$")
+
+
+class Counter:
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, labelnames: Iterable[str]):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def snapshot(self) -> list:
+        return [[list(key), value] for key, value in self.values.items()]
+
+
+class Histogram:
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, labelnames: Iterable[str],
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (non-cumulative, last is +Inf), sum]
+        self.values: Dict[LabelValues, list] = {}
+
+    def observe(self, seconds: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                index = i
+                break
+        with self.registry.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += seconds
+
+    @contextmanager
+    def time(self, **labels):
+        """Time a block. The yielded dict can change labels (e.g. ``outcome``) before it ends.
+
+        ``outcome`` defaults to "ok", or "error" if the block raises.
+        """
+        labels.setdefault("outcome", "ok")
+        start = time.perf_counter()
+        try:
+            yield labels
+        except BaseException:
+            labels["outcome"] = "error"
+            raise
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> list:
+        return [[list(key), list(counts), total] for key, (counts, total) in self.values.items()]
+
+
+class MetricsRegistry:
+    """Per-process metrics plus the shared snapshot directory."""
+
+    def __init__(self, directory: str, flush_interval: float = 5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.metrics: Dict[str, object] = {}
+        self._token = uuid.uuid4().hex[:8]
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(directory, exist_ok=True)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        metric = self.metrics[name] = Counter(self, name, documentation, labelnames)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = self.metrics[name] = Histogram(self, name, documentation, labelnames, buckets)
+        return metric
+
+    def _after_fork(self) -> None:
+        # A forked worker starts from zero; the parent's observations stay in the parent's file
+        self.lock = threading.Lock()
+        for metric in self.metrics.values():
+            metric.values = {}
+        self._token = uuid.uuid4().hex[:8]
+        self._stop = threading.Event()
+        if self._thread is not None:
+            self._thread = None
+            self.start()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"metrics_{os.getpid()}_{self._token}.json")
+
+    def flush(self) -> None:
+        """Write this process's snapshot (atomically) to the shared directory."""
+        with self.lock:
+            snapshot = {
+                name: {"type": "counter" if isinstance(metric, Counter) else "histogram",
+                       "values": metric.snapshot()}
+                for name, metric in self.metrics.items()
+            }
+        if not any(entry["values"] for entry in snapshot.values()):
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(snapshot, fh)
+        os.replace(tmp, self.path)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="metrics-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                self.fold_exited()
+            except Exception:
+                log.exception("[METRICS] Flush failed")
+
+    @contextmanager
+    def _locked(self, operation: int):
+        """Hold the directory's lock file: shared to read snapshots, exclusive to fold them."""
+        with open(os.path.join(self.directory, ".lock"), "a") as fh:
+            fcntl.flock(fh, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _read(self, filename: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.directory, filename)) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def fold_exited(self) -> int:
+        """Add the snapshots of exited workers to the archive and delete them; return how many."""
+        exited = []
+        for filename in os.listdir(self.directory):
+            match = SNAPSHOT_RE.match(filename)
+            if match and not pid_alive(int(match.group(1))):
+                exited.append(filename)
+        if not exited:
+            return 0
+
+        with self._locked(fcntl.LOCK_EX):
+            merged: Dict[str, dict] = {}
+            types: Dict[str, str] = {}
+            folded = []
+            for filename in [ARCHIVE] + exited:
+                # Another worker may have folded it while we waited for the lock
+                snapshot = self._read(filename)
+                if snapshot is None:
+                    continue
+                _merge(merged, snapshot)
+                types.update((name, entry["type"]) for name, entry in snapshot.items())
+                if filename != ARCHIVE:
+                    folded.append(filename)
+            if not folded:
+                return 0
+
+            archive = {
+                name: {"type": types[name],
+                       "values": [[list(key), value] if types[name] == "counter" else [list(key)] + value
+                                  for key, value in values.items()]}
+                for name, values in merged.items()
+            }
+            path = os.path.join(self.directory, ARCHIVE)
+            with open(f"{path}.tmp", "w") as fh:
+                json.dump(archive, fh)
+            os.replace(f"{path}.tmp", path)
+            for filename in folded:
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+        log.info("[METRICS] Folded %d snapshots of exited workers into %s", len(folded), ARCHIVE)
+        return len(folded)
+
+    def collect(self) -> Dict[str, dict]:
+        """Merge the snapshots of every process: name -> {labels: value or [counts, sum]}."""
+        merged: Dict[str, dict] = {name: {} for name in self.metrics}
+        # A fold in progress would otherwise be counted twice (archive + snapshot) or not at all
+        with self._locked(fcntl.LOCK_SH):
+            for filename in os.listdir(self.directory):
+                if not (filename.startswith("metrics_") and filename.endswith(".json")):
+                    continue
+                snapshot = self._read(filename)
+                if snapshot is not None:
+                    _merge(merged, snapshot)
+        return merged
+
+    def render(self) -> str:
+        """Prometheus text exposition of the merged metrics."""
+        self.flush()
+        merged = self.collect()
+        lines: List[str] = []
+        for name, metric in self.metrics.items():
+            values = merged.get(name, {})
+            kind = "counter" if isinstance(metric, Counter) else "histogram"
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key in sorted(values):
+                labels = list(zip(metric.labelnames, key))
+                if kind == "counter":
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(values[key])}")
+                    continue
+                counts, total = values[key]
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _merge(merged: Dict[str, dict], snapshot: dict) -> None:
+    """Add one snapshot's values into ``merged`` (name -> {labels: value or [counts, sum]})."""
+    for name, entry in snapshot.items():
+        values = merged.setdefault(name, {})
+        if entry["type"] == "counter":
+            for key, value in entry["values"]:
+                values[tuple(key)] = values.get(tuple(key), 0.0) + value
+        else:
+            for key, counts, total in entry["values"]:
+                current = values.get(tuple(key))
+                if current is None or len(current[0]) != len(counts):
+                    values[tuple(key)] = [list(counts), total]
+                else:
+                    current[0] = [a + b for a, b in zip(current[0], counts)]
+                    current[1] += total
+
+
+def _format_labels(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{name}="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
@@ -0,0 +1,17 @@
+"""Process helpers shared by the per-worker file writers.
+
+metrics.py and events.py each keep one file per worker process, named by its
+pid, and must not fold or delete the file of a worker that is still running.
+"""
+import os
+
+
+def pid_alive(pid: int) -> bool:
+    """Whether a process with this pid exists (one we may not signal counts as alive)."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,175 @@
+"""Serving and retention for the replies directory.
+
+Twilio fetches every ``<Play>`` URL from ``/replies/<filename>``. Files in
+the directory are content addressed (``tts_<hash>.wav``,
+``recording_<hash>.wav``), so a name never changes meaning and can be served
+with a strong ETag and a long-lived, immutable Cache-Control header. Werkzeug's
+``send_file`` answers conditional (``If-None-Match``) and ``Range`` requests,
+and hands the open file to the WSGI server's ``wsgi.file_wrapper`` so gunicorn
+can ``sendfile(2)`` it without copying through Python.
+
+``RetentionSweeper`` keeps the directory from growing forever on the Render
+disk: it deletes one-off files after a TTL and the oldest files once the
+directory exceeds a byte quota. Files of the TTS cache (``tts_``/``tel_``) are
+left to the cache's own LRU and quota: they are the oldest files in the
+directory but also the most used, and the cache indexes them.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import Iterable, Optional, Tuple
+
+from flask import Blueprint, abort, current_app, send_from_directory
+
+from logs import get_logger
+
+log = get_logger(__name__)
+
+replies_bp = Blueprint("replies", __name__)
+
+# <prefix>_<hex digest>.<ext>
+CONTENT_ADDRESSED_RE = re.compile(r"^[a-z]+_([0-9a-f]{32,64})\.[a-z0-9]+$")
+
+# Files still being written; never served and only swept once stale
+PARTIAL_SUFFIXES = (".tmp", ".part")
+
+
+def content_filename(prefix: str, digest: str, ext: str) -> str:
+    """Return the content-addressed filename for a hex digest."""
+    return f"{prefix}_{digest}{ext}"
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+@replies_bp.route("/replies/<path:filename>", methods=["GET", "HEAD"])
+def serve_reply(filename):
+    """Serve generated audio files to Twilio."""
+    if filename.endswith(PARTIAL_SUFFIXES):
+        abort(404)
+
+    directory = current_app.config["REPLIES_DIR"]
+    match = CONTENT_ADDRESSED_RE.match(os.path.basename(filename))
+    if match is None:
+        # Legacy random names: let Werkzeug derive a weak validator from mtime/size
+        return send_from_directory(directory, filename, conditional=True)
+
+    max_age = current_app.config.get("REPLIES_MAX_AGE", 31536000)
+    resp = send_from_directory(
+        directory,
+        filename,
+        conditional=True,
+        etag=match.group(1),
+        max_age=max_age,
+    )
+    resp.cache_control.immutable = True
+    return resp
+
+
+class RetentionSweeper:
+    """Background thread that enforces a TTL and a byte quota on a directory."""
+
+    def __init__(self, directory: str, ttl_seconds: int = 3600, max_bytes: int = 1024 * 1024 * 1024,
+                 interval: int = 300, ttl_prefixes: Iterable[str] = ("recording_", "reply_"),
+                 skip_prefixes: Iterable[str] = ("tts_", "tel_")):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.ttl_prefixes = tuple(ttl_prefixes)
+        # Finished files managed elsewhere: neither deleted nor counted against max_bytes
+        self.skip_prefixes = tuple(skip_prefixes)
+
+        self.deleted_files = 0
+        self.deleted_bytes = 0
+        self.last_sweep: Optional[float] = None
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="replies-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception:
+                log.exception("[SWEEPER] Sweep failed")
+            self._stop.wait(self.interval)
+
+    def _scan(self) -> Tuple[list, int]:
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                if entry.name.startswith(self.skip_prefixes) and not entry.name.endswith(PARTIAL_SUFFIXES):
+                    continue
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, entry.name, st.st_size))
+                total += st.st_size
+        entries.sort()
+        return entries, total
+
+    def _delete(self, name: str, size: int) -> bool:
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            return False
+        self.deleted_files += 1
+        self.deleted_bytes += size
+        return True
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Run one retention pass and return the number of files deleted."""
+        now = time.time() if now is None else now
+        cutoff = now - self.ttl_seconds
+        entries, total = self._scan()
+        deleted = 0
+
+        remaining = []
+        for mtime, name, size in entries:
+            expired = mtime < cutoff and (
+                name.startswith(self.ttl_prefixes) or name.endswith(PARTIAL_SUFFIXES)
+            )
+            if expired and self._delete(name, size):
+                total -= size
+                deleted += 1
+            else:
+                remaining.append((mtime, name, size))
+
+        # Over quota: drop oldest finished files first
+        for mtime, name, size in remaining:
+            if total <= self.max_bytes:
+                break
+            if name.endswith(PARTIAL_SUFFIXES):
+                continue
+            if self._delete(name, size):
+                total -= size
+                deleted += 1
+
+        self.last_sweep = now
+        if deleted:
+            log.info("[SWEEPER] Deleted %d files, directory now %d bytes", deleted, total)
+        return deleted
+
+    def stats(self) -> dict:
+        return {
+            "deleted_files": self.deleted_files,
+            "deleted_bytes": self.deleted_bytes,
+            "last_sweep": self.last_sweep,
+        }
@@ -0,0 +1,273 @@
+"""Deadline budgets, hedged requests and circuit breakers for vendor calls.
+
+A webhook gets an end-to-end deadline when it starts (``set_deadline`` /
+``deadline_scope``). It lives in a context variable, so it follows the
+request into executor threads started with ``contextvars.copy_context().run``,
+and vendor calls shrink their timeouts to what is left with
+``bounded_timeout``. A slow vendor then costs at most the remaining budget
+instead of a full read timeout.
+
+``CircuitBreaker`` stops calling an endpoint after consecutive failures and
+lets one probe through once ``reset_timeout`` has passed; ``hedged`` sends a
+second copy of a slow idempotent request once it has taken longer than the
+endpoint's recent latency percentile (``LatencyWindow``). ``SingleFlight``
+collapses concurrent identical calls into one, so a burst of callers asking
+for the same audio costs one vendor request.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+from logs import get_logger
+
+log = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Monotonic time at which the current webhook's budget runs out, and the budget's length
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+_budget: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("budget", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The webhook's time budget ran out before a vendor call could be made or finish."""
+
+
+class CircuitOpenError(RuntimeError):
+    """The endpoint's circuit breaker is open; the call was not attempted."""
+
+
+def set_deadline(seconds: Optional[float]) -> None:
+    """Give the current context a budget of ``seconds`` from now (None removes it)."""
+    _deadline.set(None if seconds is None else time.monotonic() + seconds)
+    _budget.set(seconds)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """Run a block with its own budget, replacing any deadline inherited from the caller."""
+    token = _deadline.set(None if seconds is None else time.monotonic() + seconds)
+    budget_token = _budget.set(seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+        _budget.reset(budget_token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current budget, or None if there is no deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def bounded_timeout(timeout: Tuple[float, float]) -> Tuple[float, float]:
+    """Clamp a (connect, read) timeout to the remaining budget.
+
+    Raises DeadlineExceeded if the budget is already spent.
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded(f"Deadline passed {-left:.2f}s ago")
+    return min(timeout[0], left), min(timeout[1], left)
+
+
+def cut_short(timeout: Tuple[float, float], configured: Tuple[float, float]) -> bool:
+    """Whether the deadline left a call's read ``timeout`` under half of what it could have had.
+
+    A call could at most have its ``configured`` timeout, capped by the whole
+    budget; getting much less means earlier work used the budget up, so a
+    timeout says little about the vendor.
+    """
+    budget = _budget.get()
+    full = configured[1] if budget is None else min(configured[1], budget)
+    return timeout[1] < full / 2
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    closed -> open after ``failure_threshold`` failures in a row; open ->
+    half-open once ``reset_timeout`` seconds have passed, letting a single
+    probe through; the probe's result closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def ready(self) -> bool:
+        """Whether ``allow`` would let a call through now; doesn't take the half-open probe."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                return time.monotonic() - self._opened_at >= self.reset_timeout
+            return not self._probing
+
+    def allow(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._transition(self.HALF_OPEN)
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"Circuit '{self.name}' is open")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self._state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                if self._state != self.OPEN:
+                    self._transition(self.OPEN)
+
+    def release(self) -> None:
+        """End a call that says nothing about the endpoint's health (frees a half-open probe)."""
+        with self._lock:
+            self._probing = False
+
+    def _transition(self, state: str) -> None:
+        log.warning("[BREAKER] %s: %s -> %s (%d consecutive failures)", self.name, self._state, state, self._failures)
+        self._state = state
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self._state, "consecutive_failures": self._failures, "rejected": self.rejected}
+
+
+class LatencyWindow:
+    """Latencies of the last ``size`` successful requests to one endpoint."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Nearest-rank percentile, or None until ``min_samples`` have been seen."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            values = sorted(self._samples)
+        return values[min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))]
+
+
+def hedged(fn: Callable[[], T], executor: Executor, delay: float) -> Tuple[T, bool]:
+    """Call ``fn`` on ``executor``, starting a second copy if the first takes over ``delay`` seconds.
+
+    Returns the first successful result and whether a hedge was sent. If every
+    attempt fails, the last error is raised; if the current deadline passes
+    first, DeadlineExceeded is. Only use for idempotent requests: the losing
+    attempt is left to finish in the background.
+    """
+    left = remaining()
+    pending = {executor.submit(contextvars.copy_context().run, fn)}
+    done, _ = wait(pending, timeout=delay if left is None else min(delay, max(left, 0)))
+    hedge_sent = False
+    if not done and (left is None or left > delay):
+        pending.add(executor.submit(contextvars.copy_context().run, fn))
+        hedge_sent = True
+
+    error: Optional[BaseException] = None
+    while pending:
+        left = remaining()
+        done, pending = wait(pending, timeout=None if left is None else max(left, 0), return_when=FIRST_COMPLETED)
+        if not done:
+            raise DeadlineExceeded("Deadline passed waiting for a hedged request")
+        for future in done:
+            if future.exception() is None:
+                return future.result(), hedge_sent
+            error = future.exception()
+    raise error
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its result.
+
+    The first caller for a key (the leader) runs ``fn``; callers arriving
+    while it runs wait for the leader's result or error instead, bounded by
+    their own deadline. Once the leader finishes the key is forgotten, so
+    later calls run ``fn`` again (put a cache in front for longer reuse).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """Return ``fn()``'s result for ``key`` and whether it came from another caller's flight."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.leaders += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            left = remaining()
+            try:
+                return future.result(timeout=None if left is None else max(left, 0)), True
+            except FutureTimeoutError:
+                if future.done():
+                    raise
+                raise DeadlineExceeded("Deadline passed waiting for a shared request") from None
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._calls), "leaders": self.leaders, "shared": self.shared}
@@ -0,0 +1,57 @@
+"""Splitting prompt text into sentence-sized chunks for TTS.
+
+Synthesis time grows with text length, so a long prompt is synthesized as
+several chunks in parallel and the caller hears the first one as soon as it
+is ready. Chunks end at sentence boundaries: ``.``, ``?`` and ``!`` followed
+by whitespace (so ``040.5`` or ``tgsouthernpower.org`` stay whole), and the
+Devanagari danda ``।``/``॥``, which the Hindi and Telugu prompts use. A
+sentence longer than ``max_chars`` is split further at clause boundaries
+(``,`` ``;`` ``:``), then at spaces. Fragments shorter than ``min_chars`` are
+joined to their neighbour: each chunk is a vendor request, and very short
+ones sound clipped.
+"""
+import re
+from typing import List
+
+_SENTENCE_RE = re.compile(r"(?<=[.?!])\s+|(?<=[।॥])\s*")
+_CLAUSE_RE = re.compile(r"(?<=[,;:])\s+")
+
+
+def _pack(pieces: List[str], max_chars: int, sep: str = " ") -> List[str]:
+    """Greedily join consecutive pieces into strings of at most ``max_chars``."""
+    out: List[str] = []
+    for piece in pieces:
+        if out and len(out[-1]) + len(sep) + len(piece) <= max_chars:
+            out[-1] = f"{out[-1]}{sep}{piece}"
+        else:
+            out.append(piece)
+    return out
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    if len(sentence) <= max_chars:
+        return [sentence]
+    chunks = []
+    for clause in _pack(_CLAUSE_RE.split(sentence), max_chars):
+        if len(clause) <= max_chars:
+            chunks.append(clause)
+        else:
+            chunks.extend(_pack(clause.split(), max_chars))
+    return chunks
+
+
+def split_sentences(text: str, max_chars: int = 200, min_chars: int = 12) -> List[str]:
+    """Split text into chunks at sentence (then clause) boundaries, keeping the punctuation."""
+    chunks: List[str] = []
+    for sentence in _SENTENCE_RE.split(text.strip()):
+        sentence = sentence.strip()
+        if sentence:
+            chunks.extend(_split_long(sentence, max_chars))
+
+    merged: List[str] = []
+    for chunk in chunks:
+        if merged and (len(chunk) < min_chars or len(merged[-1]) < min_chars):
+            merged[-1] = f"{merged[-1]} {chunk}"
+        else:
+            merged.append(chunk)
+    return merged
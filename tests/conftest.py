@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+from fake_vendors import Endpoint, FakeVendorServer, VendorConfig  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def vendors():
+    """Fake Sarvam and Twilio (fake_vendors.py) on a free port."""
+    server = FakeVendorServer(("127.0.0.1", 0), VendorConfig(recording_seconds=1.0, tts_seconds=0.5, seed=1))
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope="session")
+def ivr(vendors, tmp_path_factory):
+    """The app module, configured against the fake vendors in a scratch directory."""
+    workdir = tmp_path_factory.mktemp("ivr")
+    env = {
+        "BASE_URL": "http://ivr.test",
+        "SARVAM_API_KEY": "test",
+        "SARVAM_STT_URL": f"{vendors.url}/stt",
+        "SARVAM_TTS_URL": f"{vendors.url}/tts",
+        "TWILIO_ACCOUNT_SID": "AC" + "0" * 32,
+        "TWILIO_AUTH_TOKEN": "test",
+        "TWILIO_API_BASE_URL": vendors.url,
+        "EVENT_LOG": "0",
+        "CAMPAIGN_RESUME": "0",
+        "TTS_HEDGE_PERCENTILE": "0",
+        "LOG_LEVEL": "WARNING",
+    }
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in env.items():
+            mp.setenv(name, value)
+        mp.chdir(workdir)
+        import app_new
+    return app_new
+
+
+@pytest.fixture
+def vendor_config(vendors):
+    """The fake vendors' latencies and error rates, reset after the test."""
+    yield vendors.config
+    for name in ("stt", "tts", "recording", "twilio_api"):
+        setattr(vendors.config, name, Endpoint())
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from audio import compact_speech, read_wav, write_wav
+
+RATE = 8000
+
+
+def tone(seconds, amplitude=8000):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * RATE), dtype=np.int16)
+
+
+@pytest.mark.parametrize("seconds", [0.02, 0.1, 0.3, 0.4])
+def test_short_recordings_are_compacted(seconds):
+    # Shorter than the padding kernel (2 * 200 ms + one frame)
+    pcm = np.concatenate([silence(seconds / 2), tone(seconds / 2)])
+
+    out = compact_speech(pcm, RATE)
+
+    assert 0 < len(out) <= len(pcm)
+    assert np.abs(out).max() > 4000
+
+
+def test_long_pauses_are_shortened():
+    pcm = np.concatenate([silence(1.0), tone(0.5), silence(2.0), tone(0.5), silence(1.0)])
+
+    out = compact_speech(pcm, RATE, pad_ms=200, max_pause_ms=600)
+
+    # Each word keeps 200 ms of padding either side; the 2 s pause keeps 600 ms past the padding
+    assert len(out) == pytest.approx(RATE * (0.2 + 0.5 + 0.2 + 0.6 + 0.2 + 0.5 + 0.2), abs=RATE * 0.04)
+
+
+def test_silence_is_returned_unchanged():
+    pcm = silence(0.3)
+    assert compact_speech(pcm, RATE) is pcm
+
+
+def test_short_recording_preprocesses_for_stt(ivr):
+    wav = write_wav(np.concatenate([silence(0.1), tone(0.2)]), RATE)
+
+    pcm, rate = read_wav(ivr.preprocess_recording(wav, "en-IN"))
+
+    assert rate == ivr.STT_SAMPLE_RATE
+    assert 0 < len(pcm) <= int(0.3 * rate)
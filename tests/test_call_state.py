@@ -0,0 +1,143 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from call_state import CallStateStore, MemoryCallStateStore, SQLiteCallStateStore, create_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**kwargs):
+        store = create_store(request.param, path=str(tmp_path / "call_state.db"), **kwargs)
+        if isinstance(store, SQLiteCallStateStore):
+            # Enforce max_entries on every write instead of every 200th
+            store.PURGE_EVERY = 1
+        return store
+    return make
+
+
+def test_interface_is_abstract():
+    with pytest.raises(TypeError):
+        CallStateStore()
+
+
+def test_get_set_delete(make_store):
+    store = make_store()
+    assert store.get("CA1") is None
+    assert store.get("CA1", {"language": "en"}) == {"language": "en"}
+
+    store.set("CA1", {"language": "hi", "interaction_count": 0})
+    assert store.get("CA1") == {"language": "hi", "interaction_count": 0}
+
+    store.delete("CA1")
+    assert store.get("CA1") is None
+    store.delete("CA1")
+
+
+def test_get_returns_a_copy(make_store):
+    store = make_store()
+    default = {"language": "en"}
+    store.get("CA1", default)["language"] = "te"
+    assert default == {"language": "en"}
+
+    store.set("CA1", {"language": "hi"})
+    store.get("CA1")["language"] = "te"
+    assert store.get("CA1") == {"language": "hi"}
+
+
+def test_update_and_merge(make_store):
+    store = make_store()
+    default = {"language": "en", "interaction_count": 0}
+
+    def count(state):
+        state["interaction_count"] += 1
+
+    assert store.update("CA1", count, default) == {"language": "en", "interaction_count": 1}
+    assert default == {"language": "en", "interaction_count": 0}
+    assert store.merge("CA1", {"language": "te"}) == {"language": "te", "interaction_count": 1}
+    assert store.update("CA1", count) == {"language": "te", "interaction_count": 2}
+    assert store.get("CA1") == {"language": "te", "interaction_count": 2}
+
+
+def test_failed_update_changes_nothing(make_store):
+    store = make_store()
+    store.set("CA1", {"interaction_count": 1})
+
+    def broken(state):
+        state["interaction_count"] = 99
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        store.update("CA1", broken)
+    assert store.get("CA1") == {"interaction_count": 1}
+
+
+def test_entries_expire(make_store):
+    store = make_store(ttl_seconds=0.2)
+    store.set("CA1", {"language": "hi"})
+    store.merge("CA2", {"language": "te"})
+    assert store.get("CA1") == {"language": "hi"}
+
+    time.sleep(0.3)
+    assert store.get("CA1") is None
+    assert store.update("CA2", lambda state: state.setdefault("language", "en")) == {"language": "en"}
+
+
+def test_max_entries_keeps_the_most_recent(make_store):
+    store = make_store(max_entries=3)
+    for i in range(5):
+        store.set(f"CA{i}", {"n": i})
+        time.sleep(0.01)
+
+    assert store.stats()["entries"] == 3
+    assert [store.get(f"CA{i}") for i in range(5)] == [None, None, {"n": 2}, {"n": 3}, {"n": 4}]
+
+
+def test_update_is_atomic_across_threads(make_store):
+    store = make_store()
+
+    def count(state):
+        value = state.get("n", 0)
+        time.sleep(0.0005)
+        state["n"] = value + 1
+
+    def worker():
+        for _ in range(25):
+            store.update("CA1", count)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.get("CA1") == {"n": 200}
+
+
+def _count_in_process(path, times):
+    store = SQLiteCallStateStore(path)
+    for _ in range(times):
+        store.update("CA1", lambda state: state.update(n=state.get("n", 0) + 1))
+
+
+def test_sqlite_update_is_atomic_across_processes(tmp_path):
+    path = str(tmp_path / "call_state.db")
+    SQLiteCallStateStore(path)
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_count_in_process, args=(path, 50)) for _ in range(4)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(60)
+        assert proc.exitcode == 0
+    assert SQLiteCallStateStore(path).get("CA1") == {"n": 200}
+
+
+def test_memory_store_counts_expiry_and_eviction():
+    store = MemoryCallStateStore(ttl_seconds=0.1, max_entries=1)
+    store.set("CA1", {})
+    store.set("CA2", {})
+    time.sleep(0.15)
+    assert store.get("CA2") is None
+    assert store.stats() == {"backend": "memory", "entries": 0, "expired": 1, "evicted": 1}
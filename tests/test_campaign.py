@@ -0,0 +1,186 @@
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+import pytest
+
+from campaign import CampaignStore, Dialer, TokenBucket, parse_targets
+
+
+def wait_until(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def create_campaign(client, phones):
+    body = "".join(json.dumps({"phone": phone, "language": "hi"}) + "\n" for phone in phones)
+    resp = client.post("/campaigns?format=jsonl&name=test", data=body, content_type="application/x-ndjson")
+    assert resp.status_code == 201, resp.get_json()
+    return resp.get_json()["id"]
+
+
+def dialed(vendors, campaign_id):
+    """Form fields of the calls the fake Twilio API created for a campaign."""
+    with vendors.lock:
+        return [form for sid, form in vendors.call_requests
+                if sid is None and f"campaign={campaign_id}" in form.get("StatusCallback", "")]
+
+
+def report(client, form, status):
+    callback = urlsplit(form["StatusCallback"])
+    resp = client.post(f"{callback.path}?{callback.query}", data={"CallSid": "CA1", "CallStatus": status})
+    assert resp.status_code == 204
+
+
+@pytest.fixture
+def campaigns(ivr, monkeypatch):
+    monkeypatch.setattr(ivr, "CAMPAIGN_RETRY_BACKOFF", 0.1)
+    yield ivr
+    for dialer in list(ivr.dialers.values()):
+        if dialer.running:
+            dialer.stop()
+
+
+def test_bad_jsonl_line_is_rejected_without_a_campaign(ivr):
+    client = ivr.app.test_client()
+    before = ivr.campaign_store._conn().execute("SELECT COUNT(*) FROM campaigns").fetchone()[0]
+
+    for line, kind in (("[1]", "list"), ('"x"', "str")):
+        body = '{"phone": "+919000000001"}\n' + line + "\n"
+        resp = client.post("/campaigns?format=jsonl", data=body, content_type="application/x-ndjson")
+        assert resp.status_code == 400
+        assert resp.get_json()["error"] == f"Line 2: expected a JSON object, got {kind}"
+
+    resp = client.post("/campaigns?format=jsonl", data='{"phone": "+919000000001"}\n{oops\n',
+                       content_type="application/x-ndjson")
+    assert resp.status_code == 400
+    assert resp.get_json()["error"].startswith("Line 2: invalid JSON")
+
+    after = ivr.campaign_store._conn().execute("SELECT COUNT(*) FROM campaigns").fetchone()[0]
+    assert after == before
+
+
+def test_create_rolls_back_on_a_parse_error(tmp_path):
+    store = CampaignStore(str(tmp_path / "campaigns.db"))
+    lines = ["phone,language\n"] + [f"+9190000{i:05d},en\n" for i in range(25)]
+
+    def targets():
+        yield from parse_targets(lines, "csv")
+        raise ValueError("Line 27: broken")
+
+    with pytest.raises(ValueError):
+        store.create("broken", "record", targets(), batch_size=10)
+
+    conn = store._conn()
+    assert conn.execute("SELECT COUNT(*) FROM campaigns").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM targets").fetchone()[0] == 0
+
+
+def test_token_bucket_needs_a_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+
+def test_dialer_paces_calls(campaigns, vendors, monkeypatch):
+    monkeypatch.setattr(campaigns, "CAMPAIGN_CALLS_PER_SECOND", 4)
+    client = campaigns.app.test_client()
+    campaign_id = create_campaign(client, [f"+91900000{i:04d}" for i in range(8)])
+
+    started = time.monotonic()
+    assert client.post(f"/campaigns/{campaign_id}/start").status_code == 200
+    assert wait_until(lambda: len(dialed(vendors, campaign_id)) == 8)
+    elapsed = time.monotonic() - started
+
+    # A burst of 4, then one call every 250 ms
+    assert 0.9 <= elapsed < 3.0
+    assert {form["To"] for form in dialed(vendors, campaign_id)} == {f"+91900000{i:04d}" for i in range(8)}
+    assert "language=hi" in dialed(vendors, campaign_id)[0]["Url"]
+
+
+def test_dialer_caps_calls_in_flight(campaigns, vendors, monkeypatch):
+    monkeypatch.setattr(campaigns, "CAMPAIGN_CALLS_PER_SECOND", 100)
+    monkeypatch.setattr(campaigns, "CAMPAIGN_MAX_CONCURRENT", 3)
+    client = campaigns.app.test_client()
+    campaign_id = create_campaign(client, [f"+91900001{i:04d}" for i in range(5)])
+
+    client.post(f"/campaigns/{campaign_id}/start")
+    assert wait_until(lambda: len(dialed(vendors, campaign_id)) == 3)
+    time.sleep(0.6)
+    assert len(dialed(vendors, campaign_id)) == 3
+
+    for form in dialed(vendors, campaign_id):
+        report(client, form, "completed")
+    assert wait_until(lambda: len(dialed(vendors, campaign_id)) == 5)
+    for form in dialed(vendors, campaign_id)[3:]:
+        report(client, form, "completed")
+
+    assert wait_until(lambda: campaigns.campaign_store.get(campaign_id)["status"] == "completed")
+    assert campaigns.campaign_store.counts(campaign_id) == {"done": 5}
+
+
+def test_busy_calls_are_retried_until_max_attempts(campaigns, vendors, monkeypatch):
+    monkeypatch.setattr(campaigns, "CAMPAIGN_MAX_ATTEMPTS", 2)
+    client = campaigns.app.test_client()
+    campaign_id = create_campaign(client, ["+919000020000"])
+
+    client.post(f"/campaigns/{campaign_id}/start")
+    assert wait_until(lambda: len(dialed(vendors, campaign_id)) == 1)
+    report(client, dialed(vendors, campaign_id)[0], "busy")
+    assert campaigns.campaign_store.counts(campaign_id) == {"retry": 1}
+
+    assert wait_until(lambda: len(dialed(vendors, campaign_id)) == 2)
+    report(client, dialed(vendors, campaign_id)[1], "no-answer")
+
+    assert wait_until(lambda: campaigns.campaign_store.get(campaign_id)["status"] == "completed")
+    assert campaigns.campaign_store.counts(campaign_id) == {"failed": 1}
+    assert len(dialed(vendors, campaign_id)) == 2
+
+
+def test_lease_keeps_other_dialers_out(tmp_path):
+    store = CampaignStore(str(tmp_path / "campaigns.db"))
+    campaign_id, _, _ = store.create("lease", "record", [("+919000030000", "en")])
+    gate = threading.Event()
+
+    first = Dialer(store, campaign_id, lambda target: gate.wait(5) and "CA1", poll_interval=0.05)
+    second = Dialer(store, campaign_id, lambda target: "CA2", poll_interval=0.05)
+    assert first.start()
+    assert not second.start()
+    first.stop()
+    gate.set()
+    first._thread.join(5)
+    assert second.start()
+    second.stop()
+    second._thread.join(5)
+
+    # A crashed owner's lease has to run out first
+    assert store.acquire_lease(campaign_id, "crashed-worker", 0.2)
+    assert not second.start()
+    time.sleep(0.3)
+    assert second.start()
+    second.stop()
+
+
+def test_running_campaign_resumes_after_a_restart(campaigns, vendors):
+    store = campaigns.campaign_store
+    client = campaigns.app.test_client()
+    phones = [f"+91900004{i:04d}" for i in range(4)]
+    campaign_id = create_campaign(client, phones)
+
+    # A previous process: one call finished, two claimed but never placed, then it died
+    store.set_status(campaign_id, "running")
+    first, = store.claim(campaign_id, 1)
+    store.mark_active(first["id"], "CA0")
+    store.record_result(first["id"], "completed", 3, 60)
+    store.claim(campaign_id, 2)
+    assert store.counts(campaign_id) == {"done": 1, "dialing": 2, "pending": 1}
+
+    campaigns.resume_campaigns()
+
+    assert wait_until(lambda: len(dialed(vendors, campaign_id)) == 3)
+    assert sorted(form["To"] for form in dialed(vendors, campaign_id)) == phones[1:]
+    assert wait_until(lambda: store.counts(campaign_id) == {"done": 1, "active": 3})
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+
+from events import EventLog, read_events
+
+
+def exited_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def segment(directory, pid, token, seq, mtime, day="20261016"):
+    path = os.path.join(directory, f"events_{day}_{pid}_{token}_{seq:04d}.jsonl")
+    with open(path, "w") as fh:
+        fh.write('{"event": "webhook"}\n' * 5)
+    os.utime(path, (mtime, mtime))
+    return os.path.basename(path)
+
+
+def test_prune_keeps_segments_other_workers_have_open(tmp_path):
+    live, dead = os.getppid(), exited_pid()
+    names = [
+        segment(tmp_path, live, "aaaa0001", 1, 1000),
+        segment(tmp_path, dead, "bbbb0002", 1, 2000),
+        segment(tmp_path, dead, "bbbb0002", 2, 3000),
+        segment(tmp_path, live, "aaaa0001", 2, 4000),
+    ]
+
+    EventLog(str(tmp_path), max_bytes=0)._prune()
+
+    # Only the live worker's current segment is left
+    assert sorted(os.listdir(tmp_path)) == [names[3]]
+
+
+def test_prune_deletes_oldest_closed_segments_first(tmp_path):
+    live = os.getppid()
+    names = [segment(tmp_path, live, "cccc0003", seq, 1000 * seq) for seq in range(1, 5)]
+    size = os.path.getsize(os.path.join(tmp_path, names[0]))
+
+    EventLog(str(tmp_path), max_bytes=2 * size)._prune()
+
+    assert sorted(os.listdir(tmp_path)) == names[2:]
+
+
+def test_rotation_keeps_its_own_segment(tmp_path):
+    log = EventLog(str(tmp_path), segment_bytes=1, max_bytes=0)
+    for n in range(3):
+        log._write([{"event": "turn", "n": n}])
+    log._close()
+
+    assert [event["n"] for event in read_events(str(tmp_path))] == [2]
+    assert log.written == 3
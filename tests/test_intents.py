@@ -0,0 +1,73 @@
+import pytest
+
+# Keyword lists of the if/elif ladder process_user_query used before intents.json,
+# in ladder order (first match wins). "नया" was misspelt "నया" (Telugu న) there.
+LADDER = (
+    ("bill_payment", ["bill", "payment", "dues", "pay", "बिल", "भुगतान", "బిల్", "బిల్లు", "చెల్లింపు"]),
+    ("new_connection", ["connection", "new", "कनेक्शन", "नया", "కనెక్షన్", "కొత్త"]),
+)
+
+SAMPLES = {
+    "en": [
+        ("I want to pay my electricity bill", "bill_payment"),
+        ("how do I clear my dues", "bill_payment"),
+        ("Payment failed yesterday", "bill_payment"),
+        ("how do I apply for a new connection", "new_connection"),
+        ("CONNECTION status please", "new_connection"),
+        # One keyword of each: the ladder's order decides, as does the tie-break now
+        ("new bill", "bill_payment"),
+        ("there is no power in my area since morning", None),
+    ],
+    "hi": [
+        ("बिल भुगतान कैसे करें", "bill_payment"),
+        ("मेरा बिल बहुत ज़्यादा आया है", "bill_payment"),
+        ("नया कनेक्शन चाहिए", "new_connection"),
+        ("मुझे नया मीटर लगवाना है", "new_connection"),
+        ("बिजली नहीं है", None),
+    ],
+    "te": [
+        ("బిల్లు ఎలా కట్టాలి", "bill_payment"),
+        ("చెల్లింపు విఫలమైంది", "bill_payment"),
+        ("కొత్త కనెక్షన్ కావాలి", "new_connection"),
+        ("కరెంట్ లేదు", None),
+    ],
+}
+
+
+def ladder_intent(text):
+    text = text.strip().lower()
+    for name, words in LADDER:
+        if any(word in text for word in words):
+            return name
+    return None
+
+
+def expected_reply(ivr, intent, language):
+    replies = {intent.name: intent.replies for intent in ivr.intent_engine.intents}
+    templates = replies[intent] if intent else ivr.intent_engine.fallback
+    return templates[language].format(**ivr.HYDERABAD_EB_INFO)
+
+
+@pytest.mark.parametrize("language,text,intent", [
+    (language, text, intent) for language, samples in SAMPLES.items() for text, intent in samples
+])
+def test_samples_keep_their_intent(ivr, language, text, intent):
+    assert ladder_intent(text) == intent
+    assert ivr.process_user_query(text, language) == expected_reply(ivr, intent, language)
+
+
+def test_hindi_naya_means_new_connection(ivr):
+    reply = ivr.process_user_query("नया", "hi")
+    assert reply == "नए कनेक्शन के लिए 1800-425-1912 पर कॉल करें।"
+    assert ivr.intent_engine.match("मुझे नया चाहिए").intent.name == "new_connection"
+
+
+def test_more_keywords_outweigh_ladder_order(ivr):
+    # The ladder answered bill_payment for any bill keyword; two connection keywords now win
+    text = "pay for a new connection"
+    assert ladder_intent(text) == "bill_payment"
+    assert ivr.intent_engine.match(text).intent.name == "new_connection"
+
+
+def test_empty_transcript_asks_again(ivr):
+    assert ivr.process_user_query("   ", "te") == ivr.LANGUAGE_PROMPTS["te"]["no_input"]
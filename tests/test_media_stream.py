@@ -0,0 +1,128 @@
+import base64
+import json
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from audio import EnergyVAD, ulaw_encode
+from media_stream import ERROR_TONE, STREAM_SAMPLE_RATE, MediaStreamSession
+
+FRAME = STREAM_SAMPLE_RATE // 50  # 20 ms, as Twilio sends them
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, raw):
+        self.sent.append(json.loads(raw))
+
+    def events(self):
+        return [message["event"] for message in self.sent]
+
+    def audio(self):
+        return b"".join(base64.b64decode(m["media"]["payload"]) for m in self.sent if m["event"] == "media")
+
+
+class InlineExecutor:
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def frames(seconds, amplitude):
+    n = int(seconds * 50)
+    t = np.arange(n * FRAME) / STREAM_SAMPLE_RATE
+    if amplitude:
+        pcm = amplitude * np.sin(2 * np.pi * 300 * t)
+    else:
+        pcm = np.random.default_rng(0).normal(0, 30, len(t))
+    data = ulaw_encode(pcm.astype(np.int16))
+    return [data[i:i + FRAME] for i in range(0, len(data), FRAME)]
+
+
+def feed(session, chunks):
+    for chunk in chunks:
+        session.handle({"event": "media", "media": {"track": "inbound",
+                                                    "payload": base64.b64encode(chunk).decode("ascii")}})
+
+
+@pytest.fixture
+def make_session():
+    def make(on_utterance, **kwargs):
+        ws = FakeSocket()
+        session = MediaStreamSession(ws, on_utterance, InlineExecutor(),
+                                     vad=EnergyVAD(sample_rate=STREAM_SAMPLE_RATE, end_ms=500), **kwargs)
+        session.handle({"event": "start", "start": {"streamSid": "MZ1", "callSid": "CA1"}})
+        return session, ws
+    return make
+
+
+def test_end_of_speech_dispatches_the_utterance(make_session):
+    utterances = []
+    reply = ulaw_encode(np.zeros(1600, dtype=np.int16))
+    session, ws = make_session(lambda s, pcm: utterances.append(pcm) or reply)
+
+    feed(session, frames(0.5, 0) + frames(1.0, 8000))
+    assert utterances == []
+
+    trailing = frames(1.0, 0)
+    for sent, chunk in enumerate(trailing, 1):
+        feed(session, [chunk])
+        if utterances:
+            break
+
+    assert len(utterances) == 1
+    # End of speech within the VAD's 500 ms of silence (plus a frame of slack)
+    assert sent * 20 <= 520
+    assert len(utterances[0]) >= STREAM_SAMPLE_RATE
+    assert ws.events() == ["media", "mark"]
+    assert ws.audio() == reply
+    assert session.playing and not session.busy and session.turns == 1
+
+
+def test_barge_in_clears_the_playing_reply(make_session):
+    session, ws = make_session(lambda s, pcm: None)
+    session.playing = True
+
+    feed(session, frames(0.5, 0))
+    assert ws.events() == []
+    feed(session, frames(0.2, 8000))
+
+    assert ws.events() == ["clear"]
+    assert not session.playing
+
+
+def test_mark_ends_playback(make_session):
+    session, ws = make_session(lambda s, pcm: None)
+    session.playing = True
+    session.handle({"event": "mark", "mark": {"name": "reply-1"}})
+
+    feed(session, frames(0.5, 0) + frames(0.2, 8000))
+    assert ws.events() == []
+
+
+def fail(session, pcm):
+    raise RuntimeError("STT down")
+
+
+def test_failed_turn_plays_the_error_prompt(make_session):
+    apology = b"\xff" * 800
+    session, ws = make_session(fail, on_error=lambda s: apology)
+
+    feed(session, frames(0.5, 0) + frames(1.0, 8000) + frames(0.6, 0))
+
+    assert ws.events() == ["media", "mark"]
+    assert ws.audio() == apology
+    assert not session.busy
+
+
+def test_failed_turn_without_a_prompt_plays_a_tone(make_session):
+    session, ws = make_session(fail)
+
+    feed(session, frames(0.5, 0) + frames(1.0, 8000) + frames(0.6, 0))
+
+    assert ws.events()[-1] == "mark"
+    assert ws.audio() == ERROR_TONE
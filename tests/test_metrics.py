@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+
+from metrics import ARCHIVE, MetricsRegistry
+
+
+def exited_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def write_snapshot(directory, pid, token, calls, seconds):
+    snapshot = {
+        "calls_total": {"type": "counter", "values": [[["ok"], calls]]},
+        "latency_seconds": {"type": "histogram", "values": [[["stt"], [calls, 0, 0], seconds]]},
+    }
+    with open(os.path.join(directory, f"metrics_{pid}_{token}.json"), "w") as fh:
+        json.dump(snapshot, fh)
+
+
+def make_registry(tmp_path):
+    registry = MetricsRegistry(str(tmp_path))
+    registry.counter("calls_total", "Calls", ["outcome"])
+    registry.histogram("latency_seconds", "Latency", ["stage"], buckets=(0.5, 1.0))
+    return registry
+
+
+def test_exited_workers_are_folded_into_the_archive(tmp_path):
+    registry = make_registry(tmp_path)
+    registry.metrics["calls_total"].inc(outcome="ok")
+    registry.flush()
+    write_snapshot(tmp_path, exited_pid(), "aaaa1111", 3, 0.75)
+    write_snapshot(tmp_path, exited_pid(), "bbbb2222", 2, 0.5)
+    before = registry.collect()
+
+    assert registry.fold_exited() == 2
+    assert sorted(os.listdir(tmp_path)) == sorted([".lock", ARCHIVE, os.path.basename(registry.path)])
+    assert registry.collect() == before
+    assert before["calls_total"][("ok",)] == 6
+    assert before["latency_seconds"][("stt",)] == [[5, 0, 0], 1.25]
+
+    # Later exits add to the archive
+    write_snapshot(tmp_path, exited_pid(), "cccc3333", 1, 0.25)
+    assert registry.fold_exited() == 1
+    assert registry.collect()["calls_total"][("ok",)] == 7
+    assert registry.fold_exited() == 0
+
+
+def test_live_workers_keep_their_snapshots(tmp_path):
+    registry = make_registry(tmp_path)
+    write_snapshot(tmp_path, os.getppid(), "dddd4444", 1, 0.1)
+
+    assert registry.fold_exited() == 0
+    assert ARCHIVE not in os.listdir(tmp_path)
+    assert registry.collect()["calls_total"][("ok",)] == 1
+
+
+def test_render_includes_the_archive(tmp_path):
+    registry = make_registry(tmp_path)
+    write_snapshot(tmp_path, exited_pid(), "eeee5555", 4, 2.0)
+    registry.fold_exited()
+
+    text = registry.render()
+    assert 'calls_total{outcome="ok"} 4' in text
+    assert 'latency_seconds_count{stage="stt"} 4' in text
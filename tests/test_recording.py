@@ -0,0 +1,45 @@
+import uuid
+
+import pytest
+
+from resilience import CircuitOpenError
+
+
+def in_use(ivr, vendors):
+    """Connections to the fake vendors checked out of the pool."""
+    return sum(pool["in_use"] for pool in ivr.http.stats() if pool["host"] == vendors.url)
+
+
+def post_recording(client, vendors, call_sid):
+    recording_sid = f"RE{uuid.uuid4().hex}"
+    return client.post("/twilio/recording", data={
+        "CallSid": call_sid,
+        "RecordingSid": recording_sid,
+        "RecordingUrl": f"{vendors.url}/recordings/{recording_sid}",
+    })
+
+
+def test_unread_recording_is_released(ivr, vendors):
+    before = in_use(ivr, vendors)
+    with pytest.raises(RuntimeError):
+        with ivr.stream_twilio_recording(f"{vendors.url}/recordings/RE1"):
+            assert in_use(ivr, vendors) == before + 1
+            raise RuntimeError("STT rejected the upload before reading it")
+    assert in_use(ivr, vendors) == before
+
+
+def test_failed_stt_releases_the_recording(ivr, vendors, monkeypatch):
+    def rejected(chunks, language_code, filename="recording.wav"):
+        raise CircuitOpenError("Circuit 'stt' is open")
+
+    monkeypatch.setattr(ivr, "sarvam_stt_stream", rejected)
+    client = ivr.app.test_client()
+    client.post("/twilio/voice", data={"CallSid": "CArecording1"})
+    client.post("/twilio/language", data={"CallSid": "CArecording1", "Digits": "1"})
+    before = in_use(ivr, vendors)
+
+    for _ in range(5):
+        resp = post_recording(client, vendors, "CArecording1")
+        assert resp.status_code == 200
+
+    assert in_use(ivr, vendors) == before
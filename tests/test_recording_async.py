@@ -0,0 +1,100 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+
+@pytest.fixture
+def async_ivr(ivr, vendors, monkeypatch):
+    """The app in RECORDING_ASYNC mode, with a deferred-reply pool the test can drain."""
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(ivr, "RECORDING_ASYNC", True)
+    monkeypatch.setattr(ivr, "recording_executor", executor)
+    with vendors.lock:
+        vendors.call_requests.clear()
+    yield ivr
+    executor.shutdown(wait=True)
+
+
+def start_call(client, call_sid):
+    form = {"CallSid": call_sid}
+    assert client.post("/twilio/voice", data=form).status_code == 200
+    assert client.post("/twilio/language", data={**form, "Digits": "1"}).status_code == 200
+
+
+def post_recording(client, vendors, call_sid, recording_sid):
+    return client.post("/twilio/recording", data={
+        "CallSid": call_sid,
+        "RecordingSid": recording_sid,
+        "RecordingUrl": f"{vendors.url}/recordings/{recording_sid}",
+    })
+
+
+def updates(vendors, call_sid):
+    with vendors.lock:
+        return [fields for sid, fields in vendors.call_requests if sid == call_sid]
+
+
+def drain(ivr):
+    ivr.recording_executor.shutdown(wait=True)
+
+
+def test_hold_twiml_is_returned_before_the_reply_is_ready(async_ivr, vendors, vendor_config):
+    client = async_ivr.app.test_client()
+    call_sid, recording_sid = f"CA{uuid.uuid4().hex}", f"RE{uuid.uuid4().hex}"
+    start_call(client, call_sid)
+    vendor_config.stt.latency_ms = 500
+
+    started = time.perf_counter()
+    resp = post_recording(client, vendors, call_sid, recording_sid)
+    elapsed = time.perf_counter() - started
+
+    assert resp.status_code == 200
+    assert elapsed < 0.5
+    body = resp.get_data(as_text=True)
+    assert "<Pause" in body and "/twilio/continue</Redirect>" in body
+    assert updates(vendors, call_sid) == []
+
+    drain(async_ivr)
+
+    sent = updates(vendors, call_sid)
+    assert len(sent) == 1
+    reply = async_ivr.recording_results.get(recording_sid)
+    assert reply["status"] == "done"
+    assert sent[0]["Twiml"] == reply["twiml"]
+    assert "<Play>" in reply["twiml"]
+
+
+def test_reply_past_the_deadline_is_dropped(async_ivr, vendors, vendor_config, monkeypatch):
+    client = async_ivr.app.test_client()
+    call_sid, recording_sid = f"CA{uuid.uuid4().hex}", f"RE{uuid.uuid4().hex}"
+    start_call(client, call_sid)
+    monkeypatch.setattr(async_ivr, "ASYNC_DEADLINE_SECONDS", 0.3)
+    vendor_config.stt.latency_ms = 1000
+
+    resp = post_recording(client, vendors, call_sid, recording_sid)
+    assert resp.status_code == 200
+    drain(async_ivr)
+
+    assert updates(vendors, call_sid) == []
+
+
+def test_retried_recording_is_deferred_once(async_ivr, vendors):
+    client = async_ivr.app.test_client()
+    call_sid, recording_sid = f"CA{uuid.uuid4().hex}", f"RE{uuid.uuid4().hex}"
+    start_call(client, call_sid)
+    # Keep the pool busy so the retry arrives before the first job has started
+    gate = threading.Event()
+    for _ in range(2):
+        async_ivr.recording_executor.submit(gate.wait, 5)
+
+    first = post_recording(client, vendors, call_sid, recording_sid)
+    retry = post_recording(client, vendors, call_sid, recording_sid)
+    gate.set()
+    drain(async_ivr)
+    late_retry = post_recording(client, vendors, call_sid, recording_sid)
+
+    assert first.get_data() == retry.get_data() == late_retry.get_data()
+    assert len(updates(vendors, call_sid)) == 1
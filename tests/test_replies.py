@@ -0,0 +1,34 @@
+import os
+import time
+
+from replies import RetentionSweeper
+
+
+def write(directory, name, size, age):
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+
+def test_quota_spares_tts_cache_files(tmp_path):
+    write(tmp_path, "tts_" + "a" * 64 + ".wav", 100, age=86400)
+    write(tmp_path, "tel_" + "b" * 64 + ".wav", 100, age=86400)
+    write(tmp_path, "recording_" + "c" * 64 + ".wav", 100, age=60)
+    write(tmp_path, "reply_" + "d" * 64 + ".wav", 100, age=30)
+
+    sweeper = RetentionSweeper(str(tmp_path), ttl_seconds=3600, max_bytes=100)
+
+    assert sweeper.sweep() == 1
+    assert sorted(name.split("_")[0] for name in os.listdir(tmp_path)) == ["reply", "tel", "tts"]
+
+
+def test_ttl_and_stale_partials(tmp_path):
+    write(tmp_path, "recording_" + "c" * 64 + ".wav", 10, age=7200)
+    write(tmp_path, "tts_" + "a" * 64 + ".wav.0123.tmp", 10, age=7200)
+    write(tmp_path, "tts_" + "b" * 64 + ".wav", 10, age=7200)
+
+    sweeper = RetentionSweeper(str(tmp_path), ttl_seconds=3600)
+
+    assert sweeper.sweep() == 2
+    assert os.listdir(tmp_path) == ["tts_" + "b" * 64 + ".wav"]
@@ -0,0 +1,120 @@
+import time
+
+import pytest
+import requests
+
+from resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, deadline_scope
+from transport import BodySourceError
+
+
+@pytest.fixture
+def breaker(ivr, monkeypatch):
+    """A fresh STT breaker that opens on one failure and half-opens straight away."""
+    breaker = CircuitBreaker("stt", failure_threshold=1, reset_timeout=0)
+    monkeypatch.setitem(ivr.breakers, "stt", breaker)
+    return breaker
+
+
+def fail(exc):
+    def send(timeout):
+        raise exc
+    return send
+
+
+def test_breaker_needs_a_failure_to_open():
+    breaker = CircuitBreaker("x", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.allow()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    assert breaker.stats() == {"state": "open", "consecutive_failures": 2, "rejected": 1}
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker("x", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    breaker.allow()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.release()
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_unexpected_error_ends_the_probe(ivr, breaker):
+    breaker.record_failure()
+
+    # Not a RequestException, e.g. a bug in the send callable
+    with pytest.raises(ValueError):
+        ivr.sarvam_call("stt", fail(ValueError("bad payload")))
+    assert breaker.stats()["consecutive_failures"] == 2
+
+    # The probe was released, so the breaker can probe (and close) again
+    ivr.sarvam_stt_stream([b"RIFF" + b"\0" * 64], "en-IN")
+    assert breaker.state == "closed"
+
+
+def test_broken_recording_does_not_count_against_sarvam(ivr, breaker):
+    def chunks():
+        yield b"RIFF" + b"\0" * 4096
+        raise requests.ConnectionError("recording download reset")
+
+    with pytest.raises(BodySourceError) as info:
+        ivr.sarvam_stt_stream(chunks(), "en-IN")
+    assert isinstance(info.value.__cause__, requests.ConnectionError)
+    assert breaker.stats() == {"state": "closed", "consecutive_failures": 0, "rejected": 0}
+
+    # Nor does it use up a half-open probe
+    breaker.record_failure()
+    with pytest.raises(BodySourceError):
+        ivr.sarvam_stt_stream(chunks(), "en-IN")
+    assert breaker.stats()["consecutive_failures"] == 1
+    ivr.sarvam_stt_stream([b"RIFF" + b"\0" * 64], "en-IN")
+    assert breaker.state == "closed"
+
+
+def test_vendor_errors_still_count(ivr, breaker):
+    with pytest.raises(requests.ConnectionError):
+        ivr.sarvam_call("stt", fail(requests.ConnectionError("refused")))
+    assert breaker.state == "open"
+
+
+def test_shortened_timeout_is_not_blamed_on_sarvam(ivr, breaker):
+    # Most of the budget went on earlier steps, so Sarvam got under half of it
+    with deadline_scope(1.0):
+        time.sleep(0.6)
+        with pytest.raises(requests.ReadTimeout):
+            ivr.sarvam_call("stt", fail(requests.ReadTimeout("read timed out")))
+    assert breaker.stats()["consecutive_failures"] == 0
+
+    # Given the whole budget (shorter than the read timeout), a slow Sarvam is a failure
+    with deadline_scope(1.0):
+        with pytest.raises(requests.ReadTimeout):
+            ivr.sarvam_call("stt", fail(requests.ReadTimeout("read timed out")))
+    assert breaker.state == "open"
+
+
+def test_open_breaker_skips_the_recording_download(ivr, vendors, monkeypatch):
+    monkeypatch.setitem(ivr.breakers, "stt", CircuitBreaker("stt", failure_threshold=1, reset_timeout=60))
+    ivr.breakers["stt"].record_failure()
+    client = ivr.app.test_client()
+    call = {"CallSid": "CAbreaker1"}
+    client.post("/twilio/voice", data=call)
+    client.post("/twilio/language", data=dict(call, Digits="1"))
+    downloads = vendors.stats()["requests"].get("recording", 0)
+
+    resp = client.post("/twilio/recording", data=dict(
+        call, RecordingSid="REbreaker1", RecordingUrl=f"{vendors.url}/recordings/REbreaker1"))
+
+    assert resp.status_code == 200
+    assert vendors.stats()["requests"].get("recording", 0) == downloads
+
+
+def test_spent_deadline_skips_the_recording_download(ivr, vendors, breaker):
+    with deadline_scope(0):
+        with pytest.raises(DeadlineExceeded):
+            ivr.require_sarvam("stt")
+    assert breaker.stats() == {"state": "closed", "consecutive_failures": 0, "rejected": 0}
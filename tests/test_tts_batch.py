@@ -0,0 +1,55 @@
+import time
+import uuid
+
+from flow import Slot, Template
+from resilience import deadline_scope
+
+
+def prompt(ivr):
+    return (f"Prompt {uuid.uuid4().hex}", ivr.LANGUAGES["te"]["code"])
+
+
+def test_missed_deadline_returns_the_items_that_are_ready(ivr, vendor_config):
+    cached, slow = prompt(ivr), prompt(ivr)
+    with deadline_scope(5):
+        [cached_path] = ivr.synthesize_batch([cached])
+    vendor_config.tts.latency_ms = 1000
+
+    started = time.perf_counter()
+    with deadline_scope(5):
+        paths = ivr.synthesize_batch([cached, slow, cached], deadline_seconds=0.2)
+    elapsed = time.perf_counter() - started
+
+    assert cached_path is not None
+    assert paths == [cached_path, None, cached_path]
+    assert elapsed < 0.8
+
+
+def test_late_prompt_lands_in_the_cache(ivr, vendor_config):
+    slow = prompt(ivr)
+    vendor_config.tts.latency_ms = 300
+
+    with deadline_scope(5):
+        assert ivr.synthesize_batch([slow], deadline_seconds=0.05) == [None]
+    time.sleep(1.0)
+
+    assert ivr.cached_tts(*slow) is not None
+
+
+def test_prompts_past_the_deadline_fall_back_to_say(ivr, vendor_config, monkeypatch):
+    cached, slow = prompt(ivr), prompt(ivr)
+    with deadline_scope(5):
+        ivr.synthesize_batch([cached])
+    template = Template([b"<Response>", b"", b"</Response>"], [
+        Slot("cached", cached[0], b"<Say>cached</Say>"),
+        Slot("slow", slow[0], b"<Say>slow</Say>"),
+    ])
+    monkeypatch.setattr(ivr, "TTS_BATCH_DEADLINE_SECONDS", 0.2)
+    vendor_config.tts.latency_ms = 1000
+
+    with deadline_scope(5):
+        twiml = ivr.fill_template(template, "te", "test").decode("utf-8")
+
+    assert twiml.startswith("<Response><Play>")
+    assert twiml.endswith("<Say>slow</Say></Response>")
+    assert "<Say>cached</Say>" not in twiml
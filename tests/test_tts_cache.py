@@ -0,0 +1,57 @@
+import os
+import time
+
+from tts_cache import TTSCache
+
+
+def test_miss_finds_file_written_by_another_process(tmp_path):
+    worker_a = TTSCache(str(tmp_path))
+    worker_b = TTSCache(str(tmp_path))
+
+    path = worker_a.put("abc", b"audio", ".wav")
+
+    assert worker_b.lookup("abc") == path
+    assert worker_b.stats()["disk_hits"] == 1
+    assert worker_b.lookup("abc") == path
+    assert worker_b.stats()["memory_hits"] == 1
+
+
+def test_disk_quota_is_shared(tmp_path):
+    worker_a = TTSCache(str(tmp_path), max_disk_bytes=250, rescan_interval=0)
+    worker_b = TTSCache(str(tmp_path), max_disk_bytes=250, rescan_interval=0)
+
+    for i in range(3):
+        worker_a.put(f"a{i}", b"x" * 50, ".wav")
+        worker_b.put(f"b{i}", b"x" * 50, ".wav")
+
+    on_disk = sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path))
+    assert on_disk <= 250
+
+
+def test_eviction_follows_use_across_processes(tmp_path):
+    worker_a = TTSCache(str(tmp_path), max_disk_bytes=100, rescan_interval=0)
+    worker_b = TTSCache(str(tmp_path), max_disk_bytes=100, rescan_interval=0)
+
+    old = worker_a.put("old", b"x" * 50, ".wav")
+    worker_a.put("new", b"x" * 50, ".wav")
+    past = time.time() - 60
+    os.utime(old, (past, past))
+    os.utime(worker_a.path_for("new", ".wav"), (past - 60, past - 60))
+    # B plays "old", so "new" becomes the least recently used file
+    assert worker_b.lookup("old") == old
+
+    worker_b.put("third", b"x" * 50, ".wav")
+
+    assert os.path.exists(old)
+    assert not os.path.exists(worker_a.path_for("new", ".wav"))
+    assert worker_b.lookup("new") is None
+
+
+def test_memory_hit_rewrites_a_deleted_file(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    path = cache.put("abc", b"audio", ".wav")
+    os.remove(path)
+
+    assert cache.lookup("abc") == path
+    with open(path, "rb") as fh:
+        assert fh.read() == b"audio"
@@ -0,0 +1,56 @@
+import pytest
+
+
+@pytest.fixture
+def writes(ivr, monkeypatch):
+    """Call state writes made through the store, as (method, call_sid)."""
+    made = []
+    store = ivr.call_states
+    for name in ("set", "update", "merge"):
+        original = getattr(store, name)
+
+        def record(call_sid, *args, _name=name, _original=original, **kwargs):
+            made.append((_name, call_sid))
+            return _original(call_sid, *args, **kwargs)
+        monkeypatch.setattr(store, name, record)
+    return made
+
+
+def test_each_webhook_is_counted_in_one_write(ivr, writes):
+    client = ivr.app.test_client()
+    call = {"CallSid": "CAwebhooks1"}
+
+    client.post("/twilio/voice", data=call)
+    # No key pressed: the voice screen redirects to itself
+    client.post("/twilio/voice", data=call)
+    client.post("/twilio/language", data=dict(call, Digits="2"))
+    client.post("/twilio/action", data=dict(call, Digits="3"))
+
+    state = ivr.call_states.get("CAwebhooks1")
+    assert state["webhooks"] == 4
+    assert state["language"] == "hi"
+    assert writes == [("update", "CAwebhooks1")] * 4
+
+
+def test_start_keeps_the_count_and_resets_the_turn(ivr):
+    client = ivr.app.test_client()
+    ivr.call_states.set("CAwebhooks2", {"language": "te", "interaction_count": 2, "mode": "stream",
+                                        "webhooks": 5})
+
+    client.post("/twilio/voice", data={"CallSid": "CAwebhooks2"})
+
+    assert ivr.call_states.get("CAwebhooks2") == {"language": None, "interaction_count": 0,
+                                                  "mode": "stream", "webhooks": 6}
+
+
+def test_status_callback_reports_and_forgets_the_count(ivr):
+    client = ivr.app.test_client()
+    call = {"CallSid": "CAwebhooks3"}
+    client.post("/twilio/voice", data=call)
+    client.post("/twilio/language", data=dict(call, Digits="1"))
+    before = sum(total for _, total in ivr.CALL_WEBHOOKS.values.values())
+
+    client.post("/twilio/status", data=dict(call, CallStatus="completed"))
+
+    assert ivr.call_states.get("CAwebhooks3") is None
+    assert sum(total for _, total in ivr.CALL_WEBHOOKS.values.values()) - before == 2
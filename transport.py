@@ -0,0 +1,115 @@
+"""Shared, pooled HTTP transport for outbound vendor traffic.
+
+All calls to Sarvam and Twilio go through one ``requests.Session`` whose
+adapter keeps a urllib3 connection pool per host. Connections are reused with
+HTTP keep-alive, so only the first request to api.sarvam.ai / api.twilio.com
+in each pool slot pays for the TCP and TLS handshake.
+"""
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class BodySourceError(Exception):
+    """Reading a streamed request body's source failed (not the request's destination).
+
+    Raised out of ``multipart_stream`` while requests is sending, with the
+    original exception as ``__cause__``, so callers can tell a broken upload
+    source (e.g. a Twilio recording download) from a failing vendor.
+    """
+
+
+class VendorTransport:
+    """Keep-alive session with per-host connection pools and split timeouts."""
+
+    def __init__(self, pool_size: int = 10, max_hosts: int = 10,
+                 connect_timeout: float = 3.05, read_timeout: float = 30.0):
+        self.pool_size = pool_size
+        self.default_timeout = (connect_timeout, read_timeout)
+
+        self._session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=max_hosts, pool_maxsize=pool_size, pool_block=False)
+        self._session.mount("https://", self._adapter)
+        self._session.mount("http://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._errors: Dict[str, int] = {}
+
+    def request(self, method: str, url: str, timeout: Optional[Timeout] = None, **kwargs) -> requests.Response:
+        try:
+            return self._session.request(method, url, timeout=timeout or self.default_timeout, **kwargs)
+        except requests.RequestException:
+            host = requests.utils.urlparse(url).hostname or ""
+            with self._lock:
+                self._errors[host] = self._errors.get(host, 0) + 1
+            raise
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> List[dict]:
+        """Per-host pool statistics."""
+        pools = self._adapter.poolmanager.pools
+        result = []
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            queue = pool.pool
+            # The queue is pre-filled with None placeholders; real sockets are idle connections
+            idle = sum(1 for conn in list(queue.queue) if conn is not None) if queue else 0
+            in_use = queue.maxsize - queue.qsize() if queue else 0
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            result.append({
+                "host": host,
+                "pool_size": queue.maxsize if queue else 0,
+                "in_use": in_use,
+                "idle": idle,
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                "handshakes_avoided": max(pool.num_requests - pool.num_connections, 0),
+                "errors": self._errors.get(pool.host, 0),
+            })
+        return result
+
+    def close(self) -> None:
+        self._session.close()
+
+
+def multipart_stream(boundary: str, fields: Dict[str, str], file_field: str, filename: str,
+                     content_type: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Yield a multipart/form-data body whose file part is streamed from ``chunks``.
+
+    Passing the generator as ``data=`` makes requests send it with chunked
+    transfer encoding, so only one chunk is held in memory at a time. An
+    error raised by ``chunks`` comes out as ``BodySourceError``.
+    """
+    dash = f"--{boundary}\r\n".encode()
+    for name, value in fields.items():
+        yield dash
+        yield f'Content-Disposition: form-data; name="{name}"\r\n\r\n'.encode()
+        yield str(value).encode("utf-8") + b"\r\n"
+
+    yield dash
+    yield (
+        f'Content-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    chunks = iter(chunks)
+    while True:
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            break
+        except Exception as e:
+            raise BodySourceError(f"{type(e).__name__}: {e}") from e
+        if chunk:
+            yield chunk
+    yield f"\r\n--{boundary}--\r\n".encode()
@@ -0,0 +1,213 @@
+"""Content-addressed cache for synthesized TTS audio.
+
+Entries are keyed by a hash of the full Sarvam TTS payload (text, language,
+model, speaker, pitch/pace/loudness, sample rate), so the same prompt always
+maps to the same file under the replies directory. There are two tiers:
+
+* memory: an LRU of raw audio bytes per process, bounded by ``max_memory_bytes``
+* disk:   ``<prefix><key><ext>`` files shared by every process using the
+  directory, bounded by ``max_disk_bytes`` in total
+
+A memory hit re-materialises the file if something removed it from disk, and
+a disk hit is promoted back into memory. Because names are content addressed,
+a miss in this process's index checks the disk by key, so audio one gunicorn
+worker synthesized is found by the others. Every hit touches the file's
+mtime, which makes mtime the LRU order all processes agree on: the index is
+rebuilt from a directory scan every ``rescan_interval`` seconds of writes (or
+sooner when it looks full) and the least recently used files are deleted
+until the directory's files with this prefix fit the quota.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+def cache_key(payload: dict) -> str:
+    """Return a stable hex digest for a TTS request payload."""
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Two-tier (memory + disk) LRU cache of synthesized audio."""
+
+    def __init__(self, directory: str, max_memory_bytes: int = 32 * 1024 * 1024,
+                 max_disk_bytes: int = 512 * 1024 * 1024, prefix: str = "tts_",
+                 rescan_interval: float = 30.0):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.prefix = prefix
+        self.rescan_interval = rescan_interval
+
+        self._lock = threading.RLock()
+        # key -> (audio bytes, ext)
+        self._memory: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._memory_bytes = 0
+        # key -> (filename, size), least recently used first
+        self._disk: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._disk_bytes = 0
+        self._scanned_at = 0.0
+        # Extensions files of this cache have been seen with, for lookups by key
+        self._exts = {".wav", ".mp3"}
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._rescan()
+
+    def _rescan(self) -> None:
+        """Rebuild the disk LRU from the directory (mtime order) and enforce the quota."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.startswith(self.prefix) or name.endswith(".tmp"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            key, ext = os.path.splitext(name[len(self.prefix):])
+            entries.append((st.st_mtime, key, name, st.st_size))
+            self._exts.add(ext)
+
+        self._disk.clear()
+        self._disk_bytes = 0
+        for _, key, name, size in sorted(entries):
+            self._disk[key] = (name, size)
+            self._disk_bytes += size
+        self._scanned_at = time.monotonic()
+        self._evict_disk()
+
+    def path_for(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{self.prefix}{key}{ext}")
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Return the path of a cached file for ``key``, or None on a miss."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                audio, ext = entry
+                path = self.path_for(key, ext)
+                if _touch(path):
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                else:
+                    self._write_file(key, audio, ext)
+                self.memory_hits += 1
+                return path
+
+            disk_entry = self._disk.get(key) or self._find(key)
+            if disk_entry is not None:
+                name, _ = disk_entry
+                path = os.path.join(self.directory, name)
+                try:
+                    with open(path, "rb") as fh:
+                        audio = fh.read()
+                except OSError:
+                    # Evicted by another process, or removed behind our back
+                    self._drop_disk(key)
+                    self.misses += 1
+                    return None
+                _touch(path)
+                self._disk.move_to_end(key)
+                self._remember(key, audio, os.path.splitext(name)[1])
+                self.disk_hits += 1
+                return path
+
+            self.misses += 1
+            return None
+
+    def _find(self, key: str) -> Optional[Tuple[str, int]]:
+        """Index ``<prefix><key><ext>`` if another process wrote it since the last scan."""
+        for ext in self._exts:
+            name = f"{self.prefix}{key}{ext}"
+            try:
+                size = os.path.getsize(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            self._disk[key] = (name, size)
+            self._disk_bytes += size
+            return name, size
+        return None
+
+    def put(self, key: str, audio: bytes, ext: str) -> str:
+        """Store audio under ``key`` in both tiers and return its file path."""
+        with self._lock:
+            path = self._write_file(key, audio, ext)
+            self._remember(key, audio, ext)
+            return path
+
+    def _write_file(self, key: str, audio: bytes, ext: str) -> str:
+        path = self.path_for(key, ext)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+        self._exts.add(ext)
+
+        self._drop_disk(key)
+        self._disk[key] = (os.path.basename(path), len(audio))
+        self._disk_bytes += len(audio)
+        if self._disk_bytes > self.max_disk_bytes or time.monotonic() - self._scanned_at >= self.rescan_interval:
+            # Other processes' writes only show up in a scan, so look before deleting anything
+            self._rescan()
+        return path
+
+    def _remember(self, key: str, audio: bytes, ext: str) -> None:
+        if len(audio) > self.max_memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old[0])
+        self._memory[key] = (audio, ext)
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.max_memory_bytes and self._memory:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _drop_disk(self, key: str) -> None:
+        entry = self._disk.pop(key, None)
+        if entry is not None:
+            self._disk_bytes -= entry[1]
+
+    def _evict_disk(self) -> None:
+        while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+            _, (name, size) = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+def _touch(path: str) -> bool:
+    """Mark a file as just used (its mtime is the shared LRU order); False if it is gone."""
+    try:
+        os.utime(path)
+    except OSError:
+        return False
+    return True